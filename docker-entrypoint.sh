@@ -11,6 +11,7 @@ if [ "$DISABLE_CRON" != "true" ]; then
     echo "0 4 * * * cd /app && python main.py --first_test >> /app/logs/first_test.log 2>&1" > /tmp/crontab
     echo "0 5 * * * cd /app && python main.py --http_test >> /app/logs/http_test.log 2>&1" >> /tmp/crontab
     echo "10 5 * * * cp -f /app/output/result.* /volume1/web/myweb/iptv/ >> /app/logs/copy.log 2>&1" >> /tmp/crontab
+    echo "30 5 * * * cd /app && python main.py --epg >> /app/logs/epg.log 2>&1" >> /tmp/crontab
     
     # 安装crontab
     crontab /tmp/crontab
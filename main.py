@@ -9,10 +9,47 @@ import shutil
 import argparse  # 添加argparse库来解析命令行参数
 import subprocess  # 添加subprocess库用于执行ffmpeg命令
 import random
+import sys
+import socket
+from urllib.parse import quote, urlparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from utils.config import config_instance
+from utils.distributed import ProbeCoordinator, run_worker
+from utils.history import ProbeHistory
+from utils.history_store import create_history_archive, write_trend_report
+from utils.scheduler import run_with_deadline, make_deadline
+from utils.metadata import MetadataCache, probe_stream_metadata, apply_cached_metadata
+from utils.network import (IPV4, IPV6, classify_channels, get_probe_family, is_family_routable, channel_in_family,
+                           needs_ipv6_probe, create_family_sessions, close_family_sessions)
+import utils.constants as constants
+from utils.redirect import RedirectResolver
+from utils.subscription_stats import SubscriptionStats, is_live
+from utils.epg import fetch_epg, build_filtered_epg
+from utils.channel_registry import get_registry
+from utils.sampler import ThroughputSampler
+from utils.protocols import RTSP, RTMP, get_stream_protocol, probe_stream
+from utils.lean_http import ADDRESS_FAMILIES, LeanFallback, lean_probe
+from utils.http2 import create_http2_prober
+from utils.soak import soak_channels
+from utils.failover import save_failover_sources
+from utils.fingerprint import cluster_mirrors
+from utils.timeouts import HostTimeouts, CONNECT, FIRST_BYTE, TOTAL
+from utils.mirrors import MirrorRacer
+from utils.governor import BandwidthGovernor, calibrate_link_capacity
+from utils.ts_analyzer import TsAnalyzer
+from utils.profiles import load_profiles, merge_lists
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# 重定向解析器：各测速阶段共用，缓存 原始URL -> 最终URL，避免重复跟随 302 跳转
+redirect_resolver = RedirectResolver(max_hops=config_instance.redirect_max_hops, ttl=config_instance.redirect_cache_ttl)
+# 按主机学习的超时，未开启时各处使用固定的默认超时
+host_timeouts = HostTimeouts(enabled=config_instance.open_adaptive_timeout,
+                             factor=config_instance.adaptive_timeout_factor,
+                             floor=config_instance.adaptive_timeout_min,
+                             ceiling=config_instance.adaptive_timeout_max)
+
 # 在文件开头修改配置
 # EPG_URL = "http://epg.51zmt.top:8000/e.xml"  # EPG 源
 # LOGO_URL = "http://epg.51zmt.top:8000/pics"  # 修改台标基础URL
@@ -41,10 +78,12 @@ def read_include_list_file(file_path):
 async def fetch_url(session, url):
     start_time = time.time()
     try:
-        async with session.get(url, timeout=10) as response:
+        async with session.get(url, timeout=host_timeouts.client_timeout(url, 10)) as response:
             if response.status == 200:
+                host_timeouts.observe(url, FIRST_BYTE, time.time() - start_time)
                 content = await response.text()
                 elapsed_time = time.time() - start_time
+                host_timeouts.observe(url, TOTAL, elapsed_time)
                 return content, elapsed_time
             else:
                 logging.warning(f"请求 {url} 失败，状态码: {response.status}")
@@ -129,15 +168,112 @@ def merge_and_deduplicate(channels_list):
 async def test_channel_response_time(session, channel):
     start_time = time.time()
     try:
-        async with session.get(channel['url'], timeout=10) as response:
+        # RTSP / RTMP / udpxy 使用专用探测器，只做握手或首批数据检查
+        result = await probe_stream(session, channel['url'], timeout=host_timeouts.timeout(channel['url'], FIRST_BYTE, 10))
+        if result is not None:
+            if result['success']:
+                channel['response_time'] = result['response_time']
+                host_timeouts.observe(channel['url'], FIRST_BYTE, result['response_time'])
+            else:
+                logging.debug(f"测试 {channel['url']} 失败: {result['error']}")
+            return channel
+        async with redirect_resolver.get(session, channel['url'],
+                                         timeout=host_timeouts.client_timeout(channel['url'], 10, FIRST_BYTE)) as response:
+            elapsed_time = time.time() - start_time
+            if response.status == 200:
+                channel['response_time'] = elapsed_time
+                host_timeouts.observe(channel['url'], FIRST_BYTE, elapsed_time)
+    except Exception as e:
+        logging.error(f"测试 {channel['url']} 响应时间时发生错误: {e}")
+    return channel
+
+
+# 精简引擎：直接用 asyncio 连接发送请求，只解析状态行和 Location 头，用于大规模第一阶段测速
+# 与 test_channel_response_time 接口相同，遇到特殊协议或非常规地址、响应时回退到 aiohttp
+async def test_channel_response_time_lean(session, channel):
+    if get_stream_protocol(channel['url']) is not None:
+        return await test_channel_response_time(session, channel)
+    start_time = time.time()
+    try:
+        status = await lean_probe(channel['url'], timeout=host_timeouts.timeout(channel['url'], FIRST_BYTE, 10),
+                                  family=ADDRESS_FAMILIES.get(get_probe_family(channel), 0),
+                                  resolver=redirect_resolver, max_hops=config_instance.redirect_max_hops)
+        elapsed_time = time.time() - start_time
+        if status == 200:
+            channel['response_time'] = elapsed_time
+            host_timeouts.observe(channel['url'], FIRST_BYTE, elapsed_time)
+    except LeanFallback:
+        return await test_channel_response_time(session, channel)
+    except Exception as e:
+        logging.error(f"测试 {channel['url']} 响应时间时发生错误: {e}")
+    return channel
+
+
+# HTTP/2：频道较多的 HTTPS 主机复用同一条连接测试响应时间
+async def test_channel_response_time_h2(prober, channel):
+    start_time = time.time()
+    try:
+        async with prober.get(channel['url'], get_probe_family(channel),
+                              timeout=host_timeouts.client_timeout(channel['url'], 10, FIRST_BYTE)) as response:
+            elapsed_time = time.time() - start_time
             if response.status == 200:
-                elapsed_time = time.time() - start_time
                 channel['response_time'] = elapsed_time
+                host_timeouts.observe(channel['url'], FIRST_BYTE, elapsed_time)
     except Exception as e:
         logging.error(f"测试 {channel['url']} 响应时间时发生错误: {e}")
     return channel
 
 
+# 按源的地址族选择会话（承载大量频道的 HTTPS 主机使用 HTTP/2 客户端），返回 fetch(url, timeout=..., remember=...)
+def make_family_fetch(sessions, http2_prober=None):
+    def fetch_for(channel):
+        family = get_probe_family(channel)
+        if http2_prober and http2_prober.handles(channel['url']):
+            return lambda target, **kwargs: http2_prober.get(target, family, **kwargs)
+        return lambda target, **kwargs: redirect_resolver.get(sessions[family], target, **kwargs)
+
+    return fetch_for
+
+
+# 按频道地址族选择会话测试视频流，本机没有对应路由时直接判定失败，不再等待超时
+def make_family_stream_tester(sessions, channels, http2_prober=None, governor=None):
+    channels_by_url = {channel['url']: channel for channel in channels}
+    fetch_for = make_family_fetch(sessions, http2_prober)
+
+    async def stream_tester(_, url):
+        channel = channels_by_url.get(url, {'url': url})
+        if not is_family_routable(channel):
+            return {'success': False, 'response_time': float('inf'), 'error': 'No route to host family'}
+        return await test_stream_speed(sessions[get_probe_family(channel)], url, fetch=fetch_for(channel),
+                                       governor=governor)
+
+    return stream_tester
+
+
+# 分布式模式：通过协调器把响应时间测试分发到工作节点
+async def test_channel_response_time_remote(coordinator, channel):
+    result = await coordinator.submit('response_time', channel['url'])
+    channel['response_time'] = result.get('response_time', float('inf'))
+    return channel
+
+
+# 工作节点执行的测试任务，参数和返回值均为可 JSON 序列化的字典
+async def handle_response_time_task(session, params):
+    response_tester = test_channel_response_time_lean if config_instance.open_lean_probe else test_channel_response_time
+    channel = await response_tester(session, {'url': params['url'], 'response_time': float('inf')})
+    return {'response_time': channel['response_time']}
+
+
+async def handle_stream_speed_task(session, params):
+    return await test_stream_speed(session, params['url'])
+
+
+WORKER_HANDLERS = {
+    'response_time': handle_response_time_task,
+    'stream_speed': handle_stream_speed_task,
+}
+
+
 # 分组映射关系
 GROUP_MAPPING = {
     '央视频道': '🍓央视频道',
@@ -198,175 +334,260 @@ def normalize_channel_name(name):
     return list(variants)
 
 def get_channel_id(name):
-    """根据频道名称获取对应的频道ID"""
-    # 常见频道ID映射
-    channel_ids = {
-        'CCTV-1': 'cctv1',
-        'CCTV1': 'cctv1',
-        'CCTV-2': 'cctv2',
-        'CCTV2': 'cctv2',
-        'CCTV-3': 'cctv3',
-        'CCTV3': 'cctv3',
-        'CCTV-4': 'cctv4',
-        'CCTV4': 'cctv4',
-        'CCTV-5': 'cctv5',
-        'CCTV5': 'cctv5',
-        'CCTV-5+': 'cctv5plus',
-        'CCTV5+': 'cctv5plus',
-        'CCTV-6': 'cctv6',
-        'CCTV6': 'cctv6',
-        'CCTV-7': 'cctv7',
-        'CCTV7': 'cctv7',
-        'CCTV-8': 'cctv8',
-        'CCTV8': 'cctv8',
-        'CCTV-9': 'cctv9',
-        'CCTV9': 'cctv9',
-        'CCTV-10': 'cctv10',
-        'CCTV10': 'cctv10',
-        'CCTV-11': 'cctv11',
-        'CCTV11': 'cctv11',
-        'CCTV-12': 'cctv12',
-        'CCTV12': 'cctv12',
-        'CCTV-13': 'cctv13',
-        'CCTV13': 'cctv13',
-        'CCTV-14': 'cctv14',
-        'CCTV14': 'cctv14',
-        'CCTV-15': 'cctv15',
-        'CCTV15': 'cctv15',
-        'CCTV-16': 'cctv16',
-        'CCTV16': 'cctv16',
-        'CCTV-17': 'cctv17',
-        'CCTV17': 'cctv17',
-        '湖南卫视': 'hunan',
-        '浙江卫视': 'zhejiang',
-        '江苏卫视': 'jiangsu',
-        '北京卫视': 'beijing',
-        '东方卫视': 'dongfang',
-        '安徽卫视': 'anhui',
-        '广东卫视': 'guangdong',
-        '深圳卫视': 'shenzhen',
-        '辽宁卫视': 'liaoning',
-        '山东卫视': 'shandong',
-        '黑龙江卫视': 'heilongjiang',
-        '湖北卫视': 'hubei',
-        '河南卫视': 'henan',
-        '陕西卫视': 'shanxi',
-        '四川卫视': 'sichuan',
-        '重庆卫视': 'chongqing',
-        '江西卫视': 'jiangxi',
-        '贵州卫视': 'guizhou',
-        '河北卫视': 'hebei',
-        '福建卫视': 'fujian',
-        '东南卫视': 'dongnan',
-        '海南卫视': 'hainan',
-        '云南卫视': 'yunnan',
-        '吉林卫视': 'jilin',
-        '内蒙古卫视': 'neimeng',
-        '甘肃卫视': 'gansu',
-        '宁夏卫视': 'ningxia',
-        '青海卫视': 'qinghai',
-        '西藏卫视': 'xizang',
-        '新疆卫视': 'xinjiang',
-        '凤凰中文': 'fenghuangzhongwen',
-        '凤凰资讯': 'fenghuangzixun',
-        '翡翠台': 'tvb',
-        'TVB翡翠台': 'tvb',
-        '明珠台': 'pearl',
-        'Pearl明珠台': 'pearl',
-        'TVBS新闻': 'tvbs',
-        '无线新闻': 'tvbnews',
-        '湖南都市': 'hunandushi',
-        '湖南经视': 'hunanjingshi',
-        '湖南娱乐': 'hunanyule',
-        '金鹰纪实': 'jinyingjishi',
-        '快乐垂钓': 'kuailechuidiao'
-    }
-    
+    """根据频道名称获取对应的频道ID（别名、繁简、全半角和清晰度后缀见 config/channels.txt）"""
+    entry = get_registry().lookup(name)
+    if entry:
+        return entry.id
+
     # 清理频道名称
     name = name.upper().strip()
-    
-    # 尝试直接匹配
-    if name in channel_ids:
-        return channel_ids[name]
-    
-    # 处理CCTV频道
+
+    # 注册表中没有的CCTV频道
     if 'CCTV' in name:
         number = ''.join(filter(str.isdigit, name))
         if number:
             return f'cctv{number}'
-    
-    # 处理卫视频道
-    if '卫视' in name:
-        province = name.replace('卫视', '').strip()
-        pinyin = {
-            '北京': 'beijing',
-            '东方': 'dongfang',
-            '浙江': 'zhejiang',
-            '江苏': 'jiangsu',
-            '湖南': 'hunan',
-            '安徽': 'anhui',
-            # ... 可以添加更多拼音映射
-        }
-        if province in pinyin:
-            return pinyin[province]
-    
+
     # 如果没有匹配到，返回小写的频道名
     return name.lower()
 
-def filter_channels(channels, include_list):
-    filtered_channels = []
+def build_include_index(include_list):
+    """解析 include_list，返回 频道名称变体 -> (标准名称, 分组) 的映射"""
+    index = {}
     current_group = None
-    channel_group_mapping = {}
-    channel_name_mapping = {}  # 存储标准频道名映射
-    processed_channels = set()  # 用于去重
-    channel_variants = {}  # 存储频道名称的不同变体
-    allowed_channels = set()  # 存储允许的频道名称变体
-    
-    # 解析 include_list 中的分组信息和频道名称
     for line in include_list:
         line = line.strip()
         if line.startswith('group:'):
             current_group = line.replace('group:', '').strip()
         elif line and current_group:
-            # 获取频道名称的所有变体
-            original_name = line  # 保存原始名称作为标准名称
-            variants = normalize_channel_name(line)
-            for variant in variants:
-                channel_variants[variant] = current_group
-                channel_name_mapping[variant] = original_name  # 记录标准名称映射
-                allowed_channels.add(variant)  # 添加到允许的频道列表
-    
+            standard_name = line.split('/')[0]  # 使用第一个名称作为标准名称
+            for variant in normalize_channel_name(line):
+                index[variant] = (standard_name, current_group)
+    return index
+
+
+def match_channel_name(name, index):
+    """在 include_list 索引中查找频道名称，未匹配返回 None"""
+    # 优先精确匹配，避免集合遍历顺序导致 CCTV-5+ 被匹配成 CCTV-5
+    if name in index:
+        return index[name]
+    for variant in normalize_channel_name(name):
+        if variant in index:
+            return index[variant]
+    return None
+
+
+def match_channel_names(names, include_list):
+    """批量匹配频道名称（可在子进程中执行），返回与 names 对齐的匹配结果列表"""
+    index = build_include_index(include_list)
+    return [match_channel_name(name, index) for name in names]
+
+
+def get_tvg_info(channel_name):
+    """根据频道名称生成播放列表中的 tvg-id 和台标地址"""
+    entry = get_registry().lookup(channel_name)
+    # 注册表的 tvg-id 和台标只用于频道的标准名称；别名（如 TVB翡翠台、無線新聞台）沿用按名称生成的 tvg-id，
+    # 已发布的播放列表和外部 EPG 的对应关系保持不变
+    if entry and channel_name in (entry.name, entry.tvg_id):
+        return entry.tvg_id, entry.logo
+    # 对于CCTV频道，去掉tvg-id和logo URL中的连字符
+    if 'CCTV-' in channel_name:
+        logo_name = channel_name.replace('-', '')
+        return logo_name.replace(' ', '_'), f"https://live.izbds.com/logo/{logo_name}.png"
+    return channel_name.replace(' ', '_'), f"https://live.izbds.com/logo/{channel_name}.png"
+
+
+async def update_epg(channels):
+    """下载完整EPG（有效期内不重复下载），提取已发布频道的节目单生成精简的 gzip XMLTV"""
+    published_channels = {}
+    for channel in channels:
+        channel_name = channel['name'].split('/')[0].strip()
+        published_channels.setdefault(get_tvg_info(channel_name)[0], channel_name)
+    if not published_channels:
+        logging.warning("没有已发布的频道，跳过EPG生成")
+        return
+    if not await fetch_epg(config_instance.epg_source_url, constants.epg_source_path,
+                           max_age=config_instance.epg_max_age):
+        logging.error("没有可用的EPG源文件，跳过EPG生成")
+        return
+    try:
+        await run_cpu_bound(build_filtered_epg, constants.epg_source_path, published_channels,
+                            constants.epg_result_path, get_channel_id)
+    except Exception as e:
+        logging.error(f"生成精简EPG失败: {e}")
+
+
+def filter_channels(channels, include_list, name_matches=None):
+    """按 include_list 过滤并重新分组频道
+
+    name_matches 为预先计算好的 大写频道名 -> 匹配结果 映射（见 filter_channels_async），
+    未提供时在当前线程内匹配。
+    """
+    filtered_channels = []
+    processed_channels = set()  # 用于去重
+    index = build_include_index(include_list)
+    if name_matches is None:
+        name_matches = {}
+
     # 过滤并重新分组频道
     for channel in channels:
         original_name = channel['name'].strip()
         name = original_name.upper()  # 转换为大写以进行比较
         url = channel['url'].strip()
-        
+
         # 生成唯一标识（频道名+URL）
         channel_id = f"{name}_{url}"
-        
+
         # 跳过已处理的频道
         if channel_id in processed_channels:
             continue
-            
-        # 获取当前频道名称的所有可能变体
-        current_variants = normalize_channel_name(name)
-        
-        # 检查频道名是否匹配任何允许的变体
-        matched = False
-        for variant in current_variants:
-            if variant in allowed_channels:  # 只处理允许的频道
-                standard_name = channel_name_mapping[variant].split('/')[0]  # 使用第一个名称作为标准名称
-                channel['group_title'] = f"{channel_variants[variant]}#genre#"
-                channel['name'] = standard_name
-                filtered_channels.append(channel)
-                processed_channels.add(channel_id)
-                matched = True
-                break
-            
+
+        if name in name_matches:
+            match = name_matches[name]
+        else:
+            match = name_matches[name] = match_channel_name(name, index)
+
+        # 只处理允许的频道，并按已知分辨率过滤
+        if match and is_resolution_allowed(channel):
+            standard_name, group = match
+            channel['group_title'] = f"{group}#genre#"
+            channel['name'] = standard_name
+            filtered_channels.append(channel)
+            processed_channels.add(channel_id)
+
     return filtered_channels
 
 
+def is_resolution_allowed(channel):
+    """开启分辨率过滤时，丢弃已知分辨率低于 min_resolution_value（宽×高像素数）的源；分辨率未知的源保留"""
+    if not config_instance.open_filter_resolution or config_instance.min_resolution_value <= 0:
+        return True
+    resolution_value = channel.get('resolution_value')
+    return not resolution_value or resolution_value >= config_instance.min_resolution_value
+
+
+async def probe_channels_metadata(channels, cache, deadline=None):
+    """探测尚未缓存的视频流元数据（分辨率、编码、帧率、码率），结果写入缓存"""
+    to_probe = [channel for channel in channels if not cache.has(channel['url'])]
+    if not to_probe:
+        return
+    logging.info(f"开始探测视频流元数据，共 {len(to_probe)} 个源（已缓存 {len(channels) - len(to_probe)} 个）")
+    probed = 0
+
+    async with aiohttp.ClientSession() as session:
+        async def probe(channel):
+            nonlocal probed
+            metadata = await probe_stream_metadata(
+                session, channel['url'], fetch=lambda target, **kwargs: redirect_resolver.get(session, target, **kwargs))
+            # 失败结果也写入缓存（有效期较短），避免每次运行重复调用 ffprobe
+            cache.put(channel['url'], metadata)
+            if metadata:
+                probed += 1
+
+        await run_with_deadline(to_probe, probe, concurrency=config_instance.metadata_probe_concurrency,
+                                deadline=deadline)
+    cache.save()
+    logging.info(f"元数据探测完成，成功获取 {probed} 个源的分辨率信息")
+
+
+# CPU 密集任务（解析、名称匹配）使用的执行器
+_cpu_executor = None
+
+
+def get_cpu_executor():
+    """获取 CPU 密集任务执行器，自由线程（无 GIL）构建下使用线程池，否则使用进程池"""
+    global _cpu_executor
+    if _cpu_executor is None:
+        workers = config_instance.parse_workers or os.cpu_count() or 1
+        gil_enabled = getattr(sys, '_is_gil_enabled', lambda: True)()
+        if gil_enabled:
+            _cpu_executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            _cpu_executor = ThreadPoolExecutor(max_workers=workers)
+        logging.info(f"解析执行器: {type(_cpu_executor).__name__}，工作进程/线程数: {workers}")
+    return _cpu_executor
+
+
+def shutdown_cpu_executor():
+    global _cpu_executor
+    if _cpu_executor is not None:
+        _cpu_executor.shutdown(cancel_futures=True)
+        _cpu_executor = None
+
+
+async def run_cpu_bound(func, *args):
+    """在执行器中运行 CPU 密集函数；parse_workers=1 时直接在当前线程运行"""
+    if config_instance.parse_workers == 1:
+        return func(*args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_cpu_executor(), func, *args)
+
+
+# 紧凑的频道元组字段顺序，子进程只回传元组以减少序列化开销
+COMPACT_CHANNEL_FIELDS = ('name', 'url', 'tvg_id', 'tvg_name', 'tvg_logo', 'group_title')
+
+
+def parse_content_compact(content):
+    """识别订阅内容格式并解析（可在子进程中执行），返回频道元组列表"""
+    if '#EXTM3U' in content:
+        channels = parse_m3u_content(content)
+    else:
+        channels = parse_txt_content(content)
+    return [tuple(channel.get(field) for field in COMPACT_CHANNEL_FIELDS) for channel in channels]
+
+
+def expand_compact_channels(rows):
+    """将紧凑的频道元组还原为频道字典"""
+    channels = []
+    for row in rows:
+        channel = dict(zip(COMPACT_CHANNEL_FIELDS, row))
+        channel['response_time'] = float('inf')
+        channels.append(channel)
+    return channels
+
+
+async def parse_content_async(content):
+    """在执行器中解析订阅内容，不阻塞事件循环"""
+    rows = await run_cpu_bound(parse_content_compact, content)
+    return expand_compact_channels(rows)
+
+
+async def filter_channels_async(channels, include_list):
+    """在执行器中并行匹配频道名称，再在当前线程按匹配结果过滤"""
+    names = list({channel['name'].strip().upper() for channel in channels})
+    name_matches = {}
+    if names:
+        workers = config_instance.parse_workers or os.cpu_count() or 1
+        chunk_size = max(1000, len(names) // (workers * 4) + 1)
+        chunks = [names[i:i + chunk_size] for i in range(0, len(names), chunk_size)]
+        results = await asyncio.gather(*(run_cpu_bound(match_channel_names, chunk, include_list) for chunk in chunks))
+        for chunk, matches in zip(chunks, results):
+            name_matches.update(zip(chunk, matches))
+    return filter_channels(channels, include_list, name_matches=name_matches)
+
+
+def build_probe_priority(include_list, test_channels, history, low_value_sources=()):
+    """构造测速优先级排序键：config/test.txt 中的频道和 include_list 第一个分组最先，
+    其次是 include_list 中的其他频道，不在 include_list 中的频道最后；
+    同一级别内来自低产出订阅源（low_value_sources）的源靠后，再按历史可用率从高到低排序"""
+    index = build_include_index(include_list)
+    test_set = {name.split('/')[0].strip() for name in test_channels}
+    first_group = next((line.strip().replace('group:', '').strip() for line in include_list
+                        if line.strip().startswith('group:')), None)
+
+    def priority(channel):
+        match = match_channel_name(channel['name'].strip().upper(), index)
+        if match is None:
+            tier = 2
+        elif match[0] in test_set or match[1] == first_group:
+            tier = 0
+        else:
+            tier = 1
+        return (tier, channel.get('source') in low_value_sources, -history.score(channel['url']))
+
+    return priority
+
+
 def get_group_order_from_include_list(include_list):
     """从 include_list 中获取分组顺序和每个分组内的频道顺序"""
     groups = []
@@ -389,23 +610,125 @@ def get_group_order_from_include_list(include_list):
     return groups, channel_order
 
 
+def make_channel_sort_key(channel_order, test_channels_set):
+    """构造分组内频道的排序键
+
+    测速频道依次比较：速度（按卡顿率折算）、是否镜像源、历史评分、视频流响应时间、分辨率。
+    历史评分放在响应时间之前：单次测得的响应时间波动较大，速度相同（包括都未测到速度）时以长期表现为准。
+    """
+    def channel_sort_key(channel):
+        channel_name = channel['name'].split('/')[0].strip()
+        # 首先按照include_list中的顺序排序
+        list_order = channel_order.get(channel_name, float('inf'))
+        # 已知分辨率的源，同等条件下分辨率高的排在前面
+        resolution_value = channel.get('resolution_value', 0)
+        # 开启历史归档时，长期表现好的源排在前面（未开启时为 0，不影响排序）
+        history_score = channel.get('history_score', 0)
+        
+        # 如果是测速频道，还要考虑速度排序
+        if channel_name in test_channels_set:
+            stream_time = channel.get('stream_response_time', float('inf'))
+            # 做过播放测试的源按卡顿率折算速度
+            speed = channel.get('speed', 0) * (1 - channel.get('rebuffer_ratio', 0))
+            # 镜像源沿用代表的测速结果，与代表并列时代表排在前面
+            is_mirror = 'mirror_of' in channel
+            # 对于相同频道名称的源，按速度、历史评分和响应时间排序
+            return (list_order, -speed, is_mirror, -history_score, stream_time, -resolution_value)
+        
+        return (list_order, 0, False, -history_score, float('inf'), -resolution_value)
+
+    return channel_sort_key
+
+
+def apply_history_scores(channels, history):
+    """把历史归档中按时间衰减计算的评分写入频道（history_score），供排序使用"""
+    if history.archive is None:
+        return
+    scores = history.archive.scores(half_life_days=config_instance.history_half_life,
+                                    percentile=config_instance.history_speed_percentile)
+    for channel in channels:
+        channel['history_score'] = scores.get(channel['url'], 0.0)
+
+
+async def soak_top_sources(channels, test_channels, include_list, deadline=None):
+    """对每个测速频道排名前 soak_top_n 的可用源进行播放测试"""
+    duration = config_instance.soak_duration
+    if deadline and deadline - time.monotonic() < duration:
+        logging.warning("剩余时间预算不足，跳过播放测试")
+        return
+    test_names = {name.split('/')[0].strip() for name in test_channels}
+    sort_key = make_channel_sort_key(get_group_order_from_include_list(include_list)[1], test_names)
+    by_name = {}
+    for channel in sorted(channels, key=sort_key):
+        if channel['name'] in test_names and channel.get('speed', 0) > 0.01:
+            by_name.setdefault(channel['name'], []).append(channel)
+    # 先排各频道的第一名，再排第二名……时间预算不足时优先保留排名靠前的源
+    candidates = [sources[rank] for rank in range(config_instance.soak_top_n)
+                  for sources in by_name.values() if rank < len(sources)]
+    if deadline:
+        # 每批 soak_concurrency 个源，每批耗时 duration，只保留剩余时间内能跑完的批次
+        batches = int((deadline - time.monotonic()) // duration)
+        if len(candidates) > batches * config_instance.soak_concurrency:
+            logging.warning(f"剩余时间预算只够 {batches} 批播放测试，跳过 "
+                            f"{len(candidates) - batches * config_instance.soak_concurrency} 个源")
+            candidates = candidates[:batches * config_instance.soak_concurrency]
+    if not candidates:
+        return
+    logging.info("\n==================== 播放测试 ====================")
+    logging.info(f"对 {len(by_name)} 个频道的 {len(candidates)} 个源进行 {duration} 秒播放测试")
+    async with aiohttp.ClientSession() as session:
+        await soak_channels(candidates, lambda target, **kwargs: redirect_resolver.get(session, target, **kwargs),
+                            duration=duration, concurrency=config_instance.soak_concurrency,
+                            stall_threshold=config_instance.soak_stall_threshold)
+
+
+def build_failover_sources(channels, sort_key):
+    """按排序整理每个频道的候选源（频道ID -> 名称和源列表），供 Web 服务的 /play 接口故障切换
+
+    测速可用的源排在前面；只运行第二阶段时大部分频道没有测速结果，这些源按排名排在后面而不是丢弃，
+    由 Web 服务的后台检查确认是否可用。
+    """
+    ranked = {}
+    for channel in sorted(sorted(channels, key=sort_key), key=lambda channel: not is_live(channel)):
+        channel_name = channel['name'].split('/')[0].strip()
+        entry = ranked.setdefault(get_channel_id(channel_name), {'name': channel_name, 'sources': []})
+        if len(entry['sources']) < config_instance.failover_max_sources:
+            entry['sources'].append(channel['url'])
+    return ranked
+
+
+def build_play_channels(channels, ranked_sources, base_url):
+    """每个频道只保留一条指向 /play/<频道ID> 的固定地址，由 Web 服务跳转到当前最好的源"""
+    play_channels = []
+    seen = set()
+    for channel in channels:
+        channel_id = get_channel_id(channel['name'].split('/')[0].strip())
+        if channel_id in ranked_sources and channel_id not in seen:
+            seen.add(channel_id)
+            play_channels.append({**channel, 'url': f"{base_url.rstrip('/')}/play/{quote(channel_id, safe='')}"})
+    return play_channels
+
+
 # 生成 M3U 文件，增加 EPG 回放支持
-def generate_m3u_file(channels, output_path, replay_days=7, custom_sort_order=None, include_list=None):
+def generate_m3u_file(channels, output_path, replay_days=7, custom_sort_order=None, include_list=None,
+                      test_channels=None):
     # 获取 include_list 中的分组顺序和频道顺序
     group_order, channel_order = get_group_order_from_include_list(include_list) if include_list else ([], {})
     
-    # 读取需要测速的频道列表
-    test_channels = []
-    try:
-        with open('config/test.txt', 'r', encoding='utf-8') as f:
-            test_channels = [line.strip() for line in f if line.strip()]
-    except FileNotFoundError:
-        logging.warning("未找到test.txt文件，跳过测速排序")
+    # 读取需要测速的频道列表（输出配置传入自己的测速列表）
+    if test_channels is None:
+        test_channels = []
+        try:
+            with open('config/test.txt', 'r', encoding='utf-8') as f:
+                test_channels = [line.strip() for line in f if line.strip()]
+        except FileNotFoundError:
+            logging.warning("未找到test.txt文件，跳过测速排序")
     
     test_channels_set = set(test_channels)
+    channel_sort_key = make_channel_sort_key(channel_order, test_channels_set)
     
     with open(output_path, 'w', encoding='utf-8') as f:
-        f.write('#EXTM3U x-tvg-url="https://epg.zbds.top/index.php"\n')
+        f.write(f'#EXTM3U x-tvg-url="{config_instance.epg_url}"\n')
         
         # 添加时间戳注释，确保每次生成文件内容不同
         current_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
@@ -434,52 +757,33 @@ def generate_m3u_file(channels, output_path, replay_days=7, custom_sort_order=No
             group = group_channels[group_title]
             
             # 对分组内的频道进行排序
-            def channel_sort_key(channel):
-                channel_name = channel['name'].split('/')[0].strip()
-                # 首先按照include_list中的顺序排序
-                list_order = channel_order.get(channel_name, float('inf'))
-                
-                # 如果是测速频道，还要考虑速度排序
-                if channel_name in test_channels_set:
-                    stream_time = channel.get('stream_response_time', float('inf'))
-                    speed = channel.get('speed', 0)
-                    # 对于相同频道名称的源，按速度和响应时间排序
-                    return (list_order, -speed, stream_time)
-                
-                return (list_order, 0, float('inf'))
-            
             sorted_group = sorted(group, key=channel_sort_key)
             
             for channel in sorted_group:
                 channel_name = channel['name']
                 # 构建EPG和台标信息
-                # 对于CCTV频道，去掉tvg-id和logo URL中的连字符
-                if 'CCTV-' in channel_name:
-                    logo_name = channel_name.replace('-', '')
-                    tvg_id = logo_name.replace(' ', '_')
-                    tvg_logo = f"https://live.izbds.com/logo/{logo_name}.png"
-                else:
-                    tvg_id = channel_name.replace(' ', '_')
-                    tvg_logo = f"https://live.izbds.com/logo/{channel_name}.png"
+                tvg_id, tvg_logo = get_tvg_info(channel_name)
                 
                 f.write(f'#EXTINF:-1 tvg-id="{tvg_id}" tvg-name="{channel_name}" tvg-logo="{tvg_logo}" group-title="{group_title}",{channel_name}\n')
                 f.write(f'{channel["url"]}\n')
 
 
 # 生成 TXT 文件
-def generate_txt_file(channels, output_path, custom_sort_order=None, include_list=None):
+def generate_txt_file(channels, output_path, custom_sort_order=None, include_list=None, test_channels=None):
     # 获取 include_list 中的分组顺序和频道顺序
     group_order, channel_order = get_group_order_from_include_list(include_list) if include_list else ([], {})
     
-    # 读取需要测速的频道列表
-    test_channels = []
-    try:
-        with open('config/test.txt', 'r', encoding='utf-8') as f:
-            test_channels = [line.strip() for line in f if line.strip()]
-    except FileNotFoundError:
-        logging.warning("未找到test.txt文件，跳过测速排序")
+    # 读取需要测速的频道列表（输出配置传入自己的测速列表）
+    if test_channels is None:
+        test_channels = []
+        try:
+            with open('config/test.txt', 'r', encoding='utf-8') as f:
+                test_channels = [line.strip() for line in f if line.strip()]
+        except FileNotFoundError:
+            logging.warning("未找到test.txt文件，跳过测速排序")
     
     test_channels_set = set(test_channels)
+    channel_sort_key = make_channel_sort_key(channel_order, test_channels_set)
     
     # 按分组标题分组
     group_channels = {}
@@ -510,20 +814,6 @@ def generate_txt_file(channels, output_path, custom_sort_order=None, include_lis
             group = group_channels[group_title]
             
             # 对分组内的频道进行排序
-            def channel_sort_key(channel):
-                channel_name = channel['name'].split('/')[0].strip()
-                # 首先按照include_list中的顺序排序
-                list_order = channel_order.get(channel_name, float('inf'))
-                
-                # 如果是测速频道，还要考虑速度排序
-                if channel_name in test_channels_set:
-                    stream_time = channel.get('stream_response_time', float('inf'))
-                    speed = channel.get('speed', 0)
-                    # 对于相同频道名称的源，按速度和响应时间排序
-                    return (list_order, -speed, stream_time)
-                
-                return (list_order, 0, float('inf'))
-            
             sorted_group = sorted(group, key=channel_sort_key)
             
             if group_title:
@@ -533,28 +823,86 @@ def generate_txt_file(channels, output_path, custom_sort_order=None, include_lis
             f.write('\n')
 
 
-async def test_stream_speed(session, url, timeout=5):
-    """使用aiohttp测试视频流速度"""
+async def render_profile(profile, base_channels, custom_sort_order=None):
+    """按一套输出配置生成 M3U / TXT：在共享的测速结果上使用自己的频道列表、分组顺序、测速列表和过滤条件，不重新测速
+
+    base_channels 为 (频道, 原始名称, 原始分组) 列表；filter_channels 会改写名称和分组，每套配置使用原始名称的副本。
+    """
+    copies = [{**channel, 'name': name, 'group_title': group_title} for channel, name, group_title in base_channels]
+    channels = [channel for channel in await filter_channels_async(copies, profile.include_list)
+                if profile.allows(channel)]
+    os.makedirs(profile.output_dir, exist_ok=True)
+    await asyncio.gather(
+        asyncio.to_thread(generate_m3u_file, channels, profile.m3u_path, custom_sort_order=custom_sort_order,
+                          include_list=profile.include_list, test_channels=profile.test_channels),
+        asyncio.to_thread(generate_txt_file, channels, profile.txt_path, custom_sort_order=custom_sort_order,
+                          include_list=profile.include_list, test_channels=profile.test_channels))
+    logging.info(f"已生成输出配置 {profile.name}: {profile.m3u_path}，共 {len(channels)} 个源")
+
+
+async def render_profiles(profiles, base_channels, custom_sort_order=None):
+    """并行生成所有输出配置的结果文件，某套配置失败不影响其他配置"""
+    results = await asyncio.gather(*(render_profile(profile, base_channels, custom_sort_order) for profile in profiles),
+                                   return_exceptions=True)
+    for profile, result in zip(profiles, results):
+        if isinstance(result, Exception):
+            logging.error(f"生成输出配置 {profile.name} 失败: {result}")
+
+
+def find_first_segment(m3u8_content, base_url):
+    """查找 m3u8 中第一个分片的地址，没有分片时返回 None"""
+    for line in m3u8_content.splitlines():
+        if line.strip() and not line.startswith('#'):
+            if line.startswith('http'):
+                return line
+            # 处理相对路径
+            if base_url.endswith('m3u8'):
+                base_url = base_url.rsplit('/', 1)[0]
+            if not base_url.endswith('/'):
+                base_url += '/'
+            return base_url + line
+    return None
+
+
+async def test_stream_speed(session, url, timeout=5, fetch=None, governor=None):
+    """使用aiohttp测试视频流速度
+
+    fetch(url, timeout=..., remember=...) 返回异步上下文管理器，默认通过重定向解析器使用 session 请求，HTTP/2 探测时替换为对应的客户端。
+    分片地址只请求一次，remember=False 不写入重定向缓存。
+    governor 为 BandwidthGovernor 时，下载限制在分配的带宽份额内，速度最高按份额计。
+    开启 open_ts_analyzer 时同时分析下载的 MPEG-TS 数据，结构异常的流判定为失败，其余结果附带 ts_* 质量指标。
+    """
+    if fetch is None:
+        fetch = lambda target, **kwargs: redirect_resolver.get(session, target, **kwargs)
     try:
         logging.info(f"开始测试视频流: {url}")
-        start_time = time.time()
-        total_size = 0
-        chunk_size = 8192  # 8KB chunks
+        start_time = time.monotonic()
+        # RTSP / RTMP 无法用 HTTP 读取，握手成功即认为可用，给一个较低的评分
+        if get_stream_protocol(url) in (RTSP, RTMP):
+            result = await probe_stream(session, url, timeout=timeout)
+            if result['success']:
+                result['speed'] = 0.1
+            return result
+        analyzer = TsAnalyzer(config_instance.ts_analyzer_bytes) if config_instance.open_ts_analyzer else None
+        sampler = ThroughputSampler(duration=timeout, max_bytes=config_instance.stream_sample_max_bytes,
+                                    stall_threshold=config_instance.stream_stall_threshold,
+                                    throttle=governor.throttle() if governor else None, analyzer=analyzer)
+        # 总时长即采样时长保持不变，连接和等待数据的超时按主机学习
+        def request_timeout(target):
+            return aiohttp.ClientTimeout(total=timeout, sock_connect=host_timeouts.timeout(target, CONNECT, timeout),
+                                         sock_read=host_timeouts.timeout(target, FIRST_BYTE, timeout))
         
-        async with session.get(url, timeout=timeout) as response:
+        # 重定向由解析器统一处理（限制跳转次数并缓存最终地址）
+        async with fetch(url, timeout=request_timeout(url)) as response:
             if response.status != 200:
-                # 对于某些特殊状态码，我们认为可能是临时性的
-                if response.status in [301, 302, 307, 308]:
-                    location = response.headers.get('Location')
-                    if location:
-                        return await test_stream_speed(session, location, timeout)
-                
                 logging.warning(f"视频流响应状态码异常: {response.status}")
                 return {
                     'success': False,
-                    'response_time': time.time() - start_time,
+                    'response_time': time.monotonic() - start_time,
                     'error': f'HTTP status {response.status}'
                 }
+            # 只学习正常响应的首字节时间，快速返回的 403/404 会把超时压得过低
+            host_timeouts.observe(url, FIRST_BYTE, time.monotonic() - start_time)
             
             content_type = response.headers.get('content-type', '').lower()
             
@@ -562,37 +910,19 @@ async def test_stream_speed(session, url, timeout=5):
             if 'application/vnd.apple.mpegurl' in content_type or 'm3u8' in content_type or url.endswith('.m3u8'):
                 try:
                     m3u8_content = await response.text()
-                    # 查找第一个.ts文件链接
-                    ts_url = None
-                    for line in m3u8_content.splitlines():
-                        if line.strip() and not line.startswith('#'):
-                            if line.startswith('http'):
-                                ts_url = line
-                            else:
-                                # 处理相对路径
-                                base_url = str(response.url)
-                                if base_url.endswith('m3u8'):
-                                    base_url = base_url.rsplit('/', 1)[0]
-                                if not base_url.endswith('/'):
-                                    base_url += '/'
-                                ts_url = base_url + line
-                            break
+                    ts_url = find_first_segment(m3u8_content, str(response.url))
                     
                     if ts_url:
                         logging.info(f"测试m3u8分片: {ts_url}")
                         try:
-                            async with session.get(ts_url, timeout=timeout) as ts_response:
+                            async with fetch(ts_url, timeout=request_timeout(ts_url), remember=False) as ts_response:
                                 if ts_response.status == 200:
-                                    chunk_start_time = time.time()
-                                    async for chunk in ts_response.content.iter_chunked(chunk_size):
-                                        total_size += len(chunk)
-                                        if time.time() - chunk_start_time > timeout:
-                                            break
+                                    await sampler.sample(ts_response.content, start=start_time)
                                 else:
                                     # 即使分片请求失败，我们也不立即判定为失败
                                     return {
                                         'success': True,
-                                        'response_time': time.time() - start_time,
+                                        'response_time': time.monotonic() - start_time,
                                         'speed': 0.1,
                                         'error': None
                                     }
@@ -600,7 +930,7 @@ async def test_stream_speed(session, url, timeout=5):
                             # 分片测试失败，但m3u8已经成功获取
                             return {
                                 'success': True,
-                                'response_time': time.time() - start_time,
+                                'response_time': time.monotonic() - start_time,
                                 'speed': 0.1,
                                 'error': None
                             }
@@ -608,7 +938,7 @@ async def test_stream_speed(session, url, timeout=5):
                         # m3u8解析成功但没有找到分片，仍然认为是可用的
                         return {
                             'success': True,
-                            'response_time': time.time() - start_time,
+                            'response_time': time.monotonic() - start_time,
                             'speed': 0.1,
                             'error': None
                         }
@@ -617,31 +947,45 @@ async def test_stream_speed(session, url, timeout=5):
                     # m3u8解析失败但获取成功，给一个较低的评分
                     return {
                         'success': True,
-                        'response_time': time.time() - start_time,
+                        'response_time': time.monotonic() - start_time,
                         'speed': 0.05,
                         'error': f'M3U8 parse error: {str(e)}'
                     }
             else:
                 # 对于非m3u8文件，直接测试流速度
-                chunk_start_time = time.time()
-                async for chunk in response.content.iter_chunked(chunk_size):
-                    total_size += len(chunk)
-                    if time.time() - chunk_start_time > timeout:
-                        break
+                await sampler.sample(response.content, start=start_time)
             
-            end_time = time.time()
-            elapsed_time = end_time - start_time
-            speed = total_size / (1024 * 1024 * elapsed_time)  # MB/s
+            elapsed_time = sampler.elapsed
+            speed = governor.normalize(sampler.speed) if governor else sampler.speed  # MB/s
             
             logging.info(f"视频流测试完成 - URL: {url}")
             logging.info(f"响应时间: {elapsed_time:.2f}秒")
             logging.info(f"下载速度: {speed:.2f} MB/s")
+            if sampler.stalls:
+                logging.info(f"停顿: {len(sampler.stalls)} 次，共 {sampler.stall_time:.2f} 秒")
+
+            quality = {}
+            if analyzer:
+                quality = analyzer.report()
+                if quality['ts_valid'] is False:
+                    logging.warning(f"MPEG-TS 结构异常: {url} - {', '.join(analyzer.problems())}")
+                    return {
+                        'success': False,
+                        'response_time': elapsed_time,
+                        'error': f"Invalid MPEG-TS: {', '.join(analyzer.problems())}",
+                        **quality
+                    }
+                if quality.get('ts_rtf') is not None:
+                    logging.info(f"TS 分析: 连续计数错误 {quality['ts_cc_errors']} 次，"
+                                 f"码率 {quality['ts_bitrate'] / 1000000:.2f} Mbps，实时倍速 {quality['ts_rtf']:.2f}x")
             
             return {
                 'success': True,
                 'response_time': elapsed_time,
                 'speed': speed,
-                'error': None
+                'error': None,
+                **sampler.report(),
+                **quality
             }
             
     except asyncio.TimeoutError:
@@ -660,67 +1004,103 @@ async def test_stream_speed(session, url, timeout=5):
             'error': str(e)
         }
 
-async def test_specific_channels_speed(session, channels, test_channels_list):
-    """测试特定频道列表中的频道速度"""
+async def test_specific_channels_speed(session, channels, test_channels_list, stream_tester=None, concurrency=10,
+                                      deadline=None, history=None, top_k=0):
+    """测试特定频道列表中的频道速度
+
+    stream_tester 默认为本地的 test_stream_speed，分布式模式下替换为提交到协调器的函数。
+    deadline 为截止时间（time.monotonic()），到期后未测试的源保留默认的最低评分；
+    测试顺序为各频道轮流取历史表现最好的源，保证每个频道都能先测到最有希望的源。
+    top_k > 0 时，某个频道已有 top_k 个源达到 top_k_min_speed / top_k_max_response_time 标准后，
+    该频道剩余的源推迟测试，仅在设置了时间预算且尚有剩余时间时才继续测试。
+    """
+    if stream_tester is None:
+        stream_tester = test_stream_speed
     test_channels_set = set(test_channels_list)
     test_results = {}
     
     total_channels = sum(1 for channel in channels if channel['name'].split('/')[0].strip() in test_channels_set)
     tested_channels = 0
+    good_counts = {}  # 频道名称 -> 达到标准的源数量
+    deferred = []  # 因已找到足够好的源而推迟测试的源
     
     logging.info(f"开始测试指定频道，共 {total_channels} 个频道需要测试")
     
-    # 创建信号量来限制并发数
-    sem = asyncio.Semaphore(10)  # 限制最大并发数为10
-    
-    async def test_single_channel(channel):
+    async def test_single_channel(channel, allow_defer=True):
         nonlocal tested_channels
         channel_name = channel['name'].split('/')[0].strip()
+
+        if allow_defer and top_k and good_counts.get(channel_name, 0) >= top_k:
+            deferred.append(channel)
+            return
+
+        tested_channels += 1
+        logging.info(f"正在测试第 {tested_channels}/{total_channels} 个频道: {channel_name}")
         
-        async with sem:  # 使用信号量控制并发
-            tested_channels += 1
-            logging.info(f"正在测试第 {tested_channels}/{total_channels} 个频道: {channel_name}")
-            
-            if channel_name not in test_results:
-                test_results[channel_name] = []
-            
-            # 保留原有的HTTP响应时间
-            http_response_time = channel.get('response_time', float('inf'))
-            logging.info(f"频道 {channel_name} 的HTTP响应时间: {http_response_time:.2f}秒")
-            
-            # 使用新的流媒体测试方法
-            result = await test_stream_speed(session, channel['url'])
-            
-            # 无论成功与否都记录结果
-            speed = result.get('speed', 0)
-            response_time = result.get('response_time', float('inf'))
-            
-            # 如果测试失败，给予较低的评分而不是丢弃
-            if not result['success']:
-                speed = 0.01  # 给予一个很低的速度
-                response_time = float('inf')  # 响应时间设为最大
-                
-            logging.info(f"频道 {channel_name} 测试完成")
-            logging.info(f"HTTP响应时间: {http_response_time:.2f}秒, 视频流响应时间: {response_time:.2f}秒, 速度: {speed:.2f} MB/s")
+        if channel_name not in test_results:
+            test_results[channel_name] = []
+        
+        # 保留原有的HTTP响应时间
+        http_response_time = channel.get('response_time', float('inf'))
+        logging.info(f"频道 {channel_name} 的HTTP响应时间: {http_response_time:.2f}秒")
+        
+        # 使用新的流媒体测试方法
+        result = await stream_tester(session, channel['url'])
+        # TS 分析的质量指标（ts_valid、ts_cc_errors、ts_rtf 等）保存到频道
+        channel.update({key: value for key, value in result.items() if key.startswith('ts_')})
+        
+        # 无论成功与否都记录结果
+        speed = result.get('speed', 0)
+        response_time = result.get('response_time', float('inf'))
+        
+        if history is not None:
+            history.record(channel['url'], result['success'], response_time, speed, name=channel['name'])
+
+        # 如果测试失败，给予较低的评分而不是丢弃
+        if not result['success']:
+            speed = 0.01  # 给予一个很低的速度
+            response_time = float('inf')  # 响应时间设为最大
+        elif speed >= config_instance.top_k_min_speed and response_time <= config_instance.top_k_max_response_time:
+            good_counts[channel_name] = good_counts.get(channel_name, 0) + 1
             
-            test_results[channel_name].append({
-                'url': channel['url'],
-                'http_response_time': http_response_time,
-                'stream_response_time': response_time,
-                'speed': speed,
-                'channel': channel,
-                'error': result.get('error', None)
-            })
+        logging.info(f"频道 {channel_name} 测试完成")
+        logging.info(f"HTTP响应时间: {http_response_time:.2f}秒, 视频流响应时间: {response_time:.2f}秒, 速度: {speed:.2f} MB/s")
+        
+        test_results[channel_name].append({
+            'url': channel['url'],
+            'http_response_time': http_response_time,
+            'stream_response_time': response_time,
+            'speed': speed,
+            'channel': channel,
+            'error': result.get('error', None)
+        })
     
-    # 创建所有测试任务
-    test_tasks = []
+    # 按频道收集需要测试的源，并按历史可用率和第一阶段响应时间排序
+    sources_by_channel = {}
     for channel in channels:
         channel_name = channel['name'].split('/')[0].strip()
         if channel_name in test_channels_set:
-            test_tasks.append(test_single_channel(channel))
-    
-    # 并发执行所有测试任务
-    await asyncio.gather(*test_tasks)
+            sources_by_channel.setdefault(channel_name, []).append(channel)
+
+    rank = {}
+    for sources in sources_by_channel.values():
+        sources.sort(key=lambda ch: (-(history.score(ch['url']) if history else 0.5), ch.get('response_time', float('inf'))))
+        for i, channel in enumerate(sources):
+            rank[id(channel)] = i
+
+    # 在时间预算内按优先级并发执行所有测试任务
+    await run_with_deadline([ch for sources in sources_by_channel.values() for ch in sources],
+                            test_single_channel, concurrency=concurrency, deadline=deadline,
+                            priority=lambda ch: rank[id(ch)])
+
+    # 推迟的源只在时间预算有剩余时测试
+    if deferred:
+        if deadline is not None and time.monotonic() < deadline:
+            logging.info(f"已为各频道找到足够的优质源，利用剩余时间继续测试 {len(deferred)} 个推迟的源")
+            await run_with_deadline(deferred, lambda ch: test_single_channel(ch, allow_defer=False),
+                                    concurrency=concurrency, deadline=deadline, priority=lambda ch: rank[id(ch)])
+        else:
+            logging.info(f"Top-K模式：各频道已找到 {top_k} 个优质源，跳过 {len(deferred)} 个推迟的源")
     
     # 对每个频道的所有源进行排序，但保留所有源
     optimized_channels = []
@@ -751,14 +1131,86 @@ async def test_specific_channels_speed(session, channels, test_channels_list):
     return optimized_channels
 
 
+async def create_bandwidth_governor(channels, test_channels, sessions, http2_prober=None):
+    """创建测速带宽调度器：总带宽取 bandwidth_limit（MB/s），未设置时先估算链路容量，取其 bandwidth_probe_ratio 比例，
+    其余带宽留给正常观看；估算失败时返回 None（不限速）"""
+    total_rate = config_instance.bandwidth_limit * 1024 * 1024
+    if not total_rate:
+        # 每个主机取第一阶段响应最快的一个源同时下载，避免受单个服务器上行限制
+        test_channels_set = set(test_channels)
+        by_host = {}
+        for channel in sorted(channels, key=lambda ch: ch.get('response_time', float('inf'))):
+            if channel['name'].split('/')[0].strip() in test_channels_set and get_stream_protocol(channel['url']) is None:
+                by_host.setdefault(urlparse(channel['url']).hostname, channel)
+        candidates = list(by_host.values())[:config_instance.bandwidth_calibration_sources]
+        stream_tester = make_family_stream_tester(sessions, channels, http2_prober)
+        capacity = await calibrate_link_capacity([stream_tester(None, channel['url']) for channel in candidates])
+        if capacity is None:
+            logging.warning("链路容量估算失败，测速不限速")
+            return None
+        total_rate = capacity * config_instance.bandwidth_probe_ratio
+    governor = BandwidthGovernor(total_rate, config_instance.stream_test_concurrency)
+    logging.info(f"测速总带宽 {total_rate / (1024 * 1024):.2f} MB/s，每个测速 {governor.share / (1024 * 1024):.2f} MB/s")
+    return governor
+
+
+async def dedup_mirror_sources(channels, test_channels, fetch_for, history, deadline=None):
+    """对测速频道的源计算内容指纹，每个镜像簇只保留代表参加视频流测速，返回 (参加测速的源, 镜像簇)"""
+    test_channels_set = set(test_channels)
+    candidates = [channel for channel in channels
+                  if channel['name'].split('/')[0].strip() in test_channels_set and is_family_routable(channel)]
+    clusters = await cluster_mirrors(
+        candidates, fetch_for,
+        rank=lambda ch: (-history.score(ch['url']), ch.get('response_time', float('inf'))),
+        concurrency=config_instance.stream_test_concurrency,
+        sample_bytes=config_instance.mirror_fingerprint_bytes, deadline=deadline)
+    clusters = [members for members in clusters if len(members) > 1]
+    mirror_ids = {id(channel) for members in clusters for channel in members[1:]}
+    return [channel for channel in channels if id(channel) not in mirror_ids], clusters
+
+
+async def apply_mirror_results(session, clusters, test_channels, stream_tester, history, deadline=None):
+    """镜像源沿用代表的测速结果，排序时与代表相邻，作为代表失效时的备用源；
+    代表测速失败或未测到时，镜像源不一定失效，逐个单独测速"""
+    retest = []
+    for representative, *mirrors in clusters:
+        if representative.get('speed', 0) > 0.01:
+            for mirror in mirrors:
+                mirror['http_response_time'] = mirror.get('response_time', float('inf'))
+                mirror['stream_response_time'] = representative['stream_response_time']
+                mirror['speed'] = representative['speed']
+                mirror['mirror_of'] = representative['url']
+        else:
+            retest.extend(mirrors)
+    if not retest:
+        return []
+    logging.info(f"{len(retest)} 个镜像源的代表测速失败，单独测速")
+    return await test_specific_channels_speed(session, retest, test_channels, stream_tester=stream_tester,
+                                              concurrency=config_instance.stream_test_concurrency,
+                                              deadline=deadline, history=history, top_k=config_instance.top_k)
+
+
 async def main():
     # 解析命令行参数
     parser = argparse.ArgumentParser(description='IPTV频道测速和整理工具')
     parser.add_argument('--first_test', action='store_true', help='只执行第一次测速（HTTP响应时间测试）')
     parser.add_argument('--http_test', action='store_true', help='只执行第二次测速（视频流测速）')
     parser.add_argument('--ffmpeg_test', action='store_true', help='使用FFmpeg对指定频道进行测试')
+    parser.add_argument('--soak_test', action='store_true', help='第二阶段后对排名靠前的源进行长时间播放测试')
+    parser.add_argument('--coordinator', metavar='HOST:PORT', help='以协调器模式运行，把测速任务分发给工作节点')
+    parser.add_argument('--worker', metavar='URL', help='以工作节点模式运行，从指定协调器领取测速任务')
+    parser.add_argument('--epg', action='store_true', help='根据现有的 result.m3u 更新精简EPG')
+    parser.add_argument('--time_budget', type=int, default=None, help='测速总时间预算（秒），到期后停止测速并用已有结果生成文件')
     args = parser.parse_args()
 
+    # 工作节点模式：只执行协调器分发的测速任务
+    if args.worker:
+        worker_name = f"{socket.gethostname()}-{os.getpid()}"
+        logging.info(f"工作节点 {worker_name} 启动，协调器: {args.worker}")
+        await run_worker(args.worker, WORKER_HANDLERS, concurrency=config_instance.worker_concurrency,
+                         worker_name=worker_name)
+        return
+
     # 设置输入和输出文件路径
     subscribe_file = 'config/subscribe.txt'
     include_list_file = 'config/include_list.txt'
@@ -779,6 +1231,15 @@ async def main():
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
+    # 只更新EPG：从现有的结果文件中读取已发布的频道
+    if args.epg:
+        if not os.path.exists(output_m3u):
+            logging.error(f"找不到文件 {output_m3u}，请先运行测速生成该文件。")
+            return
+        with open(output_m3u, 'r', encoding='utf-8') as f:
+            await update_epg(parse_m3u_content(f.read()))
+        return
+
     # 如果是FFmpeg测试，只处理result.m3u文件中的指定频道
     if args.ffmpeg_test:
         # 读取需要用FFmpeg测试的频道列表
@@ -815,7 +1276,11 @@ async def main():
             return
             
         # 对这些频道进行FFmpeg测试
+        redirect_resolver.load()
+        host_timeouts.load()
         tested_channels = await test_channels_with_ffmpeg(channels_to_test)
+        redirect_resolver.save()
+        host_timeouts.save()
         
         # 更新原始频道列表中的测试结果
         updated_channels = []
@@ -885,96 +1350,291 @@ async def main():
         logging.info(f"✓ 保留频道总数: {len(updated_channels)} 个")
         return
 
+    # 读取上一阶段保存的重定向缓存和各主机的超时记录
+    redirect_resolver.load()
+    host_timeouts.load()
+
     # 读取订阅文件
     urls = read_subscribe_file(subscribe_file)
     if not urls:
         logging.error("订阅文件中没有有效的 URL。")
         return
 
+    # 订阅源贡献统计，可选跳过或降低长期零产出订阅源的优先级
+    subscription_stats = SubscriptionStats()
+    prune_runs = config_instance.prune_zero_yield_runs
+    low_value_sources = set()
+    if prune_runs:
+        if config_instance.prune_mode == 'skip':
+            skipped = [url for url in urls if subscription_stats.should_skip(url, prune_runs)]
+            if skipped:
+                logging.info(f"跳过连续 {prune_runs} 次以上没有可用频道的订阅源 {len(skipped)} 个: {', '.join(skipped)}")
+            urls = [url for url in urls if url not in skipped]
+        else:
+            low_value_sources = {url for url in urls if subscription_stats.is_low_value(url, prune_runs)}
+            # 低产出订阅源放到最后，去重时其他订阅源中的相同地址优先保留
+            urls = [url for url in urls if url not in low_value_sources] + [url for url in urls if url in low_value_sources]
+
     # 读取包含列表文件
     include_list = read_include_list_file(include_list_file)
     
     # 读取需要测速的频道列表
     test_channels = read_include_list_file(test_channels_file)
 
-    # 异步获取所有 URL 的内容
+    # 多套输出配置：一次测速所有配置的频道并集，测速完成后按各自的配置分别生成结果文件
+    profiles = []
+    if config_instance.open_profiles:
+        profiles = load_profiles(config_instance.profiles_file, constants.profiles_output_dir, test_channels_file)
+    probe_include_list = merge_lists(include_list, *(profile.include_list for profile in profiles))
+    probe_test_channels = merge_lists(test_channels, *(profile.test_channels for profile in profiles))
+
+    # 异步获取所有 URL 的内容，每个订阅下载完成后立即交给执行器解析，下载与解析重叠进行
+    # GitHub 上的订阅同时尝试多个镜像，取最先完整返回的内容
+    mirror_racer = None
+    if config_instance.open_mirror_race:
+        mirror_racer = MirrorRacer(cdn_prefix=config_instance.cdn_url, hedge_delay=config_instance.mirror_hedge_delay)
+        mirror_racer.load()
+
+    async def fetch_and_parse(session, url):
+        if mirror_racer:
+            async def fetch_content(target):
+                content, _ = await fetch_url(session, target)
+                return content or None
+
+            fetch_start = time.time()
+            content = await mirror_racer.fetch(url, fetch_content)
+            fetch_time = time.time() - fetch_start if content else float('inf')
+        else:
+            content, fetch_time = await fetch_url(session, url)
+        parse_start = time.time()
+        channels = await parse_content_async(content) if content else None
+        subscription_stats.record_fetch(url, content, fetch_time, time.time() - parse_start, channels or [])
+        return channels
+
     async with aiohttp.ClientSession() as session:
-        tasks = [fetch_url(session, url) for url in urls]
+        tasks = [fetch_and_parse(session, url) for url in urls]
         results = await asyncio.gather(*tasks)
+    if mirror_racer:
+        mirror_racer.save()
 
-    all_channels = []
-    for content, _ in results:
-        if content:
-            if '#EXTM3U' in content:
-                channels = parse_m3u_content(content)
-            else:
-                channels = parse_txt_content(content)
-            all_channels.append(channels)
+    # 保持订阅文件中的顺序，确保去重结果与串行解析一致
+    all_channels = [channels for channels in results if channels is not None]
 
     # 合并并去重频道
     unique_channels = merge_and_deduplicate(all_channels)
+    subscription_stats.count_unique(unique_channels)
 
-    # 如果是第一次测速或没有指定参数，执行HTTP响应时间测试
-    if args.first_test or (not args.first_test and not args.http_test):
-        # 测试每个频道的响应时间
-        async with aiohttp.ClientSession() as session:
-            logging.info("\n==================== 第一阶段：HTTP响应时间测试 ====================")
-            tasks = [test_channel_response_time(session, channel) for channel in unique_channels]
-            unique_channels = await asyncio.gather(*tasks)
-            
-            # 保存第一次测速结果（HTTP响应时间测试后）
-            filtered_channels_first = filter_channels(unique_channels, include_list)
-            generate_m3u_file(filtered_channels_first, output_first_test_m3u, custom_sort_order=custom_sort_order, include_list=include_list)
-            generate_txt_file(filtered_channels_first, output_first_test_txt, custom_sort_order=custom_sort_order, include_list=include_list)
-            logging.info("✅ 第一阶段测试完成，已保存HTTP响应时间测试结果。")
+    # 协调器模式：测速任务由工作节点执行，结果在本地合并排序
+    coordinator = None
+    # 工作节点在协调器关闭前会一直等待租约，出错退出时也要关闭
+    try:
+        if args.coordinator:
+            host, _, port = args.coordinator.rpartition(':')
+            coordinator = ProbeCoordinator(host or '0.0.0.0', int(port),
+                                           shard_size=config_instance.distributed_shard_size,
+                                           lease_timeout=config_instance.distributed_lease_timeout,
+                                           worker_timeout=config_instance.distributed_worker_timeout,
+                                           local_handlers=WORKER_HANDLERS,
+                                           local_concurrency=config_instance.worker_concurrency)
+            await coordinator.start()
+
+        # 时间预算：完整流程中第一阶段最多使用 first_test_budget_ratio 比例的预算，剩余留给第二阶段
+        time_budget = args.time_budget if args.time_budget is not None else config_instance.time_budget
+        deadline = make_deadline(time_budget)
+        phase1_deadline = deadline
+        if deadline and not args.first_test and not args.http_test:
+            phase1_deadline = make_deadline(time_budget * config_instance.first_test_budget_ratio)
+        archive = None
+        if config_instance.open_history_archive:
+            archive = create_history_archive(constants.history_archive_path,
+                                             max_age_days=config_instance.history_archive_days)
+        history = ProbeHistory(archive=archive)
+        metadata_cache = MetadataCache(ttl=config_instance.metadata_cache_ttl,
+                                       failure_ttl=config_instance.metadata_failure_ttl)
+        apply_cached_metadata(unique_channels, metadata_cache)
+
+        # 按主机解析地址族，用于分地址族测速和生成 IPv4 / IPv6 结果文件
+        if config_instance.open_ip_family_split or any(profile.ip_family for profile in profiles):
+            await classify_channels(unique_channels, deadline=phase1_deadline)
+        sessions = create_family_sessions([host_timeouts.trace_config()] if host_timeouts.enabled else None)
+        http2_prober = None
+        governor = None
+        try:
+            if config_instance.open_http2 and not coordinator:
+                http2_prober = create_http2_prober(unique_channels, redirect_resolver,
+                                                   min_channels=config_instance.http2_min_channels,
+                                                   max_redirects=config_instance.redirect_max_hops)
+
+            # 如果是第一次测速或没有指定参数，执行HTTP响应时间测试
+            if args.first_test or (not args.first_test and not args.http_test):
+                # 测试每个频道的响应时间
+                logging.info("\n==================== 第一阶段：HTTP响应时间测试 ====================")
+                # 本机没有路由的地址族直接跳过，不消耗超时时间
+                routable_channels = [channel for channel in unique_channels if is_family_routable(channel)]
+                if len(routable_channels) < len(unique_channels):
+                    logging.info(f"跳过 {len(unique_channels) - len(routable_channels)} 个本机无路由地址族的源")
+                if coordinator:
+                    probe = lambda channel: test_channel_response_time_remote(coordinator, channel)
+                    concurrency = len(unique_channels)
+                else:
+                    response_tester = test_channel_response_time_lean if config_instance.open_lean_probe else test_channel_response_time
+
+                    def probe_family(channel):
+                        if http2_prober and http2_prober.handles(channel['url']):
+                            return test_channel_response_time_h2(http2_prober, channel)
+                        return response_tester(sessions[get_probe_family(channel)], channel)
+
+                    async def probe(channel):
+                        await probe_family(channel)
+                        # 双栈源按 IPv4 测速，另外用 IPv6 确认可用后才进入 IPv6 输出
+                        if channel['response_time'] != float('inf') and needs_ipv6_probe(channel):
+                            ipv6_channel = {'name': channel['name'], 'url': channel['url'], 'ip_family': IPV6,
+                                            'response_time': float('inf')}
+                            await probe_family(ipv6_channel)
+                            channel['ipv6_verified'] = ipv6_channel['response_time'] != float('inf')
+                        return channel
+                    concurrency = config_instance.first_test_concurrency
+                unprobed = await run_with_deadline(routable_channels, probe, concurrency=concurrency, deadline=phase1_deadline,
+                                                   priority=build_probe_priority(probe_include_list, probe_test_channels, history,
+                                                                                 low_value_sources))
+                unprobed_ids = {id(channel) for channel in unprobed}
+                for channel in routable_channels:
+                    if id(channel) not in unprobed_ids:
+                        history.record(channel['url'], channel['response_time'] != float('inf'), channel['response_time'],
+                                       name=channel['name'])
+                history.save()
+                apply_history_scores(unique_channels, history)
+        
+                # 保存第一次测速结果（HTTP响应时间测试后）
+                filtered_channels_first = await filter_channels_async(unique_channels, include_list)
+                generate_m3u_file(filtered_channels_first, output_first_test_m3u, custom_sort_order=custom_sort_order, include_list=include_list)
+                generate_txt_file(filtered_channels_first, output_first_test_txt, custom_sort_order=custom_sort_order, include_list=include_list)
+                logging.info("✅ 第一阶段测试完成，已保存HTTP响应时间测试结果。")
         
-    # 如果是第二次测速或没有指定参数，执行视频流测速
-    if args.http_test or (not args.first_test and not args.http_test):
-        # 对特定频道进行测速
-        if test_channels:
-            async with aiohttp.ClientSession() as session:
-                logging.info("\n==================== 第二阶段：视频流测速 ====================")
-                logging.info(f"即将测试以下频道的视频流质量：{', '.join(test_channels)}")
-                optimized_channels = await test_specific_channels_speed(session, unique_channels, test_channels)
+            # 如果是第二次测速或没有指定参数，执行视频流测速
+            if args.http_test or (not args.first_test and not args.http_test):
+                # 对特定频道进行测速
+                if probe_test_channels:
+                    logging.info("\n==================== 第二阶段：视频流测速 ====================")
+                    logging.info(f"即将测试以下频道的视频流质量：{', '.join(probe_test_channels)}")
+                    if coordinator:
+                        optimized_channels = await test_specific_channels_speed(
+                            None, unique_channels, probe_test_channels,
+                            stream_tester=lambda _, url: coordinator.submit('stream_speed', url),
+                            concurrency=len(unique_channels) or 1, deadline=deadline, history=history,
+                            top_k=config_instance.top_k)
+                    else:
+                        if config_instance.open_bandwidth_governor:
+                            governor = await create_bandwidth_governor(unique_channels, probe_test_channels, sessions, http2_prober)
+                        stream_tester = make_family_stream_tester(sessions, unique_channels, http2_prober, governor)
+                        # 内容相同的镜像源只测速一个代表
+                        speed_channels, mirror_clusters = unique_channels, []
+                        if config_instance.open_mirror_dedup:
+                            speed_channels, mirror_clusters = await dedup_mirror_sources(
+                                unique_channels, probe_test_channels, make_family_fetch(sessions, http2_prober), history, deadline)
+                        optimized_channels = await test_specific_channels_speed(
+                            None, speed_channels, probe_test_channels, stream_tester=stream_tester,
+                            concurrency=config_instance.stream_test_concurrency, deadline=deadline, history=history,
+                            top_k=config_instance.top_k)
+                        optimized_channels += await apply_mirror_results(None, mirror_clusters, probe_test_channels,
+                                                                     stream_tester, history, deadline)
+                    history.save()
+                    apply_history_scores(unique_channels, history)
                 
-                # 更新原始频道列表中的响应时间
-                optimized_channels_dict = {f"{ch['name']}_{ch['url']}": ch for ch in optimized_channels}
-                for channel in unique_channels:
-                    channel_key = f"{channel['name']}_{channel['url']}"
-                    if channel_key in optimized_channels_dict:
-                        channel.update(optimized_channels_dict[channel_key])
-
-    # 过滤频道
-    filtered_channels = filter_channels(unique_channels, include_list)
-
-    # 生成最终的 M3U 和 TXT 文件
-    if args.http_test or (not args.first_test and not args.http_test):
-        if test_channels:
-            logging.info("\n生成最终文件（包含测速结果）...")
-            generate_m3u_file(filtered_channels, output_m3u, custom_sort_order=custom_sort_order, include_list=include_list)
-            generate_txt_file(filtered_channels, output_txt, custom_sort_order=custom_sort_order, include_list=include_list)
-            logging.info("✅ 第二阶段测试完成，已更新频道测速信息。")
-        else:
-            logging.warning("⚠️ 未找到需要测速的频道列表，跳过第二阶段测速。")
-
-    # 如果没有指定具体测试，则执行完整流程
-    if not args.first_test and not args.http_test:
-        logging.info("\n==================== 测速任务完成 ====================")
-        logging.info("✅ 已生成所有结果文件：")
-        logging.info(f"  - {output_first_test_m3u}：第一阶段HTTP测速结果")
-        logging.info(f"  - {output_first_test_txt}：第一阶段HTTP测速结果（TXT格式）")
-        logging.info(f"  - {output_m3u}：第二阶段视频流测速结果")
-        logging.info(f"  - {output_txt}：第二阶段视频流测速结果（TXT格式）")
-    elif args.first_test:
-        logging.info("\n==================== 第一阶段测速任务完成 ====================")
-        logging.info("✅ 已生成第一阶段测速结果文件：")
-        logging.info(f"  - {output_first_test_m3u}：HTTP响应时间测试结果")
-        logging.info(f"  - {output_first_test_txt}：HTTP响应时间测试结果（TXT格式）")
-    elif args.http_test:
-        logging.info("\n==================== 第二阶段测速任务完成 ====================")
-        logging.info("✅ 已生成第二阶段测速结果文件：")
-        logging.info(f"  - {output_m3u}：视频流测速结果")
-        logging.info(f"  - {output_txt}：视频流测速结果（TXT格式）")
+                    # 更新原始频道列表中的响应时间
+                    optimized_channels_dict = {f"{ch['name']}_{ch['url']}": ch for ch in optimized_channels}
+                    for channel in unique_channels:
+                        channel_key = f"{channel['name']}_{channel['url']}"
+                        if channel_key in optimized_channels_dict:
+                            channel.update(optimized_channels_dict[channel_key])
+        finally:
+            await close_family_sessions(sessions)
+            if http2_prober:
+                await http2_prober.close()
+
+        # 探测可用源的分辨率等元数据（已缓存且未过期的源不会重复探测）
+        if config_instance.open_metadata_probe and (args.http_test or (not args.first_test and not args.http_test)):
+            include_index = build_include_index(probe_include_list)
+            alive_channels = [channel for channel in unique_channels
+                              if (channel.get('response_time', float('inf')) != float('inf') or channel.get('speed', 0) > 0.01)
+                              and match_channel_name(channel['name'].strip().upper(), include_index)]
+            await probe_channels_metadata(alive_channels, metadata_cache, deadline=deadline)
+            apply_cached_metadata(unique_channels, metadata_cache)
+
+        # 频道质量趋势：对比最近一天与之前一周，列出正在变差的频道
+        if archive is not None:
+            degrading = archive.trend_report()
+            write_trend_report(constants.trend_report_path, degrading)
+            if degrading:
+                logging.info(f"⚠️ {len(degrading)} 个频道近期质量下降: {', '.join(item[0] for item in degrading[:10])}"
+                             f"，详见 {constants.trend_report_path}")
+
+        # 过滤频道（会改写频道名称和分组，输出配置需要原始名称）
+        profile_base = [(channel, channel['name'], channel['group_title']) for channel in unique_channels] if profiles else []
+        filtered_channels = await filter_channels_async(unique_channels, include_list)
+
+        # 对排名靠前的源做长时间播放测试，卡顿率计入排序
+        if (args.soak_test or config_instance.open_soak_test) and test_channels and (
+                args.http_test or (not args.first_test and not args.http_test)):
+            await soak_top_sources(filtered_channels, test_channels, include_list, deadline)
+        subscription_stats.count_matched(filtered_channels)
+        subscription_stats.count_winners(filtered_channels, make_channel_sort_key(
+            get_group_order_from_include_list(include_list)[1], set(test_channels)))
+
+        # 生成最终的 M3U 和 TXT 文件
+        if args.http_test or (not args.first_test and not args.http_test):
+            if test_channels:
+                logging.info("\n生成最终文件（包含测速结果）...")
+                generate_m3u_file(filtered_channels, output_m3u, custom_sort_order=custom_sort_order, include_list=include_list)
+                generate_txt_file(filtered_channels, output_txt, custom_sort_order=custom_sort_order, include_list=include_list)
+                # 按地址族分别生成 IPv4 / IPv6 结果文件
+                if config_instance.open_ip_family_split:
+                    for family, family_m3u in ((IPV4, constants.ipv4_result_path), (IPV6, constants.ipv6_result_path)):
+                        family_channels = [channel for channel in filtered_channels if channel_in_family(channel, family)]
+                        generate_m3u_file(family_channels, family_m3u, custom_sort_order=custom_sort_order, include_list=include_list)
+                        generate_txt_file(family_channels, family_m3u.replace('.m3u', '.txt'), custom_sort_order=custom_sort_order, include_list=include_list)
+                        logging.info(f"已生成{family.upper()}结果文件: {family_m3u}，共 {len(family_channels)} 个源")
+                # 保存每个频道的排名源列表，Web 服务的 /play 接口据此做故障切换
+                ranked_sources = build_failover_sources(filtered_channels, make_channel_sort_key(
+                    get_group_order_from_include_list(include_list)[1], set(test_channels)))
+                save_failover_sources(constants.failover_sources_path, ranked_sources)
+                if config_instance.open_play_url:
+                    play_channels = build_play_channels(filtered_channels, ranked_sources, config_instance.play_base_url)
+                    generate_m3u_file(play_channels, constants.play_result_path, custom_sort_order=custom_sort_order, include_list=include_list)
+                    logging.info(f"已生成固定地址播放列表: {constants.play_result_path}，共 {len(play_channels)} 个频道")
+                if config_instance.open_epg:
+                    await update_epg(filtered_channels)
+                logging.info("✅ 第二阶段测试完成，已更新频道测速信息。")
+            else:
+                logging.warning("⚠️ 未找到需要测速的频道列表，跳过第二阶段测速。")
+            if profiles:
+                await render_profiles(profiles, profile_base, custom_sort_order)
+
+        # 如果没有指定具体测试，则执行完整流程
+        if not args.first_test and not args.http_test:
+            logging.info("\n==================== 测速任务完成 ====================")
+            logging.info("✅ 已生成所有结果文件：")
+            logging.info(f"  - {output_first_test_m3u}：第一阶段HTTP测速结果")
+            logging.info(f"  - {output_first_test_txt}：第一阶段HTTP测速结果（TXT格式）")
+            logging.info(f"  - {output_m3u}：第二阶段视频流测速结果")
+            logging.info(f"  - {output_txt}：第二阶段视频流测速结果（TXT格式）")
+        elif args.first_test:
+            logging.info("\n==================== 第一阶段测速任务完成 ====================")
+            logging.info("✅ 已生成第一阶段测速结果文件：")
+            logging.info(f"  - {output_first_test_m3u}：HTTP响应时间测试结果")
+            logging.info(f"  - {output_first_test_txt}：HTTP响应时间测试结果（TXT格式）")
+        elif args.http_test:
+            logging.info("\n==================== 第二阶段测速任务完成 ====================")
+            logging.info("✅ 已生成第二阶段测速结果文件：")
+            logging.info(f"  - {output_m3u}：视频流测速结果")
+            logging.info(f"  - {output_txt}：视频流测速结果（TXT格式）")
+
+        redirect_resolver.save()
+        host_timeouts.save()
+        subscription_stats.finish(update_yield=args.first_test or not args.http_test)
+    finally:
+        if coordinator:
+            await coordinator.close()
 
 
 async def test_channels_with_ffmpeg(channels):
@@ -987,6 +1647,10 @@ async def test_channels_with_ffmpeg(channels):
     logging.info(f"FFmpeg测试开始时间: {current_time}")
     
     results = []
+    # 开启 TS 分析时先用测速下载的数据判断，能得出结论的源不再启动 FFmpeg（ffmpeg_deep_check 强制使用 FFmpeg）
+    analyzer_session = None
+    if config_instance.open_ts_analyzer and not config_instance.ffmpeg_deep_check:
+        analyzer_session = aiohttp.ClientSession()
     for i, channel in enumerate(channels):
         logging.info(f"正在测试第 {i+1}/{len(channels)} 个频道: {channel['name']}")
         
@@ -999,12 +1663,39 @@ async def test_channels_with_ffmpeg(channels):
         channel['test_time'] = current_time
 
         try:
+            # RTSP / RTMP 先做握手探测，服务器无响应时不再启动FFmpeg
+            if get_stream_protocol(channel['url']) in (RTSP, RTMP):
+                probe = await probe_stream(None, channel['url'])
+                if not probe['success'] and probe.get('status') is None:
+                    channel['ffmpeg_error'] = probe['error']
+                    logging.warning(f"握手失败，跳过FFmpeg测试: {channel['name']} - {probe['error']}")
+                    results.append(channel)
+                    continue
+
+            if analyzer_session and get_stream_protocol(channel['url']) is None:
+                result = await test_stream_speed(analyzer_session, channel['url'])
+                if result.get('ts_valid') is False or result.get('ts_rtf'):
+                    channel['ffmpeg_response_time'] = result['response_time']
+                    if result['success']:
+                        # PCR 估算的实时倍速与 FFmpeg 的 speed= 含义相同
+                        channel['ffmpeg_speed'] = result['ts_rtf']
+                        channel['ffmpeg_status'] = 'success'
+                        channel['speed'] = result['ts_rtf']
+                        channel['stream_response_time'] = result['response_time']
+                        logging.info(f"频道 {channel['name']} 的TS分析实时倍速: {result['ts_rtf']:.2f}x，跳过FFmpeg")
+                    else:
+                        channel['ffmpeg_error'] = result['error']
+                    results.append(channel)
+                    continue
+
             # 构建FFmpeg命令
-            # 设置5秒超时，只获取关键帧，不保存输出
+            # 读写超时默认5秒（开启自适应超时时按主机学习），只获取关键帧，不保存输出
+            io_timeout = host_timeouts.timeout(channel['url'], FIRST_BYTE, 5)
+            total_timeout = 5 + io_timeout * 2  # 默认15秒总超时
             ffmpeg_cmd = [
                 'ffmpeg',
-                '-timeout', '5000000',  # 5秒超时（微秒单位）
-                '-i', channel['url'],
+                '-timeout', str(int(io_timeout * 1000000)),  # 微秒单位
+                '-i', redirect_resolver.lookup(channel['url']) or channel['url'],  # 使用前面阶段缓存的重定向结果
                 '-t', '5',  # 只测试5秒
                 '-c', 'copy',  # 不做转码，只复制流
                 '-f', 'null',  # 输出到空设备
@@ -1023,7 +1714,7 @@ async def test_channels_with_ffmpeg(channels):
             
             try:
                 # 设置超时
-                stdout, stderr = proc.communicate(timeout=15)  # 15秒总超时
+                stdout, stderr = proc.communicate(timeout=total_timeout)
                 
                 # 计算执行时间
                 elapsed_time = time.time() - start_time
@@ -1059,7 +1750,7 @@ async def test_channels_with_ffmpeg(channels):
             except subprocess.TimeoutExpired:
                 proc.kill()
                 logging.warning(f"FFmpeg测试超时: {channel['name']}")
-                channel['ffmpeg_error'] = "Timeout after 15 seconds"
+                channel['ffmpeg_error'] = f"Timeout after {total_timeout:g} seconds"
                 channel['ffmpeg_status'] = 'timeout'  # 标记为超时
         
         except Exception as e:
@@ -1116,6 +1807,9 @@ async def test_channels_with_ffmpeg(channels):
             # 如果没有可用源，保留所有源以防万一
             sorted_results.extend(channels)
     
+    if analyzer_session:
+        await analyzer_session.close()
+
     # 记录测试结束时间和总耗时
     test_end_time = time.time()
     test_duration = test_end_time - test_start_time
@@ -1126,4 +1820,7 @@ async def test_channels_with_ffmpeg(channels):
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    finally:
+        shutdown_cpu_executor()
@@ -1,10 +1,28 @@
-from flask import Flask
+import logging
+import os
+from flask import Flask, Response, redirect, send_file
+from utils.failover import FailoverTable
+from utils.relay import HlsRelay, PLAYLIST_CONTENT_TYPE, UPSTREAM_ERRORS
 from utils.tools import get_result_file_content
 import utils.constants as constants
 from utils.config import config_instance
 
 app = Flask(__name__)
 
+failover_table = FailoverTable(constants.failover_sources_path,
+                               check_interval=config_instance.failover_check_interval,
+                               check_depth=config_instance.failover_check_depth)
+# 服务启动时就开始后台存活检查，第一个请求到来时已有检查结果。
+# debug 模式下 Werkzeug 重载器会在父进程和子进程中各导入一次本模块，只在实际处理请求的子进程中启动
+if __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    failover_table.start()
+
+relay = HlsRelay(failover_table.best,
+                 max_bytes=config_instance.relay_memory_mb * 1024 * 1024,
+                 disk_dir=config_instance.relay_disk_dir or None,
+                 max_disk_bytes=config_instance.relay_disk_mb * 1024 * 1024,
+                 playlist_ttl=config_instance.relay_playlist_ttl) if config_instance.open_relay else None
+
 @app.route("/m3u")
 def show_m3u():
     return get_result_file_content(path=config_instance.final_file, file_type="m3u")
@@ -21,5 +39,65 @@ def show_ipv4_m3u():
 def show_live_ipv6_m3u():
     return get_result_file_content(path=constants.live_ipv6_result_path, file_type="m3u")
 
+@app.route("/play/m3u")
+def show_play_m3u():
+    return get_result_file_content(path=constants.play_result_path, file_type="m3u")
+
+@app.route("/play/<channel_id>")
+def play(channel_id):
+    url = failover_table.best(channel_id)
+    if not url:
+        return "频道不存在", 404
+    return redirect(url, code=302)
+
+def upstream_failed(target, error):
+    logging.warning(f"中继上游请求失败 {target}: {error}")
+    return "上游请求失败", 502
+
+@app.route("/relay/<channel_id>.m3u8")
+def relay_channel(channel_id):
+    if not relay:
+        return "中继未开启", 404
+    try:
+        url, playlist = relay.get_channel_playlist(channel_id)
+    except UPSTREAM_ERRORS as e:
+        return upstream_failed(channel_id, e)
+    if not url:
+        return "频道不存在", 404
+    if playlist is None:
+        # 不是 HLS 的源不经过中继
+        return redirect(url, code=302)
+    return Response(playlist, mimetype=PLAYLIST_CONTENT_TYPE)
+
+@app.route("/relay/pl/<token>")
+def relay_playlist(token):
+    url = relay.lookup(token) if relay else None
+    if not url:
+        return "地址已过期", 404
+    try:
+        playlist = relay.get_playlist(url)
+    except UPSTREAM_ERRORS as e:
+        return upstream_failed(url, e)
+    if playlist is None:
+        return redirect(url, code=302)
+    return Response(playlist, mimetype=PLAYLIST_CONTENT_TYPE)
+
+@app.route("/relay/seg/<token>")
+def relay_segment(token):
+    try:
+        segment = relay.get_segment(token) if relay else None
+    except UPSTREAM_ERRORS as e:
+        return upstream_failed(token, e)
+    if not segment:
+        return "地址已过期", 404
+    body, content_type = segment
+    return Response(body, mimetype=content_type)
+
+@app.route("/epg.xml.gz")
+def show_epg():
+    if not os.path.exists(constants.epg_result_path):
+        return "EPG尚未生成", 404
+    return send_file(os.path.abspath(constants.epg_result_path), mimetype="application/gzip")
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+from utils.channel_registry import SIMPLIFIED, TRADITIONAL, ChannelRegistry
+
+CHANNELS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'channels.txt')
+
+
+@pytest.fixture(scope='module')
+def registry():
+    return ChannelRegistry().load(CHANNELS_FILE)
+
+
+def test_traditional_table_aligned():
+    assert len(TRADITIONAL) == len(SIMPLIFIED)
+    assert len(set(TRADITIONAL)) == len(TRADITIONAL)
+
+
+@pytest.mark.parametrize('name, channel_id', [
+    ('CCTV-1', 'cctv1'),
+    ('CCTV1 综合 HD', 'cctv1'),
+    ('CCTV-4K 超高清', 'cctv4k'),
+    ('CCTV4K HD', 'cctv4k'),
+    ('CCTV1 4K', 'cctv1'),
+    ('CCTV-4', 'cctv4'),
+    ('無線新聞台', 'tvbnews'),
+    ('翡翠台 高清', 'tvb'),
+])
+def test_lookup(registry, name, channel_id):
+    assert registry.lookup(name).id == channel_id
+
+
+@pytest.mark.parametrize('name', ['CCTV', 'CCTV 高清'])
+def test_resolution_suffix_does_not_collapse(registry, name):
+    assert registry.lookup(name) is None
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+
+from aiohttp import web
+
+from utils.distributed import ProbeCoordinator, run_worker
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 工作节点进程：echo 阶段返回地址和进程号
+WORKER_SCRIPT = """
+import asyncio, os, sys
+sys.path.insert(0, {root!r})
+from utils.distributed import run_worker
+
+async def echo(session, params):
+    await asyncio.sleep(0.01)
+    return {{'url': params['url'], 'pid': os.getpid()}}
+
+asyncio.run(run_worker(sys.argv[1], {{'echo': echo}}, concurrency=5, worker_name=f'worker-{{os.getpid()}}'))
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_worker_processes_share_tasks():
+    async def run():
+        port = free_port()
+        coordinator = ProbeCoordinator('127.0.0.1', port, shard_size=5)
+        await coordinator.start()
+        script = WORKER_SCRIPT.format(root=ROOT)
+        workers = [await asyncio.create_subprocess_exec(sys.executable, '-c', script, f'http://127.0.0.1:{port}',
+                                                        stderr=subprocess.DEVNULL)
+                   for _ in range(3)]
+        try:
+            urls = [f'http://host{i % 7}.example/{i}' for i in range(120)]
+            results = await asyncio.wait_for(
+                asyncio.gather(*(coordinator.submit('echo', url) for url in urls)), 60)
+        finally:
+            await coordinator.close()
+            await asyncio.wait_for(asyncio.gather(*(worker.wait() for worker in workers)), 10)
+        return urls, results, coordinator
+
+    urls, results, coordinator = asyncio.run(run())
+    assert [result['url'] for result in results] == urls
+    assert len({result['pid'] for result in results}) > 1
+    assert len(coordinator._workers) == 3
+
+
+def test_falls_back_to_local_worker():
+    async def echo(session, params):
+        return {'url': params['url']}
+
+    async def run():
+        coordinator = ProbeCoordinator('127.0.0.1', free_port(), worker_timeout=0, local_handlers={'echo': echo})
+        await coordinator.start()
+        try:
+            return await asyncio.wait_for(coordinator.submit('echo', 'http://a.example/1'), 10), coordinator
+        finally:
+            await coordinator.close()
+
+    result, coordinator = asyncio.run(run())
+    assert result == {'url': 'http://a.example/1'}
+    assert coordinator._workers == {'local'}
+
+
+def test_cancelled_tasks_are_dropped():
+    async def run():
+        coordinator = ProbeCoordinator('127.0.0.1', free_port())
+        kept = coordinator.submit('echo', 'http://a.example/1')
+        cancelled = coordinator.submit('echo', 'http://a.example/2')
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        pending = [task[2]['url'] for queue in coordinator._pending.values() for task in queue.values()]
+        return pending, len(coordinator._futures), kept
+
+    pending, futures, _ = asyncio.run(run())
+    assert pending == ['http://a.example/1']
+    assert futures == 1
+
+
+def test_worker_retries_result_upload():
+    uploads = []
+
+    async def lease(request):
+        if uploads:
+            return web.json_response({'done': True})
+        return web.json_response({'shard_id': 0, 'tasks': [{'id': 1, 'phase': 'echo', 'params': {'url': 'u'}}]})
+
+    async def result(request):
+        uploads.append(await request.json())
+        if len(uploads) == 1:
+            return web.Response(status=500)
+        return web.json_response({'ok': True})
+
+    async def echo(session, params):
+        return {'url': params['url']}
+
+    async def run():
+        app = web.Application()
+        app.router.add_post('/lease', lease)
+        app.router.add_post('/result', result)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        port = free_port()
+        await web.TCPSite(runner, '127.0.0.1', port).start()
+        try:
+            await asyncio.wait_for(run_worker(f'http://127.0.0.1:{port}', {'echo': echo}), 10)
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(run())
+    assert len(uploads) == 2
+    assert uploads[1]['results'] == [{'id': 1, 'result': {'url': 'u'}}]
@@ -0,0 +1,31 @@
+import gzip
+import xml.etree.ElementTree as ET
+
+from utils.epg import build_filtered_epg
+
+XMLTV = """<?xml version="1.0" encoding="UTF-8"?>
+<tv>
+  <channel id="cctv1"><display-name>CCTV1</display-name></channel>
+  <channel id="cctv1hd"><display-name>CCTV1 HD</display-name></channel>
+  <channel id="other"><display-name>Other</display-name></channel>
+  <programme channel="cctv1" start="20260101000000 +0800" stop="20260101010000 +0800"><title>新闻联播</title></programme>
+  <programme channel="cctv1hd" start="20260101000000 +0800" stop="20260101010000 +0800"><title>新闻联播</title></programme>
+  <programme channel="other" start="20260101000000 +0800" stop="20260101010000 +0800"><title>Other</title></programme>
+</tv>
+"""
+
+
+def channel_id(name):
+    return name.upper().replace(' HD', '').replace(' ', '')
+
+
+def test_one_source_channel_per_tvg_id(tmp_path):
+    source = tmp_path / 'source.xml'
+    source.write_text(XMLTV, encoding='utf-8')
+    output = tmp_path / 'epg.xml.gz'
+    assert build_filtered_epg(str(source), {'CCTV1': 'CCTV1'}, str(output), channel_id) == (1, 1)
+
+    with gzip.open(output, 'rt', encoding='utf-8') as f:
+        root = ET.fromstring(f.read())
+    assert [channel.get('id') for channel in root.findall('channel')] == ['CCTV1']
+    assert [programme.get('channel') for programme in root.findall('programme')] == ['CCTV1']
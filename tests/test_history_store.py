@@ -0,0 +1,61 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from utils import history_store
+from utils.history_store import DAY, HistoryArchive
+
+NOW = 1_800_000_000
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    current = [NOW]
+    monkeypatch.setattr(history_store.time, 'time', lambda: current[0])
+    return current
+
+
+def test_stats_weights_uptime_and_speed(tmp_path, clock):
+    archive = HistoryArchive(str(tmp_path / 'archive.npz'))
+    archive.record('http://a/1', True, 0.1, 4.0, name='CCTV1')
+    archive.record('http://a/1', False, name='CCTV1')
+    archive.record('http://b/1', True, 0.2, 1.0, name='CCTV1')
+    stats = archive.stats(half_life_days=3.0, percentile=50)
+    assert stats['samples'].tolist() == [2, 1]
+    assert stats['uptime'].tolist() == [0.5, 1.0]
+    assert stats['speed'].tolist() == [4.0, 1.0]
+    assert stats['score'].tolist() == [2.5, 2.0]
+    assert archive.scores(percentile=50) == {'http://a/1': 2.5, 'http://b/1': 2.0}
+
+
+def test_save_load_round_trip_drops_expired_sources(tmp_path, clock):
+    path = str(tmp_path / 'archive.npz')
+    archive = HistoryArchive(path, max_age_days=7)
+    clock[0] = NOW - 10 * DAY
+    archive.record('http://old/1', True, 0.1, 1.0, name='Old')
+    clock[0] = NOW
+    archive.record('http://a/1', True, 0.1, 2.0, name='CCTV1')
+    archive.record('http://a/1', False, float('inf'), name='CCTV1')
+    archive.save()
+
+    loaded = HistoryArchive(path, max_age_days=7)
+    loaded.load()
+    assert loaded.urls == ['http://a/1']
+    assert loaded.names == ['CCTV1']
+    assert loaded.columns['success'].tolist() == [True, False]
+    assert np.isnan(loaded.columns['response_time'][1])
+    assert loaded.source_id('http://a/1') == 0
+
+
+def test_trend_report_lists_degrading_channels(tmp_path, clock):
+    archive = HistoryArchive(str(tmp_path / 'archive.npz'))
+    clock[0] = NOW - 3 * DAY
+    for _ in range(4):
+        archive.record('http://a/1', True, 0.1, 2.0, name='CCTV1')
+        archive.record('http://b/1', True, 0.1, 2.0, name='CCTV2')
+    clock[0] = NOW
+    for success in (True, False, False, False):
+        archive.record('http://a/1', success, 0.1, 2.0, name='CCTV1')
+    archive.record('http://b/1', True, 0.1, 2.0, name='CCTV2')
+    report = archive.trend_report()
+    assert [(name, base, recent) for name, base, recent, _, _ in report] == [('CCTV1', 1.0, 0.25)]
@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+import aiohttp
+from aiohttp import web
+
+from utils.metadata import MetadataCache, probe_stream_metadata
+from utils.redirect import RedirectResolver
+
+MASTER = '#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=2000000,RESOLUTION=1920x1080\nhd.m3u8\n'
+
+
+def test_failed_probe_is_cached_with_failure_ttl(tmp_path):
+    cache = MetadataCache(str(tmp_path / 'metadata.json'), ttl=3600, failure_ttl=60)
+    cache.put('http://a/live.m3u8', None)
+    cache.put('http://b/live.m3u8', {'resolution': '1920x1080'})
+    assert cache.has('http://a/live.m3u8') and cache.get('http://a/live.m3u8') is None
+    assert cache.get('http://b/live.m3u8') == {'resolution': '1920x1080'}
+    assert cache.entries['http://a/live.m3u8']['expires'] <= time.time() + 60
+    cache.save()
+
+    reloaded = MetadataCache(str(tmp_path / 'metadata.json'))
+    assert reloaded.has('http://a/live.m3u8')
+    assert not reloaded.has('http://c/live.m3u8')
+
+
+def test_playlist_fetched_through_redirect_resolver(tmp_path):
+    async def gateway(request):
+        raise web.HTTPFound('/cdn/live.m3u8')
+
+    async def playlist(request):
+        return web.Response(text=MASTER)
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/live.m3u8', gateway)
+        app.router.add_get('/cdn/live.m3u8', playlist)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        resolver = RedirectResolver(path=str(tmp_path / 'redirects.json'))
+        try:
+            async with aiohttp.ClientSession() as session:
+                metadata = await probe_stream_metadata(
+                    session, base + '/live.m3u8', use_ffprobe=False,
+                    fetch=lambda target, **kwargs: resolver.get(session, target, **kwargs))
+        finally:
+            await runner.cleanup()
+        return metadata, resolver.lookup(base + '/live.m3u8'), base
+
+    metadata, cached, base = asyncio.run(run())
+    assert metadata['resolution'] == '1920x1080'
+    assert cached == base + '/cdn/live.m3u8'
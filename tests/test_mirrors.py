@@ -0,0 +1,54 @@
+import asyncio
+
+from utils.mirrors import MirrorRacer, github_mirrors, is_stale_mirror, parse_github_url
+
+RAW = 'https://raw.githubusercontent.com/owner/repo/main/live.txt'
+BRANCH_CDN = 'https://cdn.jsdelivr.net/gh/owner/repo@main/live.txt'
+
+
+def test_parse_github_url_forms():
+    expected = ('owner', 'repo', 'main', 'live.txt')
+    assert parse_github_url(RAW) == expected
+    assert parse_github_url('https://github.com/owner/repo/raw/refs/heads/main/live.txt') == expected
+    assert parse_github_url(BRANCH_CDN) == expected
+    assert parse_github_url(f'https://wget.la/{RAW}') == expected
+    assert parse_github_url('https://example.com/live.txt') is None
+
+
+def test_mirrors_keep_original_first():
+    candidates = github_mirrors(RAW, 'https://wget.la/')
+    assert candidates[0] == RAW
+    assert f'https://wget.la/{RAW}' in candidates
+    assert BRANCH_CDN in candidates
+
+
+def test_stale_mirror():
+    assert is_stale_mirror(BRANCH_CDN)
+    assert not is_stale_mirror('https://cdn.jsdelivr.net/gh/owner/repo@v1.2/live.txt')
+    assert not is_stale_mirror('https://cdn.jsdelivr.net/gh/owner/repo@0123abcd/live.txt')
+    assert not is_stale_mirror(RAW)
+
+
+def test_branch_jsdelivr_winner_not_remembered(tmp_path):
+    racer = MirrorRacer(str(tmp_path / 'winners.json'), hedge_delay=0.01)
+
+    async def fetch(target):
+        # 只有 jsDelivr 能访问
+        return 'content' if 'jsdelivr' in target else None
+
+    assert asyncio.run(racer.fetch(RAW, fetch)) == 'content'
+    assert RAW not in racer.winners
+    racer.winners[RAW] = BRANCH_CDN
+    assert racer.candidates(RAW)[0] == RAW
+
+
+def test_winner_remembered(tmp_path):
+    racer = MirrorRacer(str(tmp_path / 'winners.json'), cdn_prefix='https://wget.la/', hedge_delay=0.01)
+    proxied = f'https://wget.la/{RAW}'
+
+    async def fetch(target):
+        return 'content' if target == proxied else None
+
+    asyncio.run(racer.fetch(RAW, fetch))
+    assert racer.winners[RAW] == proxied
+    assert racer.candidates(RAW)[0] == proxied
@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+from utils import network
+from utils.network import DUAL, IPV4, IPV6, channel_in_family, classify_channels, needs_ipv6_probe
+
+
+def test_classify_channels_skips_hosts_after_deadline(monkeypatch):
+    calls = []
+
+    async def fake_resolve(host, timeout=5):
+        calls.append(host)
+        return IPV4
+
+    monkeypatch.setattr(network, 'resolve_host_family', fake_resolve)
+    channels = [{'url': 'http://a.example/1.m3u8'}, {'url': 'http://b.example/2.m3u8'}]
+    asyncio.run(classify_channels(channels, deadline=time.monotonic() - 1))
+    assert calls == []
+    assert [channel['ip_family'] for channel in channels] == [None, None]
+
+
+def test_classify_channels_bounds_resolve_timeout_by_deadline(monkeypatch):
+    timeouts = []
+
+    async def fake_resolve(host, timeout=5):
+        timeouts.append(timeout)
+        return IPV4
+
+    monkeypatch.setattr(network, 'resolve_host_family', fake_resolve)
+    channels = [{'url': 'http://a.example/1.m3u8'}]
+    asyncio.run(classify_channels(channels, deadline=time.monotonic() + 1))
+    assert channels[0]['ip_family'] == IPV4
+    assert 0 < timeouts[0] <= 1
+
+
+def test_dual_stack_source_needs_ipv6_probe_for_ipv6_output(monkeypatch):
+    monkeypatch.setitem(network._route_cache, IPV6, True)
+    channel = {'url': 'http://dual.example/1.m3u8', 'ip_family': DUAL}
+    assert needs_ipv6_probe(channel)
+    assert channel_in_family(channel, IPV4)
+    assert not channel_in_family(channel, IPV6)
+    channel['ipv6_verified'] = True
+    assert channel_in_family(channel, IPV6)
+
+
+def test_no_ipv6_probe_without_ipv6_route(monkeypatch):
+    monkeypatch.setitem(network._route_cache, IPV6, False)
+    assert not needs_ipv6_probe({'url': 'http://dual.example/1.m3u8', 'ip_family': DUAL})
+    assert not needs_ipv6_probe({'url': 'http://v4.example/1.m3u8', 'ip_family': IPV4})
@@ -0,0 +1,70 @@
+import asyncio
+
+import aiohttp
+from aiohttp import web
+
+import main
+from utils.redirect import RedirectResolver
+from utils.timeouts import FIRST_BYTE, HostTimeouts
+
+
+async def start_origin(status):
+    async def handler(request):
+        return web.Response(status=status, body=b'#EXTM3U\n')
+
+    app = web.Application()
+    app.router.add_get('/live.m3u8', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/live.m3u8"
+
+
+def run_against_origin(status, request, monkeypatch, tmp_path):
+    """对返回 status 的本地源站执行 request(session, url)，返回 (结果, 记录的首字节耗时样本数)"""
+    timeouts = HostTimeouts(path=str(tmp_path / 'timeouts.json'))
+    monkeypatch.setattr(main, 'host_timeouts', timeouts)
+    monkeypatch.setattr(main, 'redirect_resolver', RedirectResolver(path=str(tmp_path / 'redirects.json')))
+
+    async def run():
+        runner, url = await start_origin(status)
+        try:
+            async with aiohttp.ClientSession() as session:
+                return await request(session, url)
+        finally:
+            await runner.cleanup()
+
+    result = asyncio.run(run())
+    samples = [host.get(FIRST_BYTE, []) for host in timeouts.hosts.values()]
+    return result, sum(len(phase) for phase in samples)
+
+
+def probe(status, monkeypatch, tmp_path):
+    return run_against_origin(
+        status, lambda session, url: main.test_channel_response_time(session, {'url': url, 'response_time': float('inf')}),
+        monkeypatch, tmp_path)
+
+
+def test_error_status_is_not_learned(monkeypatch, tmp_path):
+    channel, samples = probe(404, monkeypatch, tmp_path)
+    assert channel['response_time'] == float('inf')
+    assert samples == 0
+
+
+def test_ok_status_is_learned(monkeypatch, tmp_path):
+    channel, samples = probe(200, monkeypatch, tmp_path)
+    assert channel['response_time'] < float('inf')
+    assert samples == 1
+
+
+def test_fetch_url_does_not_learn_error_status(monkeypatch, tmp_path):
+    (content, elapsed), samples = run_against_origin(404, main.fetch_url, monkeypatch, tmp_path)
+    assert content is None and elapsed == float('inf')
+    assert samples == 0
+
+
+def test_fetch_url_learns_ok_status(monkeypatch, tmp_path):
+    (content, elapsed), samples = run_against_origin(200, main.fetch_url, monkeypatch, tmp_path)
+    assert content == '#EXTM3U\n'
+    assert samples == 1
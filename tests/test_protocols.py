@@ -0,0 +1,143 @@
+import asyncio
+import time
+
+import aiohttp
+from aiohttp import web
+
+from utils.protocols import RTMP, RTSP, UDPXY, get_stream_protocol, probe_rtmp, probe_rtsp, probe_udpxy
+
+SDP = b'v=0\r\no=- 0 0 IN IP4 127.0.0.1\r\ns=test\r\nm=video 0 RTP/AVP 96\r\n'
+TS_DATA = (b'\x47' + b'\xff' * 187) * 10
+
+
+async def start_tcp_server(handler):
+    server = await asyncio.start_server(handler, '127.0.0.1', 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+async def fake_rtsp(reader, writer):
+    try:
+        while True:
+            request = await reader.readuntil(b'\r\n\r\n')
+            cseq = next(line.split(b':', 1)[1].strip() for line in request.split(b'\r\n')
+                        if line.lower().startswith(b'cseq'))
+            body = SDP if request.startswith(b'DESCRIBE') else b''
+            writer.write(b'RTSP/1.0 200 OK\r\nCSeq: ' + cseq + b'\r\nContent-Length: '
+                         + str(len(body)).encode() + b'\r\n\r\n' + body)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        writer.close()
+
+
+async def fake_rtmp(reader, writer):
+    await reader.readexactly(1 + 1536)
+    writer.write(b'\x03' + bytes(1536) + bytes(1536))
+    await writer.drain()
+    writer.close()
+
+
+async def silent(reader, writer):
+    await asyncio.sleep(30)
+
+
+def test_get_stream_protocol():
+    assert get_stream_protocol('rtsp://1.2.3.4/live') == RTSP
+    assert get_stream_protocol('rtmp://1.2.3.4/live/a') == RTMP
+    assert get_stream_protocol('http://192.168.1.1:4022/rtp/239.3.1.241:8000') == UDPXY
+    assert get_stream_protocol('http://example.com/live.m3u8') is None
+
+
+def test_rtsp_handshake():
+    async def run():
+        server, port = await start_tcp_server(fake_rtsp)
+        async with server:
+            return await probe_rtsp(f'rtsp://127.0.0.1:{port}/live', timeout=2)
+
+    result = asyncio.run(run())
+    assert result['success'], result
+    assert result['status'] == 200
+
+
+def test_rtmp_handshake():
+    async def run():
+        server, port = await start_tcp_server(fake_rtmp)
+        async with server:
+            return await probe_rtmp(f'rtmp://127.0.0.1:{port}/live/a', timeout=2)
+
+    assert asyncio.run(run())['success']
+
+
+def test_rtsp_silent_server_times_out():
+    async def run():
+        server, port = await start_tcp_server(silent)
+        async with server:
+            return await probe_rtsp(f'rtsp://127.0.0.1:{port}/live', timeout=0.5)
+
+    assert not asyncio.run(run())['success']
+
+
+async def run_udpxy(path, routes):
+    app = web.Application()
+    for route, handler in routes.items():
+        app.router.add_get(route, handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        async with aiohttp.ClientSession() as session:
+            return await probe_udpxy(session, f'http://127.0.0.1:{port}{path}', timeout=0.5)
+    finally:
+        await runner.cleanup()
+
+
+async def stream_ts(request):
+    response = web.StreamResponse()
+    await response.prepare(request)
+    await response.write(TS_DATA)
+    return response
+
+
+async def no_data(request):
+    response = web.StreamResponse()
+    await response.prepare(request)
+    await asyncio.sleep(2)
+    return response
+
+
+async def status(request):
+    return web.Response(text='udpxy status')
+
+
+def test_udpxy_stream():
+    result = asyncio.run(run_udpxy('/rtp/239.0.0.1:8000', {'/rtp/{group}': stream_ts}))
+    assert result['success'], result
+
+
+def test_udpxy_group_without_data():
+    result = asyncio.run(run_udpxy('/rtp/239.0.0.1:8000', {'/rtp/{group}': no_data, '/status': status}))
+    assert not result['success']
+    assert result['error'] == '组播源没有数据'
+
+
+def test_udpxy_gateway_without_headers_times_out():
+    async def run():
+        server, port = await start_tcp_server(silent)
+        async with server, aiohttp.ClientSession() as session:
+            start = time.monotonic()
+            result = await asyncio.wait_for(
+                probe_udpxy(session, f'http://127.0.0.1:{port}/rtp/239.0.0.1:8000', timeout=0.5), 10)
+            return result, time.monotonic() - start
+
+    result, elapsed = asyncio.run(run())
+    assert not result['success']
+    assert elapsed < 3
+
+
+def test_rtsp_and_rtmp_urls_without_host_fail_cleanly():
+    for probe, url in ((probe_rtsp, 'rtsp:///live'), (probe_rtsp, 'rtsp://host:99999/live'),
+                       (probe_rtmp, 'rtmp:///live'), (probe_rtmp, 'rtmp://host:99999/live')):
+        result = asyncio.run(probe(url, timeout=1))
+        assert result['success'] is False
+        assert result['error']
@@ -0,0 +1,73 @@
+import asyncio
+
+import aiohttp
+from aiohttp import web
+
+from utils.redirect import RedirectResolver
+
+
+async def start_origin(routes):
+    app = web.Application()
+    app.add_routes(routes)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+
+def redirect_to(path):
+    async def handler(request):
+        raise web.HTTPFound(path)
+    return handler
+
+
+def respond(body):
+    async def handler(request):
+        return web.Response(body=body)
+    return handler
+
+
+def test_segment_redirect_is_not_cached(tmp_path):
+    async def run():
+        runner, base = await start_origin([
+            web.get('/seg.ts', redirect_to('/cdn/seg.ts')),
+            web.get('/cdn/seg.ts', respond(b'ts')),
+        ])
+        resolver = RedirectResolver(path=str(tmp_path / 'cache.json'))
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with resolver.get(session, base + '/seg.ts', remember=False) as response:
+                    assert await response.read() == b'ts'
+                assert resolver.lookup(base + '/seg.ts') is None
+                async with resolver.get(session, base + '/seg.ts') as response:
+                    await response.read()
+                assert resolver.lookup(base + '/seg.ts') == base + '/cdn/seg.ts'
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+def test_timeout_on_cached_target_re_resolves(tmp_path):
+    async def hang(request):
+        await asyncio.sleep(2)
+        return web.Response(body=b'late')
+
+    async def run():
+        runner, base = await start_origin([
+            web.get('/live', redirect_to('/new')),
+            web.get('/old', hang),
+            web.get('/new', respond(b'ok')),
+        ])
+        resolver = RedirectResolver(path=str(tmp_path / 'cache.json'))
+        resolver.remember(base + '/live', base + '/old')
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with resolver.get(session, base + '/live', timeout=aiohttp.ClientTimeout(total=0.5)) as response:
+                    assert await response.read() == b'ok'
+            assert resolver.lookup(base + '/live') == base + '/new'
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(run())
@@ -0,0 +1,84 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import service.app as service
+from utils.relay import HlsRelay
+
+SEGMENT = b'\x47' + b'\xff' * 187
+ROUTES = {
+    '/master.m3u8': b'\xef\xbb\xbf\n#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=800000\nlow/index.m3u8\n',
+    '/low/index.m3u8': b'#EXTM3U\n#EXT-X-TARGETDURATION:2\n#EXTINF:2,\nseg1.ts\n',
+    '/low/seg1.ts': SEGMENT,
+    '/live.ts': SEGMENT * 100,
+}
+
+
+class FakeOrigin(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        body = ROUTES.get(self.path)
+        if body is None:
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def origin():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeOrigin)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+
+@pytest.fixture
+def client(origin, monkeypatch):
+    channels = {'hls': f'{origin}/master.m3u8', 'ts': f'{origin}/live.ts', 'broken': f'{origin}/missing.m3u8'}
+    relay = HlsRelay(channels.get, max_bytes=1024 * 1024, timeout=2)
+    monkeypatch.setattr(service, 'relay', relay)
+    FakeOrigin.requests.clear()
+    return service.app.test_client()
+
+
+def test_playlist_with_bom_is_relayed(client):
+    master = client.get('/relay/hls.m3u8')
+    assert master.status_code == 200
+    variant = master.data.decode().strip().splitlines()[-1]
+    assert variant.startswith('/relay/pl/')
+
+    media = client.get(variant)
+    assert media.status_code == 200
+    segment_path = media.data.decode().strip().splitlines()[-1]
+    assert segment_path.startswith('/relay/seg/')
+
+    for _ in range(3):
+        segment = client.get(segment_path)
+        assert segment.status_code == 200
+        assert segment.data == SEGMENT
+    # 分片只从上游下载一次
+    assert FakeOrigin.requests.count('/low/seg1.ts') == 1
+
+
+def test_non_hls_source_redirects(client, origin):
+    response = client.get('/relay/ts.m3u8')
+    assert response.status_code == 302
+    assert response.headers['Location'] == f'{origin}/live.ts'
+
+
+def test_upstream_error_returns_502(client):
+    assert client.get('/relay/broken.m3u8').status_code == 502
+
+
+def test_unknown_channel_returns_404(client):
+    assert client.get('/relay/missing.m3u8').status_code == 404
@@ -0,0 +1,19 @@
+from main import make_channel_sort_key
+
+
+def test_mirror_sorts_after_its_representative():
+    representative = {'name': 'CCTV1', 'url': 'http://a/1.m3u8', 'speed': 2.0, 'stream_response_time': 100,
+                      'history_score': 0.1}
+    mirror = {'name': 'CCTV1', 'url': 'http://b/1.m3u8', 'speed': 2.0, 'stream_response_time': 100,
+              'history_score': 0.9, 'mirror_of': representative['url']}
+    key = make_channel_sort_key({'CCTV1': 0}, {'CCTV1'})
+    assert sorted([mirror, representative], key=key) == [representative, mirror]
+
+
+def test_history_score_ranks_before_stream_response_time():
+    steady = {'name': 'CCTV1', 'url': 'http://a/1.m3u8', 'speed': 0, 'stream_response_time': 3.0,
+              'history_score': 0.9}
+    flaky = {'name': 'CCTV1', 'url': 'http://b/1.m3u8', 'speed': 0, 'stream_response_time': 0.5,
+             'history_score': 0.2}
+    key = make_channel_sort_key({'CCTV1': 0}, {'CCTV1'})
+    assert sorted([flaky, steady], key=key) == [steady, flaky]
@@ -0,0 +1,71 @@
+import os
+
+from utils.ts_analyzer import PACKET_SIZE, TsAnalyzer
+
+PCR_STEP = int(PACKET_SIZE * 8 / 2e6 * 27e6)  # 2 Mbit/s
+PAT = bytes([0x00, 0xB0, 13, 0, 1, 0xC1, 0, 0, 0, 1, 0xF0, 0x00]) + bytes(4)
+PMT = bytes([0x02, 0xB0, 18, 0, 1, 0xC1, 0, 0, 0xE1, 0x00, 0xF0, 0x00, 0x1B, 0xE1, 0x00, 0xF0, 0x00]) + bytes(4)
+
+
+def packet(pid, counter, payload=b'', start=False, pcr=None):
+    header = bytes([0x47, (0x40 if start else 0) | (pid >> 8), pid & 0xFF])
+    if pcr is None:
+        return header + bytes([0x10 | counter]) + (payload + b'\xff' * 184)[:184]
+    base, extension = divmod(pcr, 300)
+    adaptation = bytes([0x10, (base >> 25) & 0xFF, (base >> 17) & 0xFF, (base >> 9) & 0xFF, (base >> 1) & 0xFF,
+                        ((base & 1) << 7) | 0x7E | (extension >> 8), extension & 0xFF])
+    adaptation += b'\xff' * (183 - len(adaptation))
+    return header + bytes([0x30 | counter, len(adaptation)]) + adaptation
+
+
+def make_ts(count):
+    packets = []
+    for i in range(count):
+        if i % 400 == 0:
+            table_counter = (i // 400) & 0x0F
+            packets.append(packet(0, table_counter, b'\0' + PAT, start=True))
+            packets.append(packet(0x1000, table_counter, b'\0' + PMT, start=True))
+        packets.append(packet(0x100, i & 0x0F, pcr=i * PCR_STEP if i % 10 == 0 else None))
+    return b''.join(packets)
+
+
+def analyze(data, chunk=65536):
+    analyzer = TsAnalyzer()
+    for i in range(0, len(data), chunk):
+        analyzer.feed(data[i:i + chunk], i / chunk * 0.1)
+    return analyzer.report()
+
+
+def test_real_ts_is_valid():
+    report = analyze(make_ts(5000))
+    assert report['ts_valid'] is True
+    assert report['ts_cc_errors'] == 0
+    assert report['ts_codecs'] == ['H.264']
+    assert abs(report['ts_bitrate'] - 2e6) / 2e6 < 0.05
+
+
+def test_counter_errors_counted():
+    data = make_ts(5000)
+    data = data[:PACKET_SIZE * 1000] + data[PACKET_SIZE * 1001:]
+    report = analyze(data)
+    assert report['ts_valid'] is True
+    assert report['ts_cc_errors'] == 1
+
+
+def test_random_bytes_undecided():
+    assert analyze(os.urandom(2 * 1024 * 1024))['ts_valid'] is None
+
+
+def test_random_bytes_starting_with_sync_pattern_undecided():
+    data = bytearray(os.urandom(1024 * 1024))
+    data[0] = data[PACKET_SIZE] = 0x47
+    assert analyze(bytes(data))['ts_valid'] is None
+
+
+def test_fmp4_undecided():
+    data = b'\x00\x00\x00\x18ftypisom\x00\x00\x02\x00isomiso2' + os.urandom(1024 * 1024)
+    assert analyze(data)['ts_valid'] is None
+
+
+def test_short_payload_undecided():
+    assert analyze(make_ts(2)[:PACKET_SIZE * 2])['ts_valid'] is None
@@ -0,0 +1,105 @@
+"""第一阶段测速引擎基准测试：对比 aiohttp 和精简引擎每核每秒能完成的探测次数
+
+用法: python -m utils.bench_probe [--count 5000] [--concurrency 200]
+
+在子进程中启动一个本地 HTTP 服务（一半地址先 302 跳转），客户端进程的 CPU 时间只统计探测本身。
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import time
+
+import aiohttp
+
+from utils.lean_http import lean_probe
+from utils.redirect import RedirectResolver
+
+HOST = '127.0.0.1'
+RESPONSE_OK = b"HTTP/1.1 200 OK\r\nContent-Type: video/mp2t\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+
+
+def run_server(port, ready):
+    async def handle(reader, writer):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b'\r\n', b''):
+                pass
+            if b' /redir/' in request_line:
+                target = request_line.split(b' ')[1].replace(b'/redir/', b'/live/')
+                writer.write(b"HTTP/1.1 302 Found\r\nLocation: " + target + b"\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            else:
+                writer.write(RESPONSE_OK)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve():
+        server = await asyncio.start_server(handle, HOST, port, backlog=4096)
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+async def run_engine(name, probe, urls, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+    ok = 0
+
+    async def one(url):
+        nonlocal ok
+        async with sem:
+            try:
+                if await probe(url) == 200:
+                    ok += 1
+            except Exception:
+                pass
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one(url) for url in urls))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    print(f"{name:<8} 成功 {ok}/{len(urls)}  耗时 {wall:6.2f}s  {len(urls) / wall:8.0f} 次/秒  "
+          f"CPU {cpu:6.2f}s  {len(urls) / cpu:8.0f} 次/秒/核")
+
+
+async def benchmark(port, count, concurrency):
+    urls = [f"http://{HOST}:{port}/{'redir' if i % 2 else 'live'}/{i}.ts" for i in range(count)]
+
+    async with aiohttp.ClientSession() as session:
+        resolver = RedirectResolver(path='')
+
+        async def aiohttp_probe(url):
+            async with resolver.get(session, url, timeout=10) as response:
+                return response.status
+
+        await run_engine('aiohttp', aiohttp_probe, urls, concurrency)
+
+    resolver = RedirectResolver(path='')
+    await run_engine('lean', lambda url: lean_probe(url, timeout=10, resolver=resolver), urls, concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='第一阶段测速引擎基准测试')
+    parser.add_argument('--count', type=int, default=5000, help='探测次数')
+    parser.add_argument('--concurrency', type=int, default=200, help='并发数')
+    parser.add_argument('--port', type=int, default=18765, help='本地测试服务端口')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=run_server, args=(args.port, ready), daemon=True)
+    server.start()
+    ready.wait(10)
+    try:
+        asyncio.run(benchmark(args.port, args.count, args.concurrency))
+    finally:
+        server.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import logging
+import re
+import unicodedata
+
+# 频道名称中常见的繁体字 -> 简体字
+TRADITIONAL = '衛視臺鳳資訊聞電東廣遼龍蘇貴陝寧雲慶濟綜藝劇樂體經際國紀錄實兒環線無華頻鏡灣門鄉聯萬財軍農戲與會廈業學師數碼動畫歲愛長區縣陽興僑娛記歡購釣魚魯贛閩滬漢晉瓊開創優選戰運氣時風網絡頭條點擊鐵車飛機藍鑽級嶺齊專廳'
+SIMPLIFIED = '卫视台凤资讯闻电东广辽龙苏贵陕宁云庆济综艺剧乐体经际国纪录实儿环线无华频镜湾门乡联万财军农戏与会厦业学师数码动画岁爱长区县阳兴侨娱记欢购钓鱼鲁赣闽沪汉晋琼开创优选战运气时风网络头条点击铁车飞机蓝钻级岭齐专厅'
+TRADITIONAL_TO_SIMPLIFIED = str.maketrans(TRADITIONAL, SIMPLIFIED)
+
+# 名称中忽略的分隔符
+SEPARATORS = re.compile(r'[\s\-_·|:：]+')
+# 括号中的补充说明，如 (HK)、[高清]、【备用】
+BRACKETS = re.compile(r'[\[(（【][^\])）】]*[\])）】]')
+# 名称末尾的清晰度、编码、“频道”等后缀
+SUFFIXES = ('超高清', '高清', '超清', '标清', '蓝光', 'HEVC', 'H265', 'H264', '1080P', '720P', '50FPS',
+            'FHD', 'UHD', 'HD', 'SD', '4K', '8K', '频道')
+# 注册表中的名称不去掉这些后缀，否则 CCTV4K 会退化成 CCTV，把任何“CCTV 高清”都匹配到 4K 频道
+RESOLUTION_SUFFIXES = ('4K', '8K')
+
+DEFAULT_LOGO_URL = 'https://live.izbds.com/logo/{}.png'
+
+
+def normalize_name(name, strip_suffix=True, keep=()):
+    """统一频道名称：全角转半角、繁体转简体、转大写、去掉分隔符；strip_suffix 时再去掉括号说明和清晰度后缀（keep 中的后缀保留）"""
+    name = unicodedata.normalize('NFKC', name or '').translate(TRADITIONAL_TO_SIMPLIFIED).upper()
+    if strip_suffix:
+        name = BRACKETS.sub('', name)
+    name = SEPARATORS.sub('', name)
+    if strip_suffix:
+        stripped = True
+        while stripped:
+            stripped = False
+            for suffix in SUFFIXES:
+                if suffix not in keep and name.endswith(suffix) and len(name) > len(suffix):
+                    name = name[:-len(suffix)]
+                    stripped = True
+    return name
+
+
+class ChannelEntry:
+    __slots__ = ('id', 'tvg_id', 'logo', 'name')
+
+    def __init__(self, channel_id, tvg_id, logo, name):
+        self.id = channel_id
+        self.tvg_id = tvg_id
+        self.logo = logo
+        self.name = name
+
+
+class ChannelRegistry:
+    """频道注册表：从数据文件加载频道ID、tvg-id、台标和别名，按规范化名称查找
+
+    查找时先用只去掉分隔符的名称精确匹配（区分 CCTV-4K 和 CCTV-4），再用去掉后缀的名称匹配。
+    宽松匹配的键保留 4K/8K 后缀，查找时先按保留 4K/8K 的名称匹配，再按完全去掉后缀的名称匹配。
+    """
+
+    def __init__(self):
+        self.exact = {}
+        self.loose = {}
+        self.entries = []
+
+    def load(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                lines = [line.strip() for line in f]
+        except FileNotFoundError:
+            logging.warning(f"未找到频道注册表: {path}")
+            return self
+        for line in lines:
+            if not line or line.startswith('#'):
+                continue
+            parts = line.split(',', 3)
+            if len(parts) != 4:
+                logging.warning(f"频道注册表格式错误，已忽略: {line}")
+                continue
+            channel_id, tvg_id, logo, names = (part.strip() for part in parts)
+            aliases = [alias.strip() for alias in names.split('/') if alias.strip()]
+            if not aliases:
+                continue
+            tvg_id = tvg_id or aliases[0].replace(' ', '_')
+            entry = ChannelEntry(channel_id, tvg_id, logo or DEFAULT_LOGO_URL.format(tvg_id), aliases[0])
+            self.entries.append(entry)
+            for alias in aliases + [tvg_id]:
+                self.exact.setdefault(normalize_name(alias, strip_suffix=False), entry)
+        # 宽松匹配的键在所有精确键之后建立，避免覆盖
+        for key, entry in list(self.exact.items()):
+            self.loose.setdefault(normalize_name(key, keep=RESOLUTION_SUFFIXES), entry)
+        return self
+
+    def lookup(self, name):
+        """按名称查找频道，未找到返回 None"""
+        entry = self.exact.get(normalize_name(name, strip_suffix=False))
+        if entry is None:
+            entry = self.loose.get(normalize_name(name, keep=RESOLUTION_SUFFIXES))
+        if entry is None:
+            entry = self.loose.get(normalize_name(name))
+        return entry
+
+    def assign_ids(self, names):
+        """一次遍历为大量频道名称分配频道ID，相同名称只规范化一次；返回 名称 -> 频道ID（未找到为 None）"""
+        result = {}
+        for name in names:
+            if name not in result:
+                entry = self.lookup(name)
+                result[name] = entry.id if entry else None
+        return result
+
+
+_registry = None
+
+
+def get_registry(path='config/channels.txt'):
+    """获取全局频道注册表，首次调用时从数据文件加载"""
+    global _registry
+    if _registry is None:
+        _registry = ChannelRegistry().load(path)
+        logging.debug(f"已加载频道注册表，共 {len(_registry.entries)} 个频道")
+    return _registry
@@ -36,4 +36,272 @@ class Config:
     def cdn_url(self):
         return config.get("Settings", "cdn_url", fallback="")
 
+    @property
+    def parse_workers(self):
+        return int(config.get("Settings", "parse_workers", fallback=0))
+
+    @property
+    def distributed_shard_size(self):
+        return int(config.get("Settings", "distributed_shard_size", fallback=50))
+
+    @property
+    def distributed_lease_timeout(self):
+        return int(config.get("Settings", "distributed_lease_timeout", fallback=120))
+
+    @property
+    def distributed_worker_timeout(self):
+        return int(config.get("Settings", "distributed_worker_timeout", fallback=60))
+
+    @property
+    def worker_concurrency(self):
+        return int(config.get("Settings", "worker_concurrency", fallback=10))
+
+    @property
+    def time_budget(self):
+        return int(config.get("Settings", "time_budget", fallback=0))
+
+    @property
+    def first_test_budget_ratio(self):
+        return float(config.get("Settings", "first_test_budget_ratio", fallback=0.6))
+
+    @property
+    def first_test_concurrency(self):
+        return int(config.get("Settings", "first_test_concurrency", fallback=100))
+
+    @property
+    def stream_test_concurrency(self):
+        return int(config.get("Settings", "stream_test_concurrency", fallback=10))
+
+    @property
+    def top_k(self):
+        return int(config.get("Settings", "top_k", fallback=0))
+
+    @property
+    def top_k_min_speed(self):
+        return float(config.get("Settings", "top_k_min_speed", fallback=1.0))
+
+    @property
+    def top_k_max_response_time(self):
+        return float(config.get("Settings", "top_k_max_response_time", fallback=3.0))
+
+    @property
+    def open_metadata_probe(self):
+        return config.getboolean("Settings", "open_metadata_probe", fallback=False)
+
+    @property
+    def metadata_cache_ttl(self):
+        return int(config.get("Settings", "metadata_cache_ttl", fallback=604800))
+
+    @property
+    def metadata_failure_ttl(self):
+        return int(config.get("Settings", "metadata_failure_ttl", fallback=86400))
+
+    @property
+    def metadata_probe_concurrency(self):
+        return int(config.get("Settings", "metadata_probe_concurrency", fallback=4))
+
+    @property
+    def open_ip_family_split(self):
+        return config.getboolean("Settings", "open_ip_family_split", fallback=False)
+
+    @property
+    def final_file(self):
+        return config.get("Settings", "final_file", fallback="output/result.m3u")
+
+    @property
+    def redirect_max_hops(self):
+        return int(config.get("Settings", "redirect_max_hops", fallback=5))
+
+    @property
+    def redirect_cache_ttl(self):
+        return int(config.get("Settings", "redirect_cache_ttl", fallback=7200))
+
+    @property
+    def prune_zero_yield_runs(self):
+        return int(config.get("Settings", "prune_zero_yield_runs", fallback=0))
+
+    @property
+    def prune_mode(self):
+        return config.get("Settings", "prune_mode", fallback="skip")
+
+    @property
+    def open_epg(self):
+        return config.getboolean("Settings", "open_epg", fallback=False)
+
+    @property
+    def epg_source_url(self):
+        return config.get("Settings", "epg_source_url", fallback="https://epg.zbds.top/index.php")
+
+    @property
+    def epg_url(self):
+        return config.get("Settings", "epg_url", fallback="https://epg.zbds.top/index.php")
+
+    @property
+    def epg_max_age(self):
+        return int(config.get("Settings", "epg_max_age", fallback=21600))
+
+    @property
+    def stream_sample_max_bytes(self):
+        return int(config.get("Settings", "stream_sample_max_bytes", fallback=16777216))
+
+    @property
+    def stream_stall_threshold(self):
+        return float(config.get("Settings", "stream_stall_threshold", fallback=1.0))
+
+    @property
+    def open_lean_probe(self):
+        return config.getboolean("Settings", "open_lean_probe", fallback=False)
+
+    @property
+    def open_http2(self):
+        return config.getboolean("Settings", "open_http2", fallback=False)
+
+    @property
+    def http2_min_channels(self):
+        return int(config.get("Settings", "http2_min_channels", fallback=5))
+
+    @property
+    def open_soak_test(self):
+        return config.getboolean("Settings", "open_soak_test", fallback=False)
+
+    @property
+    def soak_top_n(self):
+        return int(config.get("Settings", "soak_top_n", fallback=2))
+
+    @property
+    def soak_duration(self):
+        return int(config.get("Settings", "soak_duration", fallback=60))
+
+    @property
+    def soak_concurrency(self):
+        return int(config.get("Settings", "soak_concurrency", fallback=20))
+
+    @property
+    def soak_stall_threshold(self):
+        return float(config.get("Settings", "soak_stall_threshold", fallback=2.0))
+
+    @property
+    def open_play_url(self):
+        return config.getboolean("Settings", "open_play_url", fallback=False)
+
+    @property
+    def play_base_url(self):
+        return config.get("Settings", "play_base_url", fallback="http://127.0.0.1:5000")
+
+    @property
+    def failover_max_sources(self):
+        return int(config.get("Settings", "failover_max_sources", fallback=10))
+
+    @property
+    def failover_check_interval(self):
+        return int(config.get("Settings", "failover_check_interval", fallback=60))
+
+    @property
+    def failover_check_depth(self):
+        return int(config.get("Settings", "failover_check_depth", fallback=3))
+
+    @property
+    def open_relay(self):
+        return config.getboolean("Settings", "open_relay", fallback=False)
+
+    @property
+    def relay_memory_mb(self):
+        return int(config.get("Settings", "relay_memory_mb", fallback=256))
+
+    @property
+    def relay_disk_dir(self):
+        return config.get("Settings", "relay_disk_dir", fallback="")
+
+    @property
+    def relay_disk_mb(self):
+        return int(config.get("Settings", "relay_disk_mb", fallback=1024))
+
+    @property
+    def relay_playlist_ttl(self):
+        return float(config.get("Settings", "relay_playlist_ttl", fallback=1.0))
+
+    @property
+    def open_mirror_dedup(self):
+        return config.getboolean("Settings", "open_mirror_dedup", fallback=False)
+
+    @property
+    def mirror_fingerprint_bytes(self):
+        return int(config.get("Settings", "mirror_fingerprint_bytes", fallback=16384))
+
+    @property
+    def open_adaptive_timeout(self):
+        return config.getboolean("Settings", "open_adaptive_timeout", fallback=False)
+
+    @property
+    def adaptive_timeout_factor(self):
+        return float(config.get("Settings", "adaptive_timeout_factor", fallback=3.0))
+
+    @property
+    def adaptive_timeout_min(self):
+        return float(config.get("Settings", "adaptive_timeout_min", fallback=1.0))
+
+    @property
+    def adaptive_timeout_max(self):
+        return float(config.get("Settings", "adaptive_timeout_max", fallback=30.0))
+
+    @property
+    def open_mirror_race(self):
+        return config.getboolean("Settings", "open_mirror_race", fallback=False)
+
+    @property
+    def mirror_hedge_delay(self):
+        return float(config.get("Settings", "mirror_hedge_delay", fallback=1.0))
+
+    @property
+    def open_bandwidth_governor(self):
+        return config.getboolean("Settings", "open_bandwidth_governor", fallback=False)
+
+    @property
+    def bandwidth_limit(self):
+        return float(config.get("Settings", "bandwidth_limit", fallback=0))
+
+    @property
+    def bandwidth_probe_ratio(self):
+        return float(config.get("Settings", "bandwidth_probe_ratio", fallback=0.5))
+
+    @property
+    def bandwidth_calibration_sources(self):
+        return int(config.get("Settings", "bandwidth_calibration_sources", fallback=8))
+
+    @property
+    def open_history_archive(self):
+        return config.getboolean("Settings", "open_history_archive", fallback=False)
+
+    @property
+    def history_archive_days(self):
+        return int(config.get("Settings", "history_archive_days", fallback=28))
+
+    @property
+    def history_half_life(self):
+        return float(config.get("Settings", "history_half_life", fallback=3.0))
+
+    @property
+    def history_speed_percentile(self):
+        return int(config.get("Settings", "history_speed_percentile", fallback=20))
+
+    @property
+    def open_ts_analyzer(self):
+        return config.getboolean("Settings", "open_ts_analyzer", fallback=False)
+
+    @property
+    def ts_analyzer_bytes(self):
+        return int(config.get("Settings", "ts_analyzer_bytes", fallback=2097152))
+
+    @property
+    def ffmpeg_deep_check(self):
+        return config.getboolean("Settings", "ffmpeg_deep_check", fallback=False)
+
+    @property
+    def open_profiles(self):
+        return config.getboolean("Settings", "open_profiles", fallback=False)
+
+    @property
+    def profiles_file(self):
+        return config.get("Settings", "profiles_file", fallback="config/profiles.ini")
+
 config_instance = Config()
\ No newline at end of file
@@ -0,0 +1,27 @@
+import os
+
+output_dir = 'output'
+
+# 最终结果文件
+result_path = os.path.join(output_dir, 'result.m3u')
+live_result_path = result_path
+
+# 按地址族拆分的结果文件
+ipv4_result_path = os.path.join(output_dir, 'result_ipv4.m3u')
+ipv6_result_path = os.path.join(output_dir, 'result_ipv6.m3u')
+live_ipv6_result_path = ipv6_result_path
+
+# EPG：下载的完整节目单和只包含已发布频道的精简节目单
+epg_source_path = os.path.join(output_dir, 'epg_source.xml')
+epg_result_path = os.path.join(output_dir, 'epg.xml.gz')
+
+# 故障切换：每个频道的排名源列表和使用固定 /play 地址的播放列表
+failover_sources_path = os.path.join(output_dir, 'failover_sources.json')
+play_result_path = os.path.join(output_dir, 'result_play.m3u')
+
+# 测速历史归档和频道质量趋势报告
+history_archive_path = os.path.join(output_dir, 'probe_archive.npz')
+trend_report_path = os.path.join(output_dir, 'trend_report.txt')
+
+# 多套输出配置的结果文件目录
+profiles_output_dir = os.path.join(output_dir, 'profiles')
@@ -0,0 +1,220 @@
+import asyncio
+import aiohttp
+from aiohttp import web
+import itertools
+import logging
+import time
+from urllib.parse import urlparse
+
+
+def get_host(url):
+    """获取 URL 的主机名（含端口），用于按主机分片"""
+    try:
+        return urlparse(url).netloc.lower()
+    except ValueError:
+        return ''
+
+
+class ProbeCoordinator:
+    """分布式测速协调器
+
+    主流程通过 submit() 提交测速任务并等待结果，工作节点通过 HTTP 接口领取任务：
+      POST /lease   领取一个分片（同一主机的任务尽量分到同一分片）
+      POST /result  提交分片的测试结果
+    超过租约时间未提交结果的分片会重新放回队列，交给其他工作节点。
+    有任务等待时超过 worker_timeout 秒没有任何工作节点连接，协调器在本机启动一个工作节点（使用 local_handlers）
+    执行剩余任务，不会一直等待。
+    """
+
+    def __init__(self, host='0.0.0.0', port=8765, shard_size=50, lease_timeout=120, worker_timeout=60,
+                 local_handlers=None, local_concurrency=10):
+        self.host = host
+        self.port = port
+        self.shard_size = shard_size
+        self.lease_timeout = lease_timeout
+        self.worker_timeout = worker_timeout
+        self.local_handlers = local_handlers
+        self.local_concurrency = local_concurrency
+        self._ids = itertools.count()
+        self._pending = {}  # 主机 -> {任务ID: (任务ID, 阶段, 参数)}，按提交顺序排列
+        self._futures = {}  # 任务ID -> Future
+        self._leases = {}  # 分片ID -> (租约到期时间, 任务列表)
+        self._shard_ids = itertools.count()
+        self._workers = set()
+        self._last_contact = None
+        self._closing = False
+        self._runner = None
+        self._watchdog = None
+        self._local_worker = None
+
+    async def start(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post('/lease', self._handle_lease)
+        app.router.add_post('/result', self._handle_result)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self._last_contact = time.time()
+        if self.local_handlers:
+            self._watchdog = asyncio.ensure_future(self._watch_workers())
+        logging.info(f"分布式协调器已启动: http://{self.host}:{self.port}")
+
+    async def close(self):
+        """通知工作节点退出并关闭服务"""
+        self._closing = True
+        if self._watchdog:
+            self._watchdog.cancel()
+        # 给正在轮询的工作节点留出收到退出指令的时间
+        await asyncio.sleep(1)
+        if self._local_worker:
+            await asyncio.gather(self._local_worker, return_exceptions=True)
+        if self._runner:
+            await self._runner.cleanup()
+        logging.info(f"分布式协调器已关闭，共有 {len(self._workers)} 个工作节点参与测速")
+
+    def submit(self, phase, url, **params):
+        """提交一个测速任务，返回等待结果的 Future"""
+        task_id = next(self._ids)
+        host = get_host(url)
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda done: self._forget(task_id, host) if done.cancelled() else None)
+        self._futures[task_id] = future
+        self._pending.setdefault(host, {})[task_id] = (task_id, phase, dict(params, url=url))
+        return future
+
+    def _forget(self, task_id, host):
+        """调用方取消等待（如到达时间预算）时删除任务，不再分给工作节点"""
+        self._futures.pop(task_id, None)
+        queue = self._pending.get(host)
+        if queue is not None:
+            queue.pop(task_id, None)
+            if not queue:
+                del self._pending[host]
+
+    async def _watch_workers(self):
+        """有任务等待但长时间没有工作节点连接时，在本机启动工作节点"""
+        while not self._closing:
+            await asyncio.sleep(1)
+            if self._futures and time.time() - self._last_contact > self.worker_timeout:
+                logging.warning(f"超过 {self.worker_timeout} 秒没有工作节点连接，改为在本机测速")
+                host = '127.0.0.1' if self.host in ('0.0.0.0', '::', '') else self.host
+                self._local_worker = asyncio.ensure_future(run_worker(
+                    f"http://{host}:{self.port}", self.local_handlers, concurrency=self.local_concurrency,
+                    worker_name='local'))
+                return
+
+    def _requeue_expired(self):
+        now = time.time()
+        for shard_id, (expires, tasks) in list(self._leases.items()):
+            if expires < now:
+                logging.warning(f"分片 {shard_id} 租约超时，重新放回队列（{len(tasks)} 个任务）")
+                del self._leases[shard_id]
+                for task in tasks:
+                    future = self._futures.get(task[0])
+                    if future is not None and not future.done():
+                        self._pending.setdefault(get_host(task[2]['url']), {})[task[0]] = task
+
+    def _take_shard(self):
+        """按主机取出一个分片：优先取任务最多的主机，不足分片大小时补充其他主机的任务"""
+        tasks = []
+        for host in sorted(self._pending, key=lambda h: -len(self._pending[h])):
+            queue = self._pending[host]
+            taken = list(itertools.islice(queue.values(), self.shard_size - len(tasks)))
+            tasks.extend(taken)
+            for task in taken:
+                del queue[task[0]]
+            if not queue:
+                del self._pending[host]
+            if len(tasks) >= self.shard_size:
+                break
+        return tasks
+
+    async def _handle_lease(self, request):
+        data = await request.json()
+        self._workers.add(data.get('worker', request.remote))
+        self._last_contact = time.time()
+        if self._closing:
+            return web.json_response({'done': True})
+        self._requeue_expired()
+        tasks = self._take_shard()
+        if not tasks:
+            return web.json_response({'wait': True})
+        shard_id = next(self._shard_ids)
+        self._leases[shard_id] = (time.time() + self.lease_timeout, tasks)
+        return web.json_response({
+            'shard_id': shard_id,
+            'tasks': [{'id': task_id, 'phase': phase, 'params': params} for task_id, phase, params in tasks],
+        })
+
+    async def _handle_result(self, request):
+        data = await request.json()
+        self._last_contact = time.time()
+        self._leases.pop(data['shard_id'], None)
+        for item in data['results']:
+            future = self._futures.pop(item['id'], None)
+            if future is not None and not future.done():
+                future.set_result(item['result'])
+        return web.json_response({'ok': True})
+
+
+async def run_worker(coordinator_url, handlers, concurrency=10, worker_name=None):
+    """工作节点主循环：不断领取分片，调用对应阶段的测试函数并回传结果
+
+    handlers: 阶段名称 -> async def handler(session, params) -> dict
+    """
+    coordinator_url = coordinator_url.rstrip('/')
+    worker_name = worker_name or f"worker-{id(handlers):x}"
+    sem = asyncio.Semaphore(concurrency)
+    failures = 0
+
+    async with aiohttp.ClientSession() as session:
+        async def run_task(task):
+            async with sem:
+                handler = handlers.get(task['phase'])
+                if handler is None:
+                    return {'id': task['id'], 'result': {'success': False, 'error': f"未知阶段 {task['phase']}"}}
+                try:
+                    result = await handler(session, task['params'])
+                except Exception as e:
+                    logging.error(f"工作节点执行任务失败: {task['params'].get('url')}: {e}")
+                    result = {'success': False, 'error': str(e)}
+                return {'id': task['id'], 'result': result}
+
+        while True:
+            try:
+                async with session.post(f"{coordinator_url}/lease", json={'worker': worker_name}) as response:
+                    lease = await response.json()
+                failures = 0
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                failures += 1
+                if failures > 30:
+                    logging.error(f"无法连接协调器 {coordinator_url}，工作节点退出: {e}")
+                    return
+                await asyncio.sleep(1)
+                continue
+
+            if lease.get('done'):
+                logging.info("协调器通知测速结束，工作节点退出")
+                return
+            if lease.get('wait'):
+                await asyncio.sleep(0.5)
+                continue
+
+            logging.info(f"领取分片 {lease['shard_id']}，共 {len(lease['tasks'])} 个任务")
+            results = await asyncio.gather(*(run_task(task) for task in lease['tasks']))
+            # 回传结果失败时与领取分片一样重试，协调器长时间不可用才退出（分片租约到期后由其他工作节点重做）
+            payload = {'shard_id': lease['shard_id'], 'results': results}
+            while True:
+                try:
+                    async with session.post(f"{coordinator_url}/result", json=payload) as response:
+                        response.raise_for_status()
+                        await response.read()
+                    failures = 0
+                    break
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    failures += 1
+                    if failures > 30:
+                        logging.error(f"无法向协调器 {coordinator_url} 回传结果，工作节点退出: {e}")
+                        return
+                    await asyncio.sleep(1)
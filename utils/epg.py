@@ -0,0 +1,103 @@
+import aiohttp
+import gzip
+import logging
+import os
+import time
+import xml.etree.ElementTree as ET
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+async def fetch_epg(url, path, max_age=6 * 3600, timeout=120):
+    """下载 XMLTV 节目单到 path，本地文件未超过 max_age 秒时不重复下载；返回是否有可用文件"""
+    if os.path.exists(path) and time.time() - os.path.getmtime(path) < max_age:
+        logging.info(f"EPG源文件仍在有效期内，跳过下载: {path}")
+        return True
+    logging.info(f"开始下载EPG: {url}")
+    start_time = time.time()
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                if response.status != 200:
+                    logging.warning(f"下载EPG失败，状态码: {response.status}")
+                    return os.path.exists(path)
+                tmp_path = f"{path}.tmp"
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                with open(tmp_path, 'wb') as f:
+                    async for chunk in response.content.iter_chunked(65536):
+                        f.write(chunk)
+                os.replace(tmp_path, path)
+    except Exception as e:
+        logging.error(f"下载EPG时发生错误: {e}")
+        return os.path.exists(path)
+    logging.info(f"EPG下载完成，大小 {os.path.getsize(path) / 1024 / 1024:.1f} MB，耗时 {time.time() - start_time:.1f} 秒")
+    return True
+
+
+def open_xmltv(path):
+    """打开 XMLTV 文件，自动识别 gzip 压缩"""
+    with open(path, 'rb') as f:
+        magic = f.read(2)
+    return gzip.open(path, 'rb') if magic == GZIP_MAGIC else open(path, 'rb')
+
+
+def build_filtered_epg(source_path, published_channels, output_path, channel_id_func):
+    """从完整的 XMLTV 中流式提取已发布频道的节目单，写入 gzip 压缩的 XMLTV
+
+    published_channels: 我们发布的 tvg-id -> 频道名称
+    channel_id_func: 频道名称 -> 标准频道 ID（main.get_channel_id），用于匹配 EPG 中的频道 ID 和显示名称
+    输出文件中的频道 ID 改写为播放列表中的 tvg-id，客户端可以直接对应。
+    """
+    # 标准频道 ID -> 我们的 tvg-id
+    wanted = {}
+    for tvg_id, name in published_channels.items():
+        wanted.setdefault(channel_id_func(name), tvg_id)
+        wanted.setdefault(channel_id_func(tvg_id), tvg_id)
+
+    id_mapping = {}  # EPG 频道 ID -> 我们的 tvg-id，每个 tvg-id 只取第一个匹配的 EPG 频道，避免节目重复
+    written_channels = set()
+    programme_count = 0
+    tmp_path = f"{output_path}.tmp"
+
+    with open_xmltv(source_path) as source, gzip.open(tmp_path, 'wt', encoding='utf-8') as out:
+        out.write('<?xml version="1.0" encoding="UTF-8"?>\n<tv generator-info-name="MYIPTV">\n')
+        root = None
+        for event, elem in ET.iterparse(source, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = elem
+                continue
+
+            if elem.tag == 'channel':
+                epg_id = elem.get('id', '')
+                names = [epg_id] + [(node.text or '').strip() for node in elem.findall('display-name')]
+                for name in names:
+                    tvg_id = wanted.get(channel_id_func(name)) if name else None
+                    if tvg_id:
+                        if tvg_id not in written_channels:
+                            id_mapping[epg_id] = tvg_id
+                            written_channels.add(tvg_id)
+                            channel = ET.Element('channel', id=tvg_id)
+                            ET.SubElement(channel, 'display-name', lang='zh').text = published_channels[tvg_id]
+                            for icon in elem.findall('icon'):
+                                channel.append(icon)
+                            out.write(ET.tostring(channel, encoding='unicode') + '\n')
+                        break
+                root.clear()
+            elif elem.tag == 'programme':
+                tvg_id = id_mapping.get(elem.get('channel'))
+                if tvg_id:
+                    elem.set('channel', tvg_id)
+                    elem.tail = None
+                    out.write(ET.tostring(elem, encoding='unicode') + '\n')
+                    programme_count += 1
+                root.clear()
+        out.write('</tv>\n')
+
+    os.replace(tmp_path, output_path)
+    missing = sorted(set(published_channels) - written_channels)
+    logging.info(f"已生成精简EPG: {output_path}，{len(written_channels)} 个频道，{programme_count} 条节目，"
+                 f"大小 {os.path.getsize(output_path) / 1024:.0f} KB（源文件 {os.path.getsize(source_path) / 1024:.0f} KB）")
+    if missing:
+        logging.info(f"EPG中未找到以下 {len(missing)} 个频道: {', '.join(missing[:50])}")
+    return len(written_channels), programme_count
@@ -0,0 +1,141 @@
+import aiohttp
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+from utils.lean_http import LeanFallback, lean_probe
+from utils.protocols import get_stream_protocol, probe_stream
+
+
+def save_failover_sources(path, ranked_sources):
+    """保存每个频道按排名排列的可用源：频道ID -> {'name': 频道名称, 'sources': [地址...]}"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(ranked_sources, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+class SourceState:
+    __slots__ = ('url', 'healthy', 'failures', 'latency', 'checked')
+
+    def __init__(self, url):
+        self.url = url
+        self.healthy = True  # 测速时是可用的，检查前默认健康
+        self.failures = 0
+        self.latency = None
+        self.checked = 0.0
+
+
+class FailoverTable:
+    """每个频道的排名源列表，后台线程定期做轻量的存活检查，/play/<频道ID> 跳转到当前最好的健康源
+
+    源列表来自测速生成的文件，文件更新后自动重新加载。每轮按排名依次检查，直到找到 check_depth 个健康的源，
+    排名靠前的源失效后会被跳过，恢复后重新启用；连续失败 failure_threshold 次才判定为失效，避免偶发超时导致频繁切换。
+    """
+
+    def __init__(self, path, check_interval=60, check_depth=3, failure_threshold=2, concurrency=50):
+        self.path = path
+        self.check_interval = check_interval
+        self.check_depth = check_depth
+        self.failure_threshold = failure_threshold
+        self.concurrency = concurrency
+        self.channels = {}  # 频道ID -> [SourceState...]，按排名排列
+        self.mtime = None
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def reload_if_changed(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self.mtime:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"读取故障切换源列表失败: {e}")
+            return
+        with self.lock:
+            previous = {state.url: state for states in self.channels.values() for state in states}
+            self.channels = {channel_id: [previous.get(url) or SourceState(url) for url in entry.get('sources', [])]
+                             for channel_id, entry in data.items()}
+            self.mtime = mtime
+        logging.info(f"已加载故障切换源列表，共 {len(self.channels)} 个频道")
+
+    def best(self, channel_id):
+        """返回当前排名最高的健康源；全部失效时返回排名第一的源，频道不存在时返回 None"""
+        self.reload_if_changed()
+        with self.lock:
+            states = self.channels.get(channel_id)
+            if not states:
+                return None
+            return next((state.url for state in states if state.healthy), states[0].url)
+
+    def start(self):
+        """启动后台检查线程（只启动一次）"""
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=lambda: asyncio.run(self._run()), name='failover-checker', daemon=True)
+        self.thread.start()
+
+    async def _run(self):
+        async with aiohttp.ClientSession() as session:
+            while True:
+                self.reload_if_changed()
+                start_time = time.monotonic()
+                try:
+                    await self.check_once(session)
+                except Exception as e:
+                    logging.error(f"故障切换检查出错: {e}")
+                await asyncio.sleep(max(1.0, self.check_interval - (time.monotonic() - start_time)))
+
+    async def check_once(self, session):
+        sem = asyncio.Semaphore(self.concurrency)
+        with self.lock:
+            channels = list(self.channels.values())
+        await asyncio.gather(*(self._check_channel(session, states, sem) for states in channels))
+
+    async def _check_channel(self, session, states, sem):
+        healthy = 0
+        for state in states:
+            if healthy >= self.check_depth:
+                break
+            async with sem:
+                await self._check_source(session, state)
+            if state.healthy:
+                healthy += 1
+
+    async def _check_source(self, session, state):
+        start_time = time.monotonic()
+        try:
+            if get_stream_protocol(state.url) is not None:
+                alive = (await probe_stream(session, state.url, timeout=5))['success']
+            else:
+                try:
+                    status = await lean_probe(state.url, timeout=5)
+                except LeanFallback:
+                    async with session.get(state.url, timeout=aiohttp.ClientTimeout(total=5)) as response:
+                        status = response.status
+                alive = status == 200
+        except Exception:
+            alive = False
+        state.checked = time.time()
+        if alive:
+            state.latency = time.monotonic() - start_time
+            state.failures = 0
+            state.healthy = True
+        else:
+            state.failures += 1
+            if state.failures >= self.failure_threshold:
+                if state.healthy:
+                    logging.info(f"源已失效，切换到下一个源: {state.url}")
+                state.healthy = False
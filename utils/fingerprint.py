@@ -0,0 +1,86 @@
+import hashlib
+import logging
+import posixpath
+from urllib.parse import urlsplit
+
+from utils.scheduler import run_with_deadline
+from utils.soak import is_hls_response, select_lowest_variant, parse_media_playlist
+
+
+def segment_name(url):
+    """分片的文件名（去掉主机、目录和查询参数），同一内容的镜像通常只有这部分相同"""
+    return posixpath.basename(urlsplit(url).path)
+
+
+def playlist_structure(target_duration, segments):
+    """媒体播放列表的结构：目标时长，以及每个分片的序号、时长和文件名"""
+    parts = [f"{target_duration:g}"]
+    parts.extend(f"{sequence}:{duration:.3f}:{segment_name(url)}" for sequence, duration, url in segments)
+    return '\n'.join(parts)
+
+
+async def fingerprint_source(fetch, url, timeout=5, sample_bytes=16384):
+    """计算 HLS 源的内容指纹：播放列表结构 + 第一个分片开头 sample_bytes 字节的哈希
+
+    只有播放列表结构和分片内容都相同才会得到相同的指纹，不会把不同的流误判为镜像。
+    TS 等连续流从任意位置开始传输，无法比较开头的字节，返回 None；请求失败同样返回 None。
+    """
+    try:
+        async with fetch(url, timeout=timeout) as response:
+            if response.status != 200 or not is_hls_response(response, url):
+                return None
+            content = await response.text()
+            playlist_url = str(response.url)
+        variant = select_lowest_variant(content, playlist_url)
+        if variant:
+            async with fetch(variant, timeout=timeout) as response:
+                if response.status != 200:
+                    return None
+                content = await response.text()
+                playlist_url = str(response.url)
+        target_duration, segments, _ = parse_media_playlist(content, playlist_url)
+        if not segments:
+            return None
+        digest = hashlib.sha1(playlist_structure(target_duration, segments).encode('utf-8'))
+        async with fetch(segments[0][2], timeout=timeout, remember=False) as response:
+            if response.status != 200:
+                return None
+            received = 0
+            while received < sample_bytes:
+                data = await response.content.readany()
+                if not data:
+                    break
+                data = data[:sample_bytes - received]
+                digest.update(data)
+                received += len(data)
+        if not received:
+            return None
+        return digest.hexdigest()
+    except Exception as e:
+        logging.debug(f"计算内容指纹失败 {url}: {e}")
+        return None
+
+
+async def cluster_mirrors(channels, fetch_for, rank=None, concurrency=20, timeout=5, sample_bytes=16384, deadline=None):
+    """按频道名称和内容指纹把源分成镜像簇，返回簇列表，每个簇按 rank 排序，第一个作为代表
+
+    fetch_for(channel) 返回该源使用的 fetch(url, timeout=..., remember=...)；没有指纹的源（非 HLS、请求失败或超过截止时间）单独成簇。
+    """
+    fingerprints = {}
+
+    async def compute(channel):
+        fingerprints[id(channel)] = await fingerprint_source(fetch_for(channel), channel['url'], timeout=timeout,
+                                                             sample_bytes=sample_bytes)
+
+    await run_with_deadline(channels, compute, concurrency=concurrency, deadline=deadline)
+
+    clusters = {}
+    for channel in channels:
+        fingerprint = fingerprints.get(id(channel))
+        key = (channel['name'].split('/')[0].strip(), fingerprint) if fingerprint else id(channel)
+        clusters.setdefault(key, []).append(channel)
+    result = [sorted(members, key=rank) if rank else members for members in clusters.values()]
+    mirrors = sum(len(members) - 1 for members in result)
+    if mirrors:
+        logging.info(f"内容指纹: {len(channels)} 个源分为 {len(result)} 个簇，{mirrors} 个镜像源不再单独测速")
+    return result
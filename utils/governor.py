@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import time
+
+
+class TokenBucket:
+    """令牌桶限速：rate 为每秒补充的字节数，burst 为最多积攒的字节数"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst if burst is not None else rate * 0.25
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def consume(self, amount):
+        """取走 amount 字节的令牌，令牌不足时等待补充（允许欠账，下次请求等待更久）"""
+        async with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            if self.tokens < 0:
+                await asyncio.sleep(-self.tokens / self.rate)
+
+
+class BandwidthGovernor:
+    """全局带宽调度：所有测速下载共享 total_rate 的总带宽，每个测速各自限制在 share = total_rate / slots
+
+    slots 与测速并发数相同，同时进行的测速不会互相挤占带宽，测得的速度只取决于源本身（最高为 share），
+    不同时刻、不同批次的结果可以直接比较；总带宽低于链路容量，测速期间不会影响正常观看。
+    """
+
+    def __init__(self, total_rate, slots):
+        self.total_rate = total_rate
+        self.slots = max(1, slots)
+        self.share = total_rate / self.slots
+        self.total = TokenBucket(total_rate)
+
+    def throttle(self):
+        """返回单个测速使用的限速函数 throttle(字节数)，供 ThroughputSampler 在每次读取后调用"""
+        own = TokenBucket(self.share)
+
+        async def throttle(amount):
+            await self.total.consume(amount)
+            await own.consume(amount)
+
+        return throttle
+
+    def normalize(self, speed):
+        """达到份额的源都按份额计，避免限速的微小误差影响排序（MB/s）"""
+        return min(speed, self.share / (1024 * 1024))
+
+
+async def calibrate_link_capacity(probes):
+    """同时运行多个不限速的测速估算链路容量：probes 为返回测速结果（含 speed，MB/s）的协程列表，
+    返回各路速度之和（字节/秒），没有成功的测速时返回 None"""
+    results = await asyncio.gather(*probes, return_exceptions=True)
+    speeds = [result.get('speed', 0) for result in results if isinstance(result, dict) and result.get('success')]
+    if not sum(speeds):
+        return None
+    capacity = sum(speeds) * 1024 * 1024
+    logging.info(f"链路容量估算: {capacity / (1024 * 1024):.2f} MB/s（{len(speeds)} 个源同时下载）")
+    return capacity
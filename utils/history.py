@@ -0,0 +1,53 @@
+import json
+import logging
+import os
+import time
+
+
+class ProbeHistory:
+    """按 URL 记录历史测速结果（成功/失败次数、最近响应时间和速度），用于确定测速优先级
+
+    archive 为可选的 HistoryArchive，每次测速结果同时写入按列存储的历史归档。
+    """
+
+    def __init__(self, path='output/probe_history.json', archive=None):
+        self.path = path
+        self.archive = archive
+        self.records = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.records = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning(f"读取测速历史失败，将重新记录: {e}")
+
+    def record(self, url, success, response_time=None, speed=None, name=None):
+        if self.archive is not None:
+            self.archive.record(url, success, response_time, speed, name)
+        record = self.records.setdefault(url, {'ok': 0, 'fail': 0})
+        if success:
+            record['ok'] += 1
+        else:
+            record['fail'] += 1
+        if response_time is not None and response_time != float('inf'):
+            record['response_time'] = response_time
+        if speed is not None:
+            record['speed'] = speed
+        record['time'] = int(time.time())
+
+    def score(self, url):
+        """历史可用率（拉普拉斯平滑），没有记录的源为 0.5"""
+        record = self.records.get(url)
+        if not record:
+            return 0.5
+        return (record['ok'] + 1) / (record['ok'] + record['fail'] + 2)
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.records, f, ensure_ascii=False)
+        if self.archive is not None:
+            self.archive.save()
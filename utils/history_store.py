@@ -0,0 +1,187 @@
+import logging
+import os
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DAY = 86400
+COLUMNS = {
+    'source': 'int32',  # 源编号，对应 urls / names 中的下标
+    'time': 'int64',  # 测速时间（Unix 时间戳，秒）
+    'success': 'bool',
+    'response_time': 'float32',  # 失败或未记录时为 NaN
+    'speed': 'float32',  # MB/s，第一阶段没有速度，记为 NaN
+}
+
+
+def group_percentile(groups, values, q, size):
+    """按组计算 values 的 q 百分位（最近秩），NaN 不参与计算，没有样本的组为 NaN"""
+    result = np.full(size, np.nan, dtype='float64')
+    mask = ~np.isnan(values)
+    groups, values = groups[mask], values[mask]
+    if not len(values):
+        return result
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    unique, starts, counts = np.unique(groups, return_index=True, return_counts=True)
+    result[unique] = values[starts + np.floor(q / 100 * (counts - 1)).astype('int64')]
+    return result
+
+
+class HistoryArchive:
+    """按列存储的测速历史归档：每次测速一行，按源编号、时间、成功与否、响应时间和速度分列保存在 .npz 文件中
+
+    保留 max_age_days 天内的全部样本，评分和趋势统计对所有源一次性用 NumPy 向量化计算，
+    样本数达到数百万时也不需要逐个 URL 遍历字典。
+    """
+
+    def __init__(self, path='output/probe_archive.npz', max_age_days=28):
+        self.path = path
+        self.max_age_days = max_age_days
+        self.urls = []
+        self.names = []
+        self.index = {}  # URL -> 源编号
+        self.columns = {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.pending = []
+
+    def load(self):
+        try:
+            with np.load(self.path) as data:
+                self.urls = data['urls'].tolist()
+                self.names = data['names'].tolist()
+                self.columns = {name: data[name].astype(dtype) for name, dtype in COLUMNS.items()}
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"读取测速历史归档失败，将重新记录: {e}")
+            self.urls, self.names = [], []
+            self.columns = {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.index = {url: i for i, url in enumerate(self.urls)}
+
+    def source_id(self, url, name=None):
+        source = self.index.get(url)
+        if source is None:
+            source = self.index[url] = len(self.urls)
+            self.urls.append(url)
+            self.names.append(name or '')
+        elif name:
+            self.names[source] = name
+        return source
+
+    def record(self, url, success, response_time=None, speed=None, name=None):
+        if response_time is None or response_time == float('inf'):
+            response_time = float('nan')
+        self.pending.append((self.source_id(url, name), int(time.time()), bool(success), response_time,
+                             float('nan') if speed is None else speed))
+
+    def _flush(self):
+        if not self.pending:
+            return
+        rows = list(zip(*self.pending))
+        self.pending = []
+        for (name, dtype), values in zip(COLUMNS.items(), rows):
+            self.columns[name] = np.concatenate([self.columns[name], np.asarray(values, dtype=dtype)])
+
+    def save(self):
+        """写入归档：删除超过保留期的样本，并重新编号，去掉不再有样本的源"""
+        self._flush()
+        keep = self.columns['time'] >= time.time() - self.max_age_days * DAY
+        columns = {name: values[keep] for name, values in self.columns.items()}
+        used, columns['source'] = np.unique(columns['source'], return_inverse=True)
+        columns['source'] = columns['source'].astype('int32')
+        urls = [self.urls[i] for i in used]
+        names = [self.names[i] for i in used]
+        self.urls, self.names, self.columns = urls, names, columns
+        self.index = {url: i for i, url in enumerate(urls)}
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, urls=np.array(urls, dtype=str), names=np.array(names, dtype=str), **columns)
+        os.replace(tmp_path, self.path)
+
+    def stats(self, half_life_days=3.0, percentile=20, since=None):
+        """对所有源向量化计算：按时间衰减加权的可用率、速度百分位（MB/s）和样本数，返回以源编号为下标的数组字典
+
+        since 为起始时间戳，只统计之后的样本；评分 score = 可用率 × (1 + 速度百分位)，以可用率为主、速度为辅。
+        """
+        self._flush()
+        size = len(self.urls)
+        source, sample_time = self.columns['source'], self.columns['time']
+        success, speed = self.columns['success'], self.columns['speed']
+        if since is not None:
+            mask = sample_time >= since
+            source, sample_time, success, speed = source[mask], sample_time[mask], success[mask], speed[mask]
+        weights = 0.5 ** ((time.time() - sample_time) / (half_life_days * DAY))
+        total = np.bincount(source, weights=weights, minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            uptime = np.bincount(source, weights=weights * success, minlength=size) / total
+        speed_percentile = group_percentile(source, speed.astype('float64'), percentile, size)
+        score = np.nan_to_num(uptime) * (1 + np.nan_to_num(speed_percentile))
+        return {
+            'uptime': uptime,
+            'speed': speed_percentile,
+            'score': score,
+            'samples': np.bincount(source, minlength=size),
+        }
+
+    def scores(self, half_life_days=3.0, percentile=20):
+        """返回 URL -> 历史评分"""
+        score = self.stats(half_life_days, percentile)['score']
+        return dict(zip(self.urls, score.tolist()))
+
+    def trend_report(self, recent_days=1, baseline_days=7, uptime_drop=0.2, speed_drop=0.5):
+        """按频道比较最近 recent_days 天与此前 baseline_days 天的可用率和速度中位数，返回正在变差的频道列表
+
+        每项为 (频道, 基准可用率, 最近可用率, 基准速度, 最近速度)，按可用率下降幅度从大到小排列。
+        """
+        self._flush()
+        now = time.time()
+        channel_names, channel_of_source = np.unique(np.array(self.names, dtype=str), return_inverse=True)
+        channel = channel_of_source[self.columns['source']]
+        sample_time = self.columns['time']
+        recent = sample_time >= now - recent_days * DAY
+        baseline = ~recent & (sample_time >= now - (recent_days + baseline_days) * DAY)
+        size = len(channel_names)
+
+        def window(mask):
+            counts = np.bincount(channel[mask], minlength=size)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                uptime = np.bincount(channel[mask], weights=self.columns['success'][mask], minlength=size) / counts
+            speed = group_percentile(channel[mask], self.columns['speed'][mask].astype('float64'), 50, size)
+            return uptime, speed
+
+        base_uptime, base_speed = window(baseline)
+        recent_uptime, recent_speed = window(recent)
+        with np.errstate(invalid='ignore'):
+            degrading = (recent_uptime < base_uptime - uptime_drop) | (recent_speed < base_speed * speed_drop)
+        degrading &= channel_names != ''
+        order = np.argsort(-(np.nan_to_num(base_uptime) - np.nan_to_num(recent_uptime)))
+        return [(str(channel_names[i]), float(base_uptime[i]), float(recent_uptime[i]), float(base_speed[i]),
+                 float(recent_speed[i])) for i in order if degrading[i]]
+
+
+def write_trend_report(path, degrading):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"# 生成时间: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())}\n")
+        f.write("# 频道,基准可用率,最近可用率,基准速度(MB/s),最近速度(MB/s)\n")
+        for name, base_uptime, recent_uptime, base_speed, recent_speed in degrading:
+            f.write(f"{name},{base_uptime:.1%},{recent_uptime:.1%},{base_speed:.2f},{recent_speed:.2f}\n")
+
+
+def create_history_archive(path, max_age_days=28):
+    """未安装 NumPy 时返回 None"""
+    if np is None:
+        logging.warning("未安装 numpy，测速历史归档不可用")
+        return None
+    archive = HistoryArchive(path, max_age_days=max_age_days)
+    archive.load()
+    return archive
@@ -0,0 +1,139 @@
+import logging
+from collections import Counter
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+import aiohttp
+
+from utils.network import IPV4, IPV6
+
+try:
+    import httpx
+    import h2  # noqa: F401  httpx 需要 h2 才能协商 HTTP/2
+except ImportError:
+    httpx = None
+
+# httpx 默认在 INFO 级别记录每个请求，测速时过于频繁
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+# 固定本地地址即可让 httpx 只使用对应地址族连接
+LOCAL_ADDRESSES = {None: None, IPV4: '0.0.0.0', IPV6: '::'}
+
+
+def get_host(url):
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return None
+    return parsed.hostname if parsed.scheme == 'https' else None
+
+
+class StreamContent:
+    """让 httpx 的响应流提供与 aiohttp StreamReader 相同的 readany()，供 ThroughputSampler 使用"""
+
+    def __init__(self, response):
+        self._chunks = response.aiter_raw()
+
+    async def readany(self):
+        try:
+            return await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return b''
+
+
+class Http2Response:
+    """包装 httpx 响应，提供测速代码用到的 aiohttp 响应属性：status、headers、url、text()、content"""
+
+    def __init__(self, response):
+        self._response = response
+        self.status = response.status_code
+        self.headers = response.headers
+        self.url = response.url
+        self.http_version = response.http_version
+        self.content = StreamContent(response)
+
+    async def text(self):
+        await self._response.aread()
+        return self._response.text
+
+
+class Http2Prober:
+    """对承载大量频道的 HTTPS 主机使用 HTTP/2 探测
+
+    同一主机的播放列表和分片请求复用一条连接（通过 ALPN 协商，服务器不支持时 httpx 自动使用 HTTP/1.1），
+    减少 TLS 握手次数和对单个 CDN 主机的连接压力。只有频道数不少于 min_channels 的主机才会使用。
+    """
+
+    def __init__(self, channels, resolver, min_channels=5, max_redirects=5, max_connections=100):
+        counts = Counter(get_host(channel['url']) for channel in channels)
+        counts.pop(None, None)
+        self.hosts = {host for host, count in counts.items() if count >= min_channels}
+        self.resolver = resolver
+        self.max_redirects = max_redirects
+        self.max_connections = max_connections
+        self.clients = {}
+        self.versions = Counter()
+
+    def handles(self, url):
+        return get_host(url) in self.hosts
+
+    def client(self, family=None):
+        """按地址族获取客户端，family 取值与 create_family_sessions 的键相同"""
+        if family not in self.clients:
+            local_address = LOCAL_ADDRESSES[family]
+            transport = httpx.AsyncHTTPTransport(http2=True, retries=0, local_address=local_address,
+                                                 limits=httpx.Limits(max_connections=self.max_connections))
+            self.clients[family] = httpx.AsyncClient(http2=True, transport=transport, follow_redirects=True,
+                                                     max_redirects=self.max_redirects)
+        return self.clients[family]
+
+    @asynccontextmanager
+    async def get(self, url, family=None, timeout=10, remember=True):
+        """与 RedirectResolver.get 用法相同：优先请求缓存的最终地址，失效时从原始地址重新请求
+
+        timeout 可以是秒数或 aiohttp.ClientTimeout，后者转换为 httpx 对应的连接和读取超时。
+        """
+        if isinstance(timeout, aiohttp.ClientTimeout):
+            timeout = httpx.Timeout(timeout.total, connect=timeout.sock_connect or timeout.total,
+                                    read=timeout.sock_read or timeout.total)
+        client = self.client(family)
+        cached = self.resolver.lookup(url)
+        response = None
+        if cached:
+            try:
+                response = await client.send(client.build_request('GET', cached, timeout=timeout), stream=True)
+                if response.status_code >= 400:
+                    await response.aclose()
+                    response = None
+            except httpx.HTTPError:
+                response = None
+            if response is None:
+                self.resolver.invalidate(url)
+        if response is None:
+            response = await client.send(client.build_request('GET', url, timeout=timeout), stream=True)
+            # 只缓存真正发生过的重定向；httpx 会规范化 URL（如补全路径、转义字符），字符串不同不代表有跳转
+            if remember and response.history:
+                self.resolver.remember(url, str(response.url))
+        self.versions[response.http_version] += 1
+        try:
+            yield Http2Response(response)
+        finally:
+            await response.aclose()
+
+    async def close(self):
+        for client in self.clients.values():
+            await client.aclose()
+        if self.versions:
+            logging.info("HTTP/2 探测完成: " + ', '.join(f"{version} {count} 次" for version, count in self.versions.items()))
+
+
+def create_http2_prober(channels, resolver, min_channels=5, max_redirects=5):
+    """httpx[http2] 未安装或没有足够大的 HTTPS 主机时返回 None"""
+    if httpx is None:
+        logging.warning("未安装 httpx[http2]，HTTP/2 探测不可用，继续使用 HTTP/1.1")
+        return None
+    prober = Http2Prober(channels, resolver, min_channels=min_channels, max_redirects=max_redirects)
+    if not prober.hosts:
+        return None
+    logging.info(f"以下 {len(prober.hosts)} 个主机使用 HTTP/2 探测: {', '.join(sorted(prober.hosts))}")
+    return prober
@@ -0,0 +1,105 @@
+import asyncio
+import socket
+import ssl
+from urllib.parse import urljoin, urlsplit
+
+from utils.network import IPV4, IPV6
+from utils.redirect import REDIRECT_STATUSES, RedirectError
+
+HEADER_LIMIT = 65536
+ADDRESS_FAMILIES = {IPV4: socket.AF_INET, IPV6: socket.AF_INET6}
+_ssl_context = None
+
+
+class LeanFallback(Exception):
+    """精简探测器不处理的情况（非常规地址或响应），调用方应改用 aiohttp"""
+
+
+def get_ssl_context():
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = ssl.create_default_context()
+    return _ssl_context
+
+
+async def request_head(url, family=0):
+    """发送最简单的 HTTP/1.1 GET 请求，只读取状态行和 Location 头后关闭连接，返回 (状态码, Location)"""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in ('http', 'https') or not parts.hostname or '@' in parts.netloc:
+        raise LeanFallback(url)
+    port = parts.port or (443 if scheme == 'https' else 80)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    try:
+        # 含有非 ASCII 字符的地址需要编码处理，交给 aiohttp
+        request = (f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nUser-Agent: Mozilla/5.0\r\n"
+                   f"Accept: */*\r\nConnection: close\r\n\r\n").encode('ascii')
+    except UnicodeError as e:
+        raise LeanFallback(url) from e
+
+    writer = None
+    try:
+        reader, writer = await asyncio.open_connection(
+            parts.hostname, port, family=family, limit=HEADER_LIMIT,
+            ssl=get_ssl_context() if scheme == 'https' else None,
+            server_hostname=parts.hostname if scheme == 'https' else None)
+        writer.write(request)
+        head = await reader.readuntil(b'\r\n\r\n')
+    except (asyncio.LimitOverrunError, asyncio.IncompleteReadError) as e:
+        raise LeanFallback(url) from e
+    finally:
+        if writer:
+            writer.transport.abort()
+
+    status_line, _, headers = head.partition(b'\r\n')
+    fields = status_line.split(b' ', 2)
+    if len(fields) < 2 or not fields[0].startswith(b'HTTP/1.') or not fields[1].isdigit():
+        raise LeanFallback(url)
+    status = int(fields[1])
+    location = None
+    if status in REDIRECT_STATUSES:
+        for line in headers.split(b'\r\n'):
+            name, _, value = line.partition(b':')
+            if name.strip().lower() == b'location':
+                location = value.strip().decode('latin-1')
+                break
+    return status, location
+
+
+async def lean_probe(url, timeout=10, family=0, resolver=None, max_hops=5):
+    """跟随重定向探测 URL，返回最终状态码；命中 resolver 缓存时直接请求最终地址，解析出的新地址写回缓存
+
+    仅支持普通的 http/https 地址，其余情况抛出 LeanFallback；timeout 是包含重定向在内的总超时。
+    """
+    if hasattr(asyncio, 'timeout'):
+        async with asyncio.timeout(timeout):
+            return await _lean_probe(url, family, resolver, max_hops)
+    return await asyncio.wait_for(_lean_probe(url, family, resolver, max_hops), timeout)
+
+
+async def _lean_probe(url, family, resolver, max_hops):
+    cached = resolver.lookup(url) if resolver else None
+    if cached:
+        try:
+            status, _ = await request_head(cached, family)
+            if status < 400 and status not in REDIRECT_STATUSES:
+                return status
+        except OSError:
+            pass
+        resolver.invalidate(url)
+
+    target = url
+    visited = {url}
+    for _ in range(max_hops + 1):
+        status, location = await request_head(target, family)
+        if status not in REDIRECT_STATUSES or not location:
+            if resolver and target != url:
+                resolver.remember(url, target)
+            return status
+        target = urljoin(target, location)
+        if target in visited:
+            raise RedirectError(f"重定向循环: {url} -> {target}")
+        visited.add(target)
+    raise RedirectError(f"重定向次数超过 {max_hops} 次: {url}")
@@ -0,0 +1,165 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import shutil
+import time
+
+
+def get_resolution_value(resolution):
+    """把 '1920x1080' 形式的分辨率转换为像素数，无法解析时返回 0"""
+    match = re.match(r'^\s*(\d+)\s*[xX*×]\s*(\d+)\s*$', resolution or '')
+    if not match:
+        return 0
+    return int(match.group(1)) * int(match.group(2))
+
+
+def parse_hls_attributes(line):
+    """解析 #EXT-X-STREAM-INF 的属性列表"""
+    attributes = {}
+    for key, value in re.findall(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)', line.split(':', 1)[-1]):
+        attributes[key] = value.strip('"')
+    return attributes
+
+
+def parse_hls_master(content):
+    """从 HLS 主播放列表中提取最高分辨率变体的元数据，没有分辨率信息时返回 None"""
+    best = None
+    for line in content.splitlines():
+        if not line.startswith('#EXT-X-STREAM-INF'):
+            continue
+        attributes = parse_hls_attributes(line)
+        resolution = attributes.get('RESOLUTION')
+        if not resolution:
+            continue
+        metadata = {
+            'resolution': resolution,
+            'codec': attributes.get('CODECS'),
+            'frame_rate': float(attributes['FRAME-RATE']) if attributes.get('FRAME-RATE') else None,
+            'bitrate': int(attributes['BANDWIDTH']) if attributes.get('BANDWIDTH', '').isdigit() else None,
+            'source': 'hls',
+        }
+        if best is None or get_resolution_value(resolution) > get_resolution_value(best['resolution']):
+            best = metadata
+    return best
+
+
+async def probe_with_ffprobe(url, timeout=10):
+    """使用 ffprobe 获取视频流的分辨率、编码、帧率和码率，失败返回 None"""
+    if not shutil.which('ffprobe'):
+        return None
+    proc = await asyncio.create_subprocess_exec(
+        'ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_streams', '-show_format',
+        '-rw_timeout', str(timeout * 1000000), url,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+    try:
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=timeout + 5)
+    except asyncio.TimeoutError:
+        return None
+    finally:
+        # 超时或任务被取消（如到达时间预算）时结束 ffprobe，避免留下孤儿进程
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+    if proc.returncode != 0:
+        return None
+    try:
+        info = json.loads(stdout or b'{}')
+    except ValueError:
+        return None
+
+    video = next((s for s in info.get('streams', []) if s.get('codec_type') == 'video'), None)
+    if not video or not video.get('width') or not video.get('height'):
+        return None
+    frame_rate = None
+    num, _, den = (video.get('avg_frame_rate') or '').partition('/')
+    if num.isdigit() and den.isdigit() and int(den):
+        frame_rate = round(int(num) / int(den), 2)
+    bitrate = video.get('bit_rate') or info.get('format', {}).get('bit_rate')
+    return {
+        'resolution': f"{video['width']}x{video['height']}",
+        'codec': video.get('codec_name'),
+        'frame_rate': frame_rate,
+        'bitrate': int(bitrate) if str(bitrate or '').isdigit() else None,
+        'source': 'ffprobe',
+    }
+
+
+class MetadataCache:
+    """按 URL 缓存视频流元数据，超过 ttl 秒后重新探测
+
+    探测失败（没有 RESOLUTION 属性且 ffprobe 也没有结果）记为 None，failure_ttl 秒内不再重复探测。
+    """
+
+    def __init__(self, path='output/metadata_cache.json', ttl=7 * 24 * 3600, failure_ttl=24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.entries = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning(f"读取元数据缓存失败，将重新探测: {e}")
+
+    def has(self, url):
+        """是否有未过期的缓存，包括探测失败的记录"""
+        entry = self.entries.get(url)
+        return bool(entry) and entry.get('expires', 0) > time.time()
+
+    def get(self, url):
+        return self.entries[url]['metadata'] if self.has(url) else None
+
+    def put(self, url, metadata):
+        ttl = self.ttl if metadata else self.failure_ttl
+        self.entries[url] = {'metadata': metadata, 'expires': time.time() + ttl}
+
+    def save(self):
+        now = time.time()
+        self.entries = {url: entry for url, entry in self.entries.items() if entry.get('expires', 0) > now}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+
+
+async def probe_stream_metadata(session, url, timeout=10, use_ffprobe=True, fetch=None):
+    """探测单个视频流的元数据：优先读取 HLS 主播放列表的 RESOLUTION 属性，否则回退到 ffprobe
+
+    fetch(url, timeout=...) 返回异步上下文管理器，默认直接使用 session.get，测速时传入重定向解析器。
+    """
+    if fetch is None:
+        fetch = session.get
+    if '.m3u8' in url.lower():
+        try:
+            async with fetch(url, timeout=timeout) as response:
+                if response.status == 200:
+                    metadata = parse_hls_master(await response.text())
+                    if metadata:
+                        return metadata
+        except Exception as e:
+            logging.debug(f"读取播放列表 {url} 失败: {e}")
+    if use_ffprobe:
+        return await probe_with_ffprobe(url, timeout)
+    return None
+
+
+def apply_cached_metadata(channels, cache):
+    """把缓存中的元数据写入频道字典，返回命中缓存的频道数"""
+    hits = 0
+    for channel in channels:
+        metadata = cache.get(channel['url'])
+        if metadata:
+            channel.update({
+                'resolution': metadata['resolution'],
+                'resolution_value': get_resolution_value(metadata['resolution']),
+                'codec': metadata.get('codec'),
+                'frame_rate': metadata.get('frame_rate'),
+                'bitrate': metadata.get('bitrate'),
+            })
+            hits += 1
+    return hits
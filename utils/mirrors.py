@@ -0,0 +1,163 @@
+import asyncio
+import json
+import logging
+import os
+import re
+from urllib.parse import urlsplit
+
+JSDELIVR_HOSTS = ('cdn.jsdelivr.net', 'fastly.jsdelivr.net', 'gcore.jsdelivr.net')
+# 不会变化的 ref：提交哈希和版本号形式的标签
+PINNED_REF = re.compile(r'^([0-9a-f]{7,40}|v?\d+(\.\d+)*)$', re.IGNORECASE)
+
+
+def _split_ref(segments):
+    """从 ref 开始的路径段中分出 (ref, 文件路径)，兼容 refs/heads/main 形式"""
+    if len(segments) >= 3 and segments[0] == 'refs' and segments[1] in ('heads', 'tags'):
+        return segments[2], segments[3:]
+    return segments[0], segments[1:]
+
+
+def parse_github_url(url):
+    """解析 GitHub 文件的各种地址形式，返回 (owner, repo, ref, 文件路径)，不是 GitHub 文件时返回 None
+
+    支持 raw.githubusercontent.com、github.com/.../raw|blob/...、jsDelivr 的 /gh/ 地址，
+    以及 wget.la/https://github.com/... 这类在完整地址前加代理前缀的形式。
+    """
+    # 代理前缀：取出内层的完整地址
+    inner = url.find('://', url.find('://') + 3)
+    if inner != -1:
+        url = url[url.rfind('/', 0, inner) + 1:]
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return None
+    if parts.query or parts.scheme not in ('http', 'https'):
+        return None
+    host = (parts.hostname or '').lower()
+    segments = [segment for segment in parts.path.split('/') if segment]
+
+    if host == 'raw.githubusercontent.com' and len(segments) >= 4:
+        ref, path = _split_ref(segments[2:])
+        owner, repo = segments[0], segments[1]
+    elif host == 'github.com' and len(segments) >= 5 and segments[2] in ('raw', 'blob'):
+        ref, path = _split_ref(segments[3:])
+        owner, repo = segments[0], segments[1]
+    elif host in JSDELIVR_HOSTS and len(segments) >= 4 and segments[0] == 'gh' and '@' in segments[2]:
+        owner = segments[1]
+        repo, ref = segments[2].split('@', 1)
+        path = segments[3:]
+    else:
+        return None
+    if not path or not ref:
+        return None
+    return owner, repo, ref, '/'.join(path)
+
+
+def is_stale_mirror(url):
+    """jsDelivr 上分支地址的内容有缓存，可能比 raw 地址晚几个小时更新；提交哈希和版本标签的地址不受影响"""
+    try:
+        host = (urlsplit(url).hostname or '').lower()
+    except ValueError:
+        return False
+    if host not in JSDELIVR_HOSTS:
+        return False
+    parsed = parse_github_url(url)
+    return not parsed or not PINNED_REF.match(parsed[2])
+
+
+def github_mirrors(url, cdn_prefix=''):
+    """返回与 url 内容相同的候选地址（原地址在前），不是 GitHub 文件时只返回原地址
+
+    cdn_prefix 为加在完整 raw 地址前的加速前缀（如 https://wget.la/）。
+    注意 jsDelivr 对分支地址有缓存，内容可能比 raw 地址晚一段时间更新。
+    """
+    parsed = parse_github_url(url)
+    if not parsed:
+        return [url]
+    owner, repo, ref, path = parsed
+    raw_url = f"https://raw.githubusercontent.com/{owner}/{repo}/{ref}/{path}"
+    candidates = [url]
+    if cdn_prefix:
+        candidates.append(f"{cdn_prefix.rstrip('/')}/{raw_url}")
+    candidates.append(raw_url)
+    candidates.extend(f"https://{host}/gh/{owner}/{repo}@{ref}/{path}" for host in JSDELIVR_HOSTS[:2])
+    return list(dict.fromkeys(candidates))
+
+
+async def hedged_race(candidates, fetch, hedge_delay=1.0):
+    """对冲请求：先请求第一个候选地址，hedge_delay 秒内没有完成或请求失败时再加入下一个，
+    取第一个成功的完整结果并取消其余请求。fetch(url) 失败时返回 None。返回 (结果, 地址)，全部失败时返回 (None, None)
+    """
+    queue = list(candidates)
+    pending = set()
+    owners = {}
+    try:
+        while queue or pending:
+            if queue:
+                url = queue.pop(0)
+                task = asyncio.ensure_future(fetch(url))
+                owners[task] = url
+                pending.add(task)
+            done, pending = await asyncio.wait(pending, timeout=hedge_delay if queue else None,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.exception() and task.result() is not None:
+                    return task.result(), owners[task]
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    return None, None
+
+
+class MirrorRacer:
+    """订阅下载的镜像竞速：GitHub 上的订阅同时尝试 raw、jsDelivr 和加速前缀等镜像，记住胜出的镜像下次优先请求
+
+    分支地址的 jsDelivr 镜像即使胜出也不记住，下次仍先请求原地址和 raw 地址，避免长期使用缓存中的旧内容。
+    """
+
+    def __init__(self, path='output/mirror_winners.json', cdn_prefix='', hedge_delay=1.0):
+        self.path = path
+        self.cdn_prefix = cdn_prefix
+        self.hedge_delay = hedge_delay
+        self.winners = {}  # 订阅地址 -> 上次胜出的镜像地址
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.winners = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning(f"读取镜像竞速记录失败: {e}")
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.winners, f, ensure_ascii=False, indent=1)
+
+    def candidates(self, url):
+        candidates = github_mirrors(url, self.cdn_prefix)
+        winner = self.winners.get(url)
+        if winner in candidates and not is_stale_mirror(winner):
+            candidates.remove(winner)
+            candidates.insert(0, winner)
+        return candidates
+
+    async def fetch(self, url, fetch):
+        """按竞速结果获取订阅内容，fetch(url) 返回内容，失败时返回 None"""
+        candidates = self.candidates(url)
+        if len(candidates) == 1:
+            return await fetch(url)
+        content, winner = await hedged_race(candidates, fetch, self.hedge_delay)
+        if winner:
+            if winner != url:
+                logging.info(f"订阅 {url} 使用镜像 {winner}")
+            if is_stale_mirror(winner):
+                self.winners.pop(url, None)
+            else:
+                self.winners[url] = winner
+        return content
@@ -0,0 +1,149 @@
+import asyncio
+import aiohttp
+import ipaddress
+import logging
+import socket
+import time
+from urllib.parse import urlparse
+
+IPV4 = 'ipv4'
+IPV6 = 'ipv6'
+DUAL = 'dual'
+
+# 用于检测本机是否有对应地址族路由的公网地址（UDP connect 不会真正发送数据）
+ROUTE_CHECK_ADDRESSES = {
+    IPV4: (socket.AF_INET, ('8.8.8.8', 53)),
+    IPV6: (socket.AF_INET6, ('2001:4860:4860::8888', 53)),
+}
+
+_route_cache = {}
+
+
+def host_has_route(family):
+    """检测本机是否有到指定地址族公网的路由"""
+    if family not in _route_cache:
+        af, address = ROUTE_CHECK_ADDRESSES[family]
+        try:
+            with socket.socket(af, socket.SOCK_DGRAM) as sock:
+                sock.connect(address)
+            _route_cache[family] = True
+        except OSError:
+            _route_cache[family] = False
+        logging.info(f"本机{'有' if _route_cache[family] else '没有'} {family.upper()} 路由")
+    return _route_cache[family]
+
+
+def get_literal_family(host):
+    """主机名是 IP 字面量时直接返回地址族，否则返回 None"""
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return None
+    return IPV6 if address.version == 6 else IPV4
+
+
+async def resolve_host_family(host, timeout=5):
+    """解析主机名的 A / AAAA 记录，返回 ipv4 / ipv6 / dual，解析失败返回 None"""
+    family = get_literal_family(host)
+    if family:
+        return family
+    loop = asyncio.get_running_loop()
+    try:
+        infos = await asyncio.wait_for(loop.getaddrinfo(host, None, type=socket.SOCK_STREAM), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+    families = {info[0] for info in infos}
+    if socket.AF_INET in families and socket.AF_INET6 in families:
+        return DUAL
+    if socket.AF_INET6 in families:
+        return IPV6
+    if socket.AF_INET in families:
+        return IPV4
+    return None
+
+
+async def classify_channels(channels, concurrency=50, deadline=None):
+    """为每个频道标记地址族（channel['ip_family']），同一主机只解析一次
+
+    超过 deadline（time.monotonic() 时间）后不再发起新的解析，剩余主机按未分类处理。
+    wait_for 超时并不能中止执行器里的 getaddrinfo，因此单次解析的超时也不超过剩余时间。
+    """
+    hosts = {}
+    for channel in channels:
+        try:
+            host = urlparse(channel['url']).hostname or ''
+        except ValueError:
+            host = ''
+        hosts.setdefault(host, []).append(channel)
+
+    sem = asyncio.Semaphore(concurrency)
+    skipped = []
+
+    async def classify(host):
+        async with sem:
+            if not host:
+                return host, None
+            timeout = 5
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    skipped.append(host)
+                    return host, None
+                timeout = min(timeout, remaining)
+            return host, await resolve_host_family(host, timeout)
+
+    results = await asyncio.gather(*(classify(host) for host in hosts))
+    if skipped:
+        logging.warning(f"地址族分类超出时间预算，{len(skipped)} 个主机未解析")
+    counts = {}
+    for host, family in results:
+        for channel in hosts[host]:
+            channel['ip_family'] = family
+        counts[family] = counts.get(family, 0) + len(hosts[host])
+    logging.info("地址族分类完成: " + ', '.join(f"{family or '未解析'} {count} 个" for family, count in counts.items()))
+
+
+def get_probe_family(channel):
+    """测速时使用的地址族：有 IPv4 地址的源走 IPv4，仅有 IPv6 地址的源走 IPv6，未分类的源返回 None
+
+    双栈源另外用 IPv6 探测一次（见 needs_ipv6_probe），结果记录在 channel['ipv6_verified']。
+    """
+    family = channel.get('ip_family')
+    if family == IPV6:
+        return IPV6
+    if family in (IPV4, DUAL):
+        return IPV4
+    return None
+
+
+def is_family_routable(channel):
+    """本机没有对应地址族路由时返回 False，调用方应直接跳过测速"""
+    family = get_probe_family(channel)
+    return family is None or host_has_route(family)
+
+
+def needs_ipv6_probe(channel):
+    """双栈源默认按 IPv4 测速，本机有 IPv6 路由时还需要用 IPv6 单独确认可用"""
+    return channel.get('ip_family') == DUAL and host_has_route(IPV6)
+
+
+def channel_in_family(channel, family):
+    """判断频道是否属于指定地址族的输出；双栈源只有 IPv6 探测成功后才出现在 IPv6 输出中"""
+    ip_family = channel.get('ip_family')
+    if ip_family == DUAL and family == IPV6:
+        return bool(channel.get('ipv6_verified'))
+    return ip_family in (family, DUAL)
+
+
+def create_family_sessions(trace_configs=None):
+    """创建分别固定使用 IPv4 / IPv6 连接的会话，键 None 对应不限制地址族的默认会话"""
+    return {
+        None: aiohttp.ClientSession(trace_configs=trace_configs),
+        IPV4: aiohttp.ClientSession(connector=aiohttp.TCPConnector(family=socket.AF_INET), trace_configs=trace_configs),
+        IPV6: aiohttp.ClientSession(connector=aiohttp.TCPConnector(family=socket.AF_INET6), trace_configs=trace_configs),
+    }
+
+
+async def close_family_sessions(sessions):
+    for session in sessions.values():
+        await session.close()
@@ -0,0 +1,93 @@
+import configparser
+import logging
+import os
+
+from utils.network import IPV4, IPV6, channel_in_family
+
+
+def read_list_file(file_path):
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+    except FileNotFoundError:
+        logging.warning(f"未找到文件 {file_path}")
+        return []
+
+
+def merge_lists(*lists):
+    """按出现顺序合并多个列表并去重"""
+    return list(dict.fromkeys(line for lines in lists for line in lines))
+
+
+class OutputProfile:
+    """一套输出配置：自己的频道列表（含分组顺序）、测速频道列表和过滤条件，输出到 output_dir 下的 <name>.m3u / .txt
+
+    profiles.ini 中每个小节是一套配置，例如：
+
+        [family]
+        include_list = config/profiles/family_include.txt
+        test_list = config/profiles/family_test.txt
+        ip_family = ipv4
+        min_resolution_value = 921600
+
+    test_list 默认为 config/test.txt；ip_family（ipv4 / ipv6）和 min_resolution_value（宽×高像素数）不填时不过滤。
+    """
+
+    def __init__(self, name, include_list, test_channels, output_dir='output/profiles', ip_family=None,
+                 min_resolution_value=0):
+        self.name = name
+        self.include_list = include_list
+        self.test_channels = test_channels
+        self.output_dir = output_dir
+        self.ip_family = ip_family
+        self.min_resolution_value = min_resolution_value
+
+    @property
+    def m3u_path(self):
+        return os.path.join(self.output_dir, f"{self.name}.m3u")
+
+    @property
+    def txt_path(self):
+        return os.path.join(self.output_dir, f"{self.name}.txt")
+
+    def allows(self, channel):
+        """按本配置的地址族和分辨率过滤源；地址族或分辨率未知的源保留"""
+        if self.ip_family and channel.get('ip_family') and not channel_in_family(channel, self.ip_family):
+            return False
+        resolution_value = channel.get('resolution_value')
+        return not self.min_resolution_value or not resolution_value or resolution_value >= self.min_resolution_value
+
+
+def load_profiles(file_path='config/profiles.ini', output_dir='output/profiles',
+                  default_test_list='config/test.txt'):
+    """读取多套输出配置，文件不存在时返回空列表"""
+    if not os.path.exists(file_path):
+        return []
+    parser = configparser.ConfigParser()
+    try:
+        parser.read(file_path, encoding='utf-8')
+    except configparser.Error as e:
+        logging.error(f"读取输出配置 {file_path} 失败: {e}")
+        return []
+    profiles = []
+    for name in parser.sections():
+        section = parser[name]
+        include_list_file = section.get('include_list')
+        if not include_list_file:
+            logging.warning(f"输出配置 {name} 没有设置 include_list，已跳过")
+            continue
+        ip_family = section.get('ip_family', '').strip().lower() or None
+        if ip_family not in (None, IPV4, IPV6):
+            logging.warning(f"输出配置 {name} 的 ip_family 无效: {ip_family}，不按地址族过滤")
+            ip_family = None
+        profiles.append(OutputProfile(
+            name,
+            read_list_file(include_list_file),
+            read_list_file(section.get('test_list', default_test_list)),
+            output_dir=section.get('output_dir', output_dir),
+            ip_family=ip_family,
+            min_resolution_value=section.getint('min_resolution_value', fallback=0),
+        ))
+    if profiles:
+        logging.info(f"已加载 {len(profiles)} 套输出配置: {', '.join(profile.name for profile in profiles)}")
+    return profiles
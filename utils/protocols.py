@@ -0,0 +1,205 @@
+import aiohttp
+import asyncio
+import base64
+import logging
+import os
+import re
+import struct
+import time
+from urllib.parse import urlparse, urlunparse
+
+RTSP = 'rtsp'
+RTMP = 'rtmp'
+UDPXY = 'udpxy'
+
+DEFAULT_PORTS = {RTSP: 554, RTMP: 1935}
+# udpxy / 组播网关的转发地址，如 http://192.168.1.1:4022/rtp/239.3.1.241:8000
+UDPXY_PATH = re.compile(r'^/(rtp|udp)/', re.IGNORECASE)
+
+TS_PACKET_SIZE = 188
+TS_SYNC_BYTE = 0x47
+RTMP_VERSION = 3
+RTMP_HANDSHAKE_SIZE = 1536
+
+
+def get_stream_protocol(url):
+    """按 URL 判断需要专用探测器的协议：rtsp / rtmp / udpxy，普通 HTTP(S) 流返回 None"""
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return None
+    scheme = parsed.scheme.lower()
+    # rtsps / rtmps 需要 TLS，仍交给 FFmpeg 处理
+    if scheme == 'rtsp':
+        return RTSP
+    if scheme == 'rtmp':
+        return RTMP
+    if scheme in ('http', 'https') and UDPXY_PATH.match(parsed.path):
+        return UDPXY
+    return None
+
+
+def failed(start_time, error, **extra):
+    return {'success': False, 'response_time': float('inf'), 'error': error,
+            'elapsed': time.monotonic() - start_time, **extra}
+
+
+async def read_rtsp_response(reader):
+    """读取 RTSP 响应的状态行、头部和正文，返回 (状态码, 头部字典, 正文)"""
+    status_line = (await reader.readline()).decode('latin-1').strip()
+    parts = status_line.split(' ', 2)
+    if len(parts) < 2 or not parts[0].startswith('RTSP/'):
+        raise ValueError(f"无效的RTSP响应: {status_line[:50]}")
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1')
+        if not line or line in ('\r\n', '\n'):
+            break
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0) or 0)
+    body = await reader.readexactly(length) if length else b''
+    return int(parts[1]), headers, body
+
+
+async def probe_rtsp(url, timeout=5):
+    """RTSP 握手探测：OPTIONS 计算延迟，DESCRIBE 确认能拿到包含媒体描述的 SDP
+
+    返回的 status 为最后一次 RTSP 响应的状态码，服务器没有响应时为 None。
+    """
+    start_time = time.monotonic()
+    writer = None
+    status = None
+    try:
+        parsed = urlparse(url)
+        host = parsed.hostname
+        if not host:
+            return failed(start_time, 'RTSP error: 地址中没有主机名')
+        port = parsed.port or DEFAULT_PORTS[RTSP]
+        # 请求 URI 中不带用户名密码，有凭据时使用 Basic 认证
+        netloc = f"[{host}]" if ':' in host else host
+        if parsed.port:
+            netloc += f":{parsed.port}"
+        request_url = urlunparse(parsed._replace(netloc=netloc))
+        auth = None
+        if parsed.username:
+            credentials = f"{parsed.username}:{parsed.password or ''}".encode('utf-8')
+            auth = 'Basic ' + base64.b64encode(credentials).decode('ascii')
+
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        response_time = None
+        for cseq, method in enumerate(('OPTIONS', 'DESCRIBE'), 1):
+            request = f"{method} {request_url} RTSP/1.0\r\nCSeq: {cseq}\r\nUser-Agent: MYIPTV\r\n"
+            if method == 'DESCRIBE':
+                request += "Accept: application/sdp\r\n"
+            if auth:
+                request += f"Authorization: {auth}\r\n"
+            writer.write((request + "\r\n").encode('utf-8'))
+            await writer.drain()
+            status, headers, body = await asyncio.wait_for(read_rtsp_response(reader), timeout)
+            if response_time is None:
+                response_time = time.monotonic() - start_time
+            if status != 200:
+                return failed(start_time, f'RTSP {method} status {status}', status=status)
+        if b'm=' not in body:
+            return failed(start_time, 'RTSP DESCRIBE 没有媒体描述', status=status)
+        return {'success': True, 'response_time': response_time, 'error': None, 'status': status,
+                'elapsed': time.monotonic() - start_time}
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+        return failed(start_time, f'RTSP error: {e or type(e).__name__}', status=status)
+    finally:
+        if writer:
+            writer.close()
+
+
+async def probe_rtmp(url, timeout=5):
+    """RTMP 握手探测：发送 C0/C1，收到版本号正确的 S0 和完整的 S1 即认为服务器可用"""
+    start_time = time.monotonic()
+    writer = None
+    try:
+        parsed = urlparse(url)
+        if not parsed.hostname:
+            return failed(start_time, 'RTMP error: 地址中没有主机名')
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(parsed.hostname, parsed.port or DEFAULT_PORTS[RTMP]), timeout)
+        # C1：4 字节时间戳、4 字节零、1528 字节随机数
+        c1 = struct.pack('>II', 0, 0) + os.urandom(RTMP_HANDSHAKE_SIZE - 8)
+        writer.write(bytes([RTMP_VERSION]) + c1)
+        await writer.drain()
+        s0 = await asyncio.wait_for(reader.readexactly(1), timeout)
+        response_time = time.monotonic() - start_time
+        if s0[0] != RTMP_VERSION:
+            return failed(start_time, f'RTMP version {s0[0]}')
+        await asyncio.wait_for(reader.readexactly(RTMP_HANDSHAKE_SIZE), timeout)
+        return {'success': True, 'response_time': response_time, 'error': None,
+                'elapsed': time.monotonic() - start_time}
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+        return failed(start_time, f'RTMP error: {e or type(e).__name__}')
+    finally:
+        if writer:
+            writer.close()
+
+
+def has_ts_sync(data):
+    """数据中能找到连续 3 个间隔 188 字节的同步字节即认为是 MPEG-TS"""
+    for offset in range(min(TS_PACKET_SIZE, len(data))):
+        if all(offset + i * TS_PACKET_SIZE < len(data) and data[offset + i * TS_PACKET_SIZE] == TS_SYNC_BYTE
+               for i in range(3)):
+            return True
+    return False
+
+
+async def probe_udpxy(session, url, timeout=5):
+    """udpxy 探测：读取转发流的首批数据并校验 MPEG-TS 同步字节
+
+    组播组没有数据时 udpxy 通常只是不发数据，这时再请求网关的 /status 页面，
+    区分网关不可用和组播源不可用。
+    """
+    start_time = time.monotonic()
+    try:
+        # 不限制总时长（读取数据另有截止时间），但网关接受连接后迟迟不返回响应头时按 sock_read 超时
+        stream_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+        async with session.get(url, timeout=stream_timeout) as response:
+            if response.status != 200:
+                return failed(start_time, f'HTTP status {response.status}')
+            data = b''
+            deadline = start_time + timeout
+            while len(data) < TS_PACKET_SIZE * 3:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    chunk = await asyncio.wait_for(response.content.readany(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if not chunk:
+                    break
+                data += chunk
+            if has_ts_sync(data):
+                return {'success': True, 'response_time': time.monotonic() - start_time, 'error': None,
+                        'elapsed': time.monotonic() - start_time}
+    except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+        return failed(start_time, f'udpxy error: {e or type(e).__name__}')
+
+    parsed = urlparse(url)
+    status_url = urlunparse(parsed._replace(path='/status', query=''))
+    try:
+        async with session.get(status_url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            gateway_ok = response.status == 200
+    except (aiohttp.ClientError, asyncio.TimeoutError, OSError):
+        gateway_ok = False
+    error = '组播源没有数据' if gateway_ok else 'udpxy 网关不可用'
+    logging.debug(f"{error}: {url}")
+    return failed(start_time, error)
+
+
+async def probe_stream(session, url, timeout=5):
+    """按协议分发到对应的探测器，返回包含 success / response_time / error 的字典；不需要专用探测器时返回 None"""
+    protocol = get_stream_protocol(url)
+    if protocol == RTSP:
+        return await probe_rtsp(url, timeout)
+    if protocol == RTMP:
+        return await probe_rtmp(url, timeout)
+    if protocol == UDPXY:
+        return await probe_udpxy(session, url, timeout)
+    return None
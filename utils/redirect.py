@@ -0,0 +1,109 @@
+import aiohttp
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urljoin
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+class RedirectError(Exception):
+    """重定向次数超过上限或出现循环"""
+
+
+class RedirectResolver:
+    """跟随重定向并缓存 原始 URL -> 最终 URL 的映射
+
+    ku9live.php、free.php 之类的网关会先返回 302 再跳到真实的流地址，
+    各测速阶段通过同一个解析器请求时，命中缓存即可直接请求最终地址，省去重定向往返。
+    缓存可以保存到文件，供间隔运行的第一阶段、第二阶段和 FFmpeg 测试复用。
+    """
+
+    def __init__(self, max_hops=5, ttl=7200, path='output/redirect_cache.json'):
+        self.max_hops = max_hops
+        self.ttl = ttl
+        self.path = path
+        self.cache = {}  # 原始 URL -> (最终 URL, 过期时间)
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                now = time.time()
+                self.cache = {url: tuple(entry) for url, entry in json.load(f).items() if entry[1] > now}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError, IndexError) as e:
+            logging.warning(f"读取重定向缓存失败: {e}")
+
+    def save(self):
+        now = time.time()
+        entries = {url: entry for url, entry in self.cache.items() if entry[1] > now}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False)
+
+    def lookup(self, url):
+        """返回缓存的最终 URL，没有缓存或已过期时返回 None"""
+        entry = self.cache.get(url)
+        if entry and entry[1] > time.time():
+            return entry[0]
+        return None
+
+    def remember(self, url, target):
+        self.cache[url] = (target, time.time() + self.ttl)
+
+    def invalidate(self, url):
+        self.cache.pop(url, None)
+
+    @asynccontextmanager
+    async def get(self, session, url, remember=True, **kwargs):
+        """请求 URL 并跟随重定向（最多 max_hops 次），返回最终响应
+
+        命中缓存时直接请求最终地址；若缓存的地址已失效（返回 4xx/5xx 或超时），则从原始地址重新解析。
+        HLS 分片等一次性地址传 remember=False，不写入缓存。
+        """
+        cached = self.lookup(url)
+        response = None
+        if cached:
+            try:
+                response = await session.get(cached, allow_redirects=False, **kwargs)
+                if response.status >= 400 or response.status in REDIRECT_STATUSES:
+                    response.release()
+                    response = None
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                response = None
+            if response is None:
+                self.invalidate(url)
+        if response is None:
+            response = await self._follow(session, url, remember, **kwargs)
+        try:
+            yield response
+        finally:
+            response.release()
+
+    async def resolve(self, session, url, **kwargs):
+        """只解析最终 URL，不读取响应内容"""
+        async with self.get(session, url, **kwargs) as response:
+            return str(response.url)
+
+    async def _follow(self, session, url, remember=True, **kwargs):
+        target = url
+        visited = {url}
+        for _ in range(self.max_hops + 1):
+            response = await session.get(target, allow_redirects=False, **kwargs)
+            location = response.headers.get('Location')
+            if response.status not in REDIRECT_STATUSES or not location:
+                if remember and target != url:
+                    self.remember(url, target)
+                return response
+            response.release()
+            target = urljoin(str(response.url), location)
+            if target in visited:
+                raise RedirectError(f"重定向循环: {url} -> {target}")
+            visited.add(target)
+        raise RedirectError(f"重定向次数超过 {self.max_hops} 次: {url}")
@@ -0,0 +1,232 @@
+import hashlib
+import http.client
+import logging
+import os
+import re
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from urllib.parse import urljoin, urlsplit
+
+USER_AGENT = 'Mozilla/5.0'
+URI_ATTRIBUTE = re.compile(r'URI="([^"]+)"')
+PLAYLIST_CONTENT_TYPE = 'application/vnd.apple.mpegurl'
+# 判断是否为 HLS 播放列表时读取的开头字节数（允许 UTF-8 BOM 和前导空白）
+PLAYLIST_SNIFF_BYTES = 64
+UTF8_BOM = b'\xef\xbb\xbf'
+# 上游请求失败（HTTP 错误状态、连接失败、超时、响应不完整）时抛出的异常，Web 服务据此返回 502
+UPSTREAM_ERRORS = (OSError, http.client.HTTPException)
+
+
+def is_playlist_start(body):
+    return body.lstrip().lstrip(UTF8_BOM).lstrip().startswith(b'#EXTM3U')
+
+
+class LruCache:
+    """按字节数限制大小的 LRU 缓存；指定 disk_dir 时，从内存淘汰的内容转存到磁盘，磁盘同样按 LRU 淘汰"""
+
+    def __init__(self, max_bytes, disk_dir=None, max_disk_bytes=0):
+        self.max_bytes = max_bytes
+        self.memory = OrderedDict()  # 键 -> (内容, 内容类型)
+        self.memory_bytes = 0
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.disk = OrderedDict()  # 键 -> (大小, 内容类型)
+        self.disk_bytes = 0
+        self.lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key):
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key]
+            if key not in self.disk:
+                return None
+            self.disk.move_to_end(key)
+            content_type = self.disk[key][1]
+        try:
+            with open(os.path.join(self.disk_dir, key), 'rb') as f:
+                return f.read(), content_type
+        except OSError:
+            return None
+
+    def put(self, key, body, content_type):
+        if len(body) > self.max_bytes:
+            return
+        evicted = []
+        with self.lock:
+            if key in self.memory:
+                return
+            self.memory[key] = (body, content_type)
+            self.memory_bytes += len(body)
+            while self.memory_bytes > self.max_bytes:
+                old_key, (old_body, old_type) = self.memory.popitem(last=False)
+                self.memory_bytes -= len(old_body)
+                evicted.append((old_key, old_body, old_type))
+        if self.disk_dir:
+            for old_key, old_body, old_type in evicted:
+                self._put_disk(old_key, old_body, old_type)
+
+    def _put_disk(self, key, body, content_type):
+        try:
+            with open(os.path.join(self.disk_dir, key), 'wb') as f:
+                f.write(body)
+        except OSError as e:
+            logging.warning(f"写入中继磁盘缓存失败: {e}")
+            return
+        removed = []
+        with self.lock:
+            if key in self.disk:
+                self.disk_bytes -= self.disk.pop(key)[0]
+            self.disk[key] = (len(body), content_type)
+            self.disk_bytes += len(body)
+            while self.disk_bytes > self.max_disk_bytes and self.disk:
+                old_key, (size, _) = self.disk.popitem(last=False)
+                self.disk_bytes -= size
+                removed.append(old_key)
+        for old_key in removed:
+            try:
+                os.remove(os.path.join(self.disk_dir, old_key))
+            except OSError:
+                pass
+
+
+class HlsRelay:
+    """局域网 HLS 中继：代理已发布频道的播放列表和分片
+
+    播放列表中的地址改写为中继地址；同一分片的并发请求合并为一次上游请求，
+    最近的分片保存在有大小上限的 LRU 缓存中，上游带宽只与观看的频道数有关，与观看人数无关。
+    播放列表只缓存 playlist_ttl 秒，既合并多个客户端的刷新请求，又不影响直播更新。
+    """
+
+    def __init__(self, resolve_channel, max_bytes=256 * 1024 * 1024, disk_dir=None, max_disk_bytes=0,
+                 playlist_ttl=1.0, timeout=10, max_tokens=100000):
+        self.resolve_channel = resolve_channel  # 频道ID -> 当前上游地址
+        self.segments = LruCache(max_bytes, disk_dir, max_disk_bytes)
+        self.playlists = {}  # 上游地址 -> (过期时间, 改写后的内容)，不是 HLS 的上游内容为 None
+        self.tokens = OrderedDict()  # 令牌 -> 上游地址，只代理改写过的地址，避免成为开放代理
+        self.max_tokens = max_tokens
+        self.playlist_ttl = playlist_ttl
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.inflight = {}  # 键 -> (Event, 结果列表)
+        self.upstream_requests = 0
+
+    def fetch_upstream(self, url, playlist=False):
+        """请求上游，返回 (内容, 内容类型, 最终地址)；playlist=True 时先检查开头，不是 HLS 播放列表则不读取内容（可能是持续的 TS 流）"""
+        request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            self.upstream_requests += 1
+            body = b''
+            if playlist:
+                body = response.read(PLAYLIST_SNIFF_BYTES)
+                if not is_playlist_start(body):
+                    return None, response.headers.get('Content-Type', ''), response.geturl()
+            return body + response.read(), response.headers.get('Content-Type', ''), response.geturl()
+
+    def coalesce(self, key, fetch):
+        """同一个键同时只有一次上游请求，其余请求等待并共享结果（异常同样共享）"""
+        with self.lock:
+            entry = self.inflight.get(key)
+            leader = entry is None
+            if leader:
+                entry = self.inflight[key] = (threading.Event(), [])
+        event, result = entry
+        if leader:
+            try:
+                result.append((True, fetch()))
+            except Exception as e:
+                result.append((False, e))
+            finally:
+                with self.lock:
+                    self.inflight.pop(key, None)
+                event.set()
+        else:
+            event.wait(self.timeout * 2)
+            if not result:
+                raise TimeoutError(key)
+        ok, value = result[0]
+        if not ok:
+            raise value
+        return value
+
+    def register(self, url, kind):
+        """为上游地址生成中继路径：kind 为 pl（播放列表）或 seg（分片、密钥等）"""
+        token = hashlib.sha1(url.encode('utf-8')).hexdigest()[:24]
+        with self.lock:
+            self.tokens[token] = url
+            self.tokens.move_to_end(token)
+            while len(self.tokens) > self.max_tokens:
+                self.tokens.popitem(last=False)
+        if kind == 'pl':
+            return f"/relay/pl/{token}.m3u8"
+        extension = os.path.splitext(urlsplit(url).path)[1][:8]
+        return f"/relay/seg/{token}{extension}"
+
+    def lookup(self, token):
+        with self.lock:
+            return self.tokens.get(token.split('.', 1)[0])
+
+    def rewrite_playlist(self, content, base_url):
+        """把播放列表中的变体、分片以及 URI="..." 属性改写为中继地址"""
+        is_master = '#EXT-X-STREAM-INF' in content
+        lines = []
+        for line in content.splitlines():
+            stripped = line.strip()
+            if not stripped:
+                lines.append(line)
+            elif stripped.startswith('#'):
+                kind = 'pl' if stripped.startswith(('#EXT-X-MEDIA:', '#EXT-X-I-FRAME-STREAM-INF')) else 'seg'
+                lines.append(URI_ATTRIBUTE.sub(
+                    lambda match: f'URI="{self.register(urljoin(base_url, match.group(1)), kind)}"', line))
+            else:
+                lines.append(self.register(urljoin(base_url, stripped), 'pl' if is_master else 'seg'))
+        return '\n'.join(lines) + '\n'
+
+    def get_playlist(self, url):
+        """返回改写后的播放列表；上游不是 HLS 时返回 None，由调用方直接跳转"""
+        now = time.monotonic()
+        cached = self.playlists.get(url)
+        if cached and cached[0] > now:
+            return cached[1]
+        # 清理过期的播放列表缓存
+        if len(self.playlists) > 1000:
+            self.playlists = {key: value for key, value in self.playlists.items() if value[0] > now}
+
+        def fetch():
+            body, _, final_url = self.fetch_upstream(url, playlist=True)
+            if body is None:
+                # 不是 HLS 的源一段时间内不再重复探测
+                self.playlists[url] = (time.monotonic() + 60, None)
+                return None
+            rewritten = self.rewrite_playlist(body.decode('utf-8', errors='replace'), final_url)
+            self.playlists[url] = (time.monotonic() + self.playlist_ttl, rewritten)
+            return rewritten
+
+        return self.coalesce(('pl', url), fetch)
+
+    def get_channel_playlist(self, channel_id):
+        url = self.resolve_channel(channel_id)
+        if not url:
+            return None, None
+        return url, self.get_playlist(url)
+
+    def get_segment(self, token):
+        """返回 (内容, 内容类型)，令牌未知时返回 None"""
+        url = self.lookup(token)
+        if not url:
+            return None
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        cached = self.segments.get(key)
+        if cached:
+            return cached
+
+        def fetch():
+            body, content_type, _ = self.fetch_upstream(url)
+            self.segments.put(key, body, content_type or 'application/octet-stream')
+            return body, content_type or 'application/octet-stream'
+
+        return self.coalesce(('seg', key), fetch)
@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+
+class ThroughputSampler:
+    """对响应流做有界采样：读满 max_bytes 或到达单调时钟截止时间（以先到者为准）即停止
+
+    直接读取 aiohttp 流中已缓冲的数据块（StreamReader.readany），只累计长度，
+    不像 iter_chunked 那样按 8KB 切片复制；截止时间作用于整个读取过程，流停滞时也能按时返回，
+    不必等到套接字超时。结果包含首字节时间、持续速率和停顿区间。
+    throttle(字节数) 为可选的限速协程函数（见 BandwidthGovernor），限速等待的时间不计为停顿；
+    analyzer 为可选的内容分析器（见 TsAnalyzer），每个数据块连同接收时间传给 analyzer.feed()。
+    """
+
+    def __init__(self, duration=5, max_bytes=0, stall_threshold=1.0, throttle=None, analyzer=None):
+        self.duration = duration
+        self.max_bytes = max_bytes
+        self.stall_threshold = stall_threshold
+        self.throttle = throttle
+        self.analyzer = analyzer
+        self.start = None
+        self.first_byte = None
+        self.last_byte = None
+        self.end = None
+        self.total_bytes = 0
+        self.stalls = []  # (开始时间, 持续秒数)，相对于 start
+        self.timed_out = False
+
+    async def sample(self, stream, start=None):
+        """从 stream 读取数据直到字节上限、截止时间或流结束；start 为请求发出时的 time.monotonic()，用于计算首字节时间"""
+        self.start = start if start is not None else time.monotonic()
+        deadline = time.monotonic() + self.duration
+        try:
+            if hasattr(asyncio, 'timeout'):
+                async with asyncio.timeout(self.duration):
+                    await self._read(stream)
+            else:
+                await asyncio.wait_for(self._read(stream), self.duration)
+        except asyncio.TimeoutError:
+            if time.monotonic() < deadline - 0.01:
+                # 套接字读取超时（sock_read）而不是采样截止时间，按流中断处理
+                self.end = time.monotonic()
+                return self
+            self.timed_out = True
+            # 截止时还在等待数据，也算作一次停顿
+            now = min(time.monotonic(), deadline)
+            last = self.last_byte if self.last_byte is not None else self.start
+            if now - last >= self.stall_threshold:
+                self.stalls.append((last - self.start, now - last))
+        self.end = min(time.monotonic(), deadline)
+        return self
+
+    async def _read(self, stream):
+        while True:
+            data = await stream.readany()
+            if not data:
+                return
+            # 数据在限速等待之后才计入，限速等待的时间不算停顿
+            waited = 0.0
+            if self.throttle:
+                throttle_start = time.monotonic()
+                await self.throttle(len(data))
+                waited = time.monotonic() - throttle_start
+            now = time.monotonic()
+            if self.first_byte is None:
+                self.first_byte = now
+            elif now - waited - self.last_byte >= self.stall_threshold:
+                self.stalls.append((self.last_byte - self.start, now - waited - self.last_byte))
+            self.last_byte = now
+            self.total_bytes += len(data)
+            if self.analyzer:
+                self.analyzer.feed(data, now)
+            if self.max_bytes and self.total_bytes >= self.max_bytes:
+                return
+
+    @property
+    def ttfb(self):
+        """首字节时间（秒），没有收到数据时为 None"""
+        return None if self.first_byte is None else self.first_byte - self.start
+
+    @property
+    def elapsed(self):
+        return self.end - self.start
+
+    @property
+    def speed(self):
+        """平均速度（MB/s），包含建立连接和首字节等待时间"""
+        return self.total_bytes / (1024 * 1024 * self.elapsed) if self.elapsed > 0 else 0.0
+
+    @property
+    def sustained_speed(self):
+        """首字节之后的持续速度（MB/s）"""
+        if self.first_byte is None:
+            return 0.0
+        duration = self.end - self.first_byte
+        return self.total_bytes / (1024 * 1024 * duration) if duration > 0 else 0.0
+
+    @property
+    def stall_time(self):
+        return sum(duration for _, duration in self.stalls)
+
+    def report(self):
+        """返回可合并进测速结果的字典"""
+        return {
+            'ttfb': self.ttfb,
+            'sustained_speed': self.sustained_speed,
+            'stalls': len(self.stalls),
+            'stall_time': self.stall_time,
+            'sampled_bytes': self.total_bytes,
+        }
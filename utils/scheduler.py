@@ -0,0 +1,47 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+
+async def run_with_deadline(items, worker, concurrency=10, deadline=None, priority=None):
+    """按优先级并发执行 worker(item)，到达截止时间后取消剩余任务
+
+    deadline 为 time.monotonic() 时间点，None 表示不限时；priority 为排序键函数，值越小越先执行。
+    返回未完成（未开始或被取消）的条目列表，调用方据此保留这些条目的默认测速结果。
+    """
+    queue = deque(sorted(items, key=priority) if priority else items)
+    unfinished = []
+
+    async def consume():
+        while queue:
+            item = queue.popleft()
+            try:
+                await worker(item)
+            except asyncio.CancelledError:
+                unfinished.append(item)
+                raise
+            except Exception as e:
+                logging.error(f"测速任务异常: {e}")
+
+    consumers = [asyncio.ensure_future(consume()) for _ in range(min(concurrency, len(queue)))]
+    if not consumers:
+        return []
+
+    timeout = None if deadline is None else max(0, deadline - time.monotonic())
+    _, pending = await asyncio.wait(consumers, timeout=timeout)
+    if pending:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    unfinished.extend(queue)
+    if unfinished:
+        logging.warning(f"⏰ 已到达时间预算，跳过剩余 {len(unfinished)} 个测速任务")
+    return unfinished
+
+
+def make_deadline(budget):
+    """根据时间预算（秒）计算截止时间，budget <= 0 表示不限时"""
+    if not budget or budget <= 0:
+        return None
+    return time.monotonic() + budget
@@ -0,0 +1,253 @@
+import aiohttp
+import asyncio
+import logging
+import re
+import time
+from urllib.parse import urljoin
+
+from utils.metadata import parse_hls_attributes
+from utils.sampler import ThroughputSampler
+
+
+def is_hls_response(response, url):
+    content_type = response.headers.get('content-type', '').lower()
+    return 'mpegurl' in content_type or 'm3u8' in content_type or url.split('?')[0].endswith('.m3u8')
+
+
+def select_lowest_variant(content, base_url):
+    """从主播放列表中选出码率最低的变体地址，不是主播放列表时返回 None"""
+    best = None
+    lines = content.splitlines()
+    for i, line in enumerate(lines):
+        if not line.startswith('#EXT-X-STREAM-INF'):
+            continue
+        bandwidth = parse_hls_attributes(line).get('BANDWIDTH', '')
+        bandwidth = int(bandwidth) if bandwidth.isdigit() else float('inf')
+        uri = next((item.strip() for item in lines[i + 1:] if item.strip() and not item.startswith('#')), None)
+        if uri and (best is None or bandwidth < best[0]):
+            best = (bandwidth, urljoin(base_url, uri))
+    return best[1] if best else None
+
+
+def parse_media_playlist(content, base_url):
+    """解析媒体播放列表，返回 (目标时长, [(序号, 时长, 地址)], 是否已结束)"""
+    target_duration = 10.0
+    sequence = 0
+    segments = []
+    duration = None
+    for line in content.splitlines():
+        line = line.strip()
+        if line.startswith('#EXT-X-TARGETDURATION:'):
+            target_duration = float(line.split(':', 1)[1] or 10)
+        elif line.startswith('#EXT-X-MEDIA-SEQUENCE:'):
+            sequence = int(line.split(':', 1)[1] or 0)
+        elif line.startswith('#EXTINF:'):
+            match = re.match(r'#EXTINF:\s*([0-9.]+)', line)
+            duration = float(match.group(1)) if match else target_duration
+        elif line and not line.startswith('#'):
+            segments.append((sequence, duration or target_duration, urljoin(base_url, line)))
+            sequence += 1
+            duration = None
+    return target_duration, segments, '#EXT-X-ENDLIST' in content
+
+
+class PlaybackSoak:
+    """模拟播放器长时间播放一个源，统计卡顿（缓冲耗尽）次数、卡顿时长和播放列表停止更新的情况
+
+    HLS 源选择码率最低的变体，像播放器一样从直播边缘开始顺序下载分片、按规范间隔重新加载播放列表，
+    用虚拟缓冲区模拟播放：下载完成的分片时长进入缓冲，播放按真实时间消耗缓冲，耗尽即记为一次卡顿。
+    TS 等连续流按数据间隔超过 stall_threshold 记为卡顿。
+    fetch(url, timeout=..., remember=...) 与 test_stream_speed 的参数相同，返回异步上下文管理器。
+    播放测试不限速：限速低于源的码率时缓冲区会因为限速本身而耗尽，卡顿率不再反映源的质量。
+    """
+
+    # 起播和卡顿后恢复播放所需的缓冲时长（秒）
+    RESUME_BUFFER = 2.0
+    # 直播时从倒数第几个分片开始播放
+    LIVE_EDGE_SEGMENTS = 3
+    # 连续流的请求不限制总时长（由 duration 控制），只限制连接和每次读取的等待时间
+    STREAM_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=10)
+
+    def __init__(self, fetch, url, duration=60, stall_threshold=2.0):
+        self.fetch = fetch
+        self.url = url
+        self.duration = duration
+        self.stall_threshold = stall_threshold
+        self.start = None
+        self.clock = None
+        self.buffer = 0.0
+        self.playing = False
+        self.started_at = None
+        self.stall_since = None
+        self.rebuffer_events = 0
+        self.rebuffer_time = 0.0
+        self.stale_reloads = 0
+        self.max_staleness = 0.0
+        self.segments = 0
+        self.segment_errors = 0
+        self.total_bytes = 0
+        self.error = None
+        self.sampler = None
+
+    def _advance(self, now):
+        """按真实时间消耗缓冲，缓冲耗尽时记录卡顿开始的时刻"""
+        if self.playing:
+            self.buffer -= now - self.clock
+            if self.buffer <= 0:
+                self.stall_since = now + self.buffer
+                self.buffer = 0.0
+                self.playing = False
+                self.rebuffer_events += 1
+        self.clock = now
+
+    def _add_media(self, seconds):
+        now = time.monotonic()
+        self._advance(now)
+        self.buffer += seconds
+        if not self.playing and self.buffer >= min(self.RESUME_BUFFER, seconds):
+            if self.started_at is None:
+                self.started_at = now
+            else:
+                self.rebuffer_time += now - self.stall_since
+            self.playing = True
+
+    async def run(self):
+        self.start = self.clock = time.monotonic()
+        try:
+            await asyncio.wait_for(self._play(), self.duration)
+        except asyncio.TimeoutError:
+            pass
+        except Exception as e:
+            self.error = str(e) or type(e).__name__
+        return self.report()
+
+    async def _play(self):
+        async with self.fetch(self.url, timeout=self.STREAM_TIMEOUT) as response:
+            if response.status != 200:
+                raise ValueError(f'HTTP status {response.status}')
+            if not is_hls_response(response, self.url):
+                await self._play_continuous(response)
+                return
+            content = await response.text()
+            playlist_url = str(response.url)
+        variant = select_lowest_variant(content, playlist_url)
+        if variant:
+            playlist_url = variant
+            content = await self._get_text(variant)
+        await self._play_hls(playlist_url, content)
+
+    async def _get_text(self, url):
+        async with self.fetch(url, timeout=10) as response:
+            if response.status != 200:
+                raise ValueError(f'HTTP status {response.status}')
+            return await response.text()
+
+    async def _play_continuous(self, response):
+        # 连续流没有分片时长信息，按数据到达的间隔推算卡顿
+        self.sampler = ThroughputSampler(duration=self.duration, stall_threshold=self.stall_threshold)
+        await self.sampler.sample(response.content, start=self.start)
+
+    async def _play_hls(self, playlist_url, content):
+        target_duration, segments, ended = parse_media_playlist(content, playlist_url)
+        next_sequence = segments[-self.LIVE_EDGE_SEGMENTS][0] if len(segments) >= self.LIVE_EDGE_SEGMENTS else (
+            segments[0][0] if segments else 0)
+        last_change = time.monotonic()
+        last_sequence = segments[-1][0] if segments else -1
+        reload_at = last_change + target_duration
+
+        while True:
+            pending = [segment for segment in segments if segment[0] >= next_sequence]
+            if pending:
+                sequence, duration, segment_url = pending[0]
+                next_sequence = sequence + 1
+                try:
+                    await self._download_segment(segment_url, timeout=max(target_duration * 3, 10))
+                    self.segments += 1
+                    self._add_media(duration)
+                except Exception as e:
+                    self.segment_errors += 1
+                    logging.debug(f"分片下载失败 {segment_url}: {e}")
+                if time.monotonic() < reload_at:
+                    continue
+            elif ended:
+                return
+
+            # 重新加载播放列表：有更新时间隔一个目标时长，没有更新时间隔半个目标时长
+            await asyncio.sleep(max(0.0, reload_at - time.monotonic()))
+            target_duration, segments, ended = parse_media_playlist(await self._get_text(playlist_url), playlist_url)
+            now = time.monotonic()
+            newest = segments[-1][0] if segments else -1
+            if newest > last_sequence:
+                last_sequence = newest
+                last_change = now
+                reload_at = now + target_duration
+            else:
+                staleness = now - last_change
+                self.max_staleness = max(self.max_staleness, staleness)
+                if staleness > target_duration * 1.5:
+                    self.stale_reloads += 1
+                reload_at = now + target_duration / 2
+
+    async def _download_segment(self, url, timeout):
+        async with self.fetch(url, timeout=timeout, remember=False) as response:
+            if response.status != 200:
+                raise ValueError(f'HTTP status {response.status}')
+            while True:
+                data = await response.content.readany()
+                if not data:
+                    return
+                self.total_bytes += len(data)
+
+    def report(self):
+        # 提前结束（流中断、出错或点播列表放完）时，剩余时间按缓冲播完后卡顿计算
+        end = self.start + self.duration
+        if self.sampler:
+            self.started_at = self.sampler.first_byte
+            self.rebuffer_events = len(self.sampler.stalls)
+            rebuffer_time = self.sampler.stall_time
+            self.total_bytes = self.sampler.total_bytes
+            # 流提前中断：最后一次收到数据到结束之间超过停顿阈值时记为一次卡顿
+            if (self.started_at is not None and not self.sampler.timed_out
+                    and end - self.sampler.last_byte >= self.stall_threshold):
+                self.rebuffer_events += 1
+                rebuffer_time += end - self.sampler.last_byte
+        else:
+            self._advance(end)
+            rebuffer_time = self.rebuffer_time
+            if not self.playing and self.started_at is not None and self.stall_since is not None:
+                rebuffer_time += end - self.stall_since
+        if self.started_at is None:
+            # 整个测试期间都没能起播
+            startup_time = None
+            rebuffer_ratio = 1.0
+        else:
+            startup_time = self.started_at - self.start
+            watch_time = end - self.started_at
+            rebuffer_ratio = min(1.0, rebuffer_time / watch_time) if watch_time > 0 else 0.0
+        return {
+            'soak_time': end - self.start,
+            'startup_time': startup_time,
+            'rebuffer_events': self.rebuffer_events,
+            'rebuffer_time': rebuffer_time,
+            'rebuffer_ratio': rebuffer_ratio,
+            'stale_reloads': self.stale_reloads,
+            'max_staleness': self.max_staleness,
+            'segments': self.segments,
+            'segment_errors': self.segment_errors,
+            'soak_bytes': self.total_bytes,
+            'soak_error': self.error,
+        }
+
+
+async def soak_channels(channels, fetch, duration=60, concurrency=20, stall_threshold=2.0):
+    """并发对多个源进行长时间播放测试，结果写回频道字典"""
+    sem = asyncio.Semaphore(concurrency)
+
+    async def soak(channel):
+        async with sem:
+            result = await PlaybackSoak(fetch, channel['url'], duration, stall_threshold).run()
+            channel.update(result)
+            logging.info(f"播放测试 {channel['name']}: 卡顿 {result['rebuffer_events']} 次，"
+                         f"卡顿率 {result['rebuffer_ratio']:.1%}，播放列表停滞 {result['stale_reloads']} 次 - {channel['url']}")
+
+    await asyncio.gather(*(soak(channel) for channel in channels))
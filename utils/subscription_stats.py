@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+import time
+
+INF = float('inf')
+
+
+def is_live(channel):
+    """第一阶段有响应或第二阶段测速成功的源视为可用"""
+    return channel.get('response_time', INF) != INF or channel.get('speed', 0) > 0.01
+
+
+class SubscriptionStats:
+    """统计每个订阅源的贡献：下载字节数、解析耗时、原始/去重后/匹配/可用频道数和最佳源数量
+
+    频道字典的 'source' 字段记录其来自哪个订阅地址。统计结果和历史（连续零产出次数）保存在 JSON 文件中，
+    用于跳过或降低长期没有贡献的订阅源的优先级。
+    """
+
+    def __init__(self, path='output/subscribe_stats.json'):
+        self.path = path
+        self.history = {}
+        self.current = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.history = json.load(f).get('history', {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError) as e:
+            logging.warning(f"读取订阅统计失败: {e}")
+
+    def _stats(self, url):
+        return self.current.setdefault(url, {
+            'bytes': 0, 'fetch_time': None, 'parse_time': 0.0,
+            'raw': 0, 'unique': 0, 'matched': 0, 'live': 0, 'winners': 0,
+        })
+
+    def is_low_value(self, url, runs):
+        """连续 runs 次运行都没有可用频道的订阅源"""
+        return runs > 0 and self.history.get(url, {}).get('zero_runs', 0) >= runs
+
+    def should_skip(self, url, runs):
+        """跳过长期零产出的订阅源，但每跳过 runs 次后重新尝试一次，以便发现恢复的订阅源"""
+        if not self.is_low_value(url, runs):
+            return False
+        record = self.history[url]
+        if record.get('skipped_runs', 0) >= runs:
+            record['skipped_runs'] = 0
+            return False
+        record['skipped_runs'] = record.get('skipped_runs', 0) + 1
+        return True
+
+    def record_fetch(self, url, content, fetch_time, parse_time, channels):
+        stats = self._stats(url)
+        stats['bytes'] = len(content.encode('utf-8')) if content else 0
+        stats['fetch_time'] = None if fetch_time == INF else round(fetch_time, 3)
+        stats['parse_time'] = round(parse_time, 3)
+        stats['raw'] = len(channels)
+        for channel in channels:
+            channel['source'] = url
+
+    def _count(self, channels, field):
+        for stats in self.current.values():
+            stats[field] = 0
+        for channel in channels:
+            if channel.get('source') in self.current:
+                self.current[channel['source']][field] += 1
+
+    def count_unique(self, channels):
+        self._count(channels, 'unique')
+
+    def count_matched(self, channels):
+        self._count(channels, 'matched')
+        self._count([channel for channel in channels if is_live(channel)], 'live')
+
+    def count_winners(self, channels, sort_key):
+        """统计每个订阅源提供了多少个频道的排名第一的源"""
+        best = {}
+        for channel in channels:
+            if not is_live(channel):
+                continue
+            name = channel['name']
+            if name not in best or sort_key(channel) < sort_key(best[name]):
+                best[name] = channel
+        self._count(best.values(), 'winners')
+
+    def finish(self, update_yield=True):
+        """记录本次运行结果、更新连续零产出次数并输出报告
+
+        只有执行了第一阶段测速的运行才能判断频道是否可用，update_yield=False 时不更新零产出计数。
+        """
+        for url, stats in self.current.items():
+            record = self.history.setdefault(url, {'zero_runs': 0})
+            if update_yield:
+                record['zero_runs'] = 0 if stats['live'] > 0 else record.get('zero_runs', 0) + 1
+            record['last'] = stats
+            record['time'] = int(time.time())
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'history': self.history}, f, ensure_ascii=False, indent=1)
+        self.log_report()
+
+    def log_report(self):
+        logging.info("\n==================== 订阅源贡献统计 ====================")
+        logging.info(f"{'下载KB':>8} {'解析秒':>6} {'原始':>6} {'去重':>6} {'匹配':>6} {'可用':>6} {'最佳':>5} {'零产出':>4}  订阅地址")
+        for url, stats in sorted(self.current.items(), key=lambda item: (-item[1]['winners'], -item[1]['live'])):
+            zero_runs = self.history.get(url, {}).get('zero_runs', 0)
+            logging.info(f"{stats['bytes'] / 1024:>8.0f} {stats['parse_time']:>6.2f} {stats['raw']:>6} {stats['unique']:>6} "
+                         f"{stats['matched']:>6} {stats['live']:>6} {stats['winners']:>5} {zero_runs:>4}  {url}")
@@ -0,0 +1,120 @@
+import aiohttp
+import json
+import logging
+import math
+import os
+import time
+from urllib.parse import urlsplit
+
+CONNECT = 'connect'
+FIRST_BYTE = 'first_byte'
+TOTAL = 'total'
+
+
+def get_host_key(url):
+    try:
+        parts = urlsplit(url)
+        host = parts.hostname
+        port = parts.port
+    except ValueError:
+        return None
+    if not host:
+        return None
+    return f"{host}:{port}" if port else host
+
+
+class HostTimeouts:
+    """按主机学习的超时策略
+
+    分别记录每个主机的连接耗时（connect）、从发起请求到收到响应头的耗时（first_byte）
+    和整个请求的耗时（total），超时取最近 window 次成功请求耗时的 p99 × factor，限制在 [floor, ceiling] 之间。
+    快速的主机超时随之缩短，失效时很快放弃；较慢但稳定的海外源超时相应延长，不会被固定超时误判为失效。
+    样本不足 min_samples 次的主机使用调用方给出的默认超时。记录保存到文件，跨运行复用。
+    """
+
+    def __init__(self, path='output/host_timeouts.json', enabled=True, factor=3.0, floor=1.0, ceiling=30.0,
+                 min_samples=5, window=100, max_age=30 * 86400):
+        self.path = path
+        self.enabled = enabled
+        self.factor = factor
+        self.floor = floor
+        self.ceiling = ceiling
+        self.min_samples = min_samples
+        self.window = window
+        self.max_age = max_age
+        self.hosts = {}  # 主机 -> {阶段: [耗时...], 'time': 最近记录时间}
+
+    def load(self):
+        if not self.enabled:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.hosts = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning(f"读取主机超时记录失败，将重新学习: {e}")
+
+    def save(self):
+        if not self.enabled or not self.hosts:
+            return
+        expire = time.time() - self.max_age
+        hosts = {host: entry for host, entry in self.hosts.items() if entry.get('time', 0) > expire}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(hosts, f)
+
+    def observe(self, url, phase, seconds):
+        """记录一次成功请求在某个阶段的耗时，失败和超时的请求不记录"""
+        if not self.enabled or seconds is None or not math.isfinite(seconds):
+            return
+        key = get_host_key(url)
+        if key is None:
+            return
+        entry = self.hosts.setdefault(key, {})
+        samples = entry.setdefault(phase, [])
+        samples.append(round(seconds, 3))
+        del samples[:-self.window]
+        entry['time'] = int(time.time())
+
+    def timeout(self, url, phase, default):
+        """返回主机在某个阶段学到的超时，样本不足时返回 default"""
+        if not self.enabled:
+            return default
+        samples = self.hosts.get(get_host_key(url), {}).get(phase)
+        if not samples or len(samples) < self.min_samples:
+            return default
+        ordered = sorted(samples)
+        p99 = ordered[max(0, math.ceil(len(ordered) * 0.99) - 1)]
+        return min(self.ceiling, max(self.floor, p99 * self.factor))
+
+    def client_timeout(self, url, default, phase=TOTAL):
+        """构造 aiohttp 的超时：total 取 phase 阶段的超时，sock_connect 取连接阶段的超时
+
+        只等待响应头的探测传 phase=FIRST_BYTE；下载内容时 sock_read 取首字节阶段的超时，限制每次读取的等待时间。
+        """
+        total = self.timeout(url, phase, default)
+        return aiohttp.ClientTimeout(total=total, sock_connect=min(total, self.timeout(url, CONNECT, default)),
+                                     sock_read=self.timeout(url, FIRST_BYTE, default) if phase == TOTAL else None)
+
+    def trace_config(self):
+        """记录 aiohttp 建立连接耗时的 TraceConfig（复用连接的请求不会记录）"""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            context.url = str(params.url)
+
+        async def on_connection_create_start(session, context, params):
+            context.connect_start = time.monotonic()
+
+        async def on_connection_create_end(session, context, params):
+            url = getattr(context, 'url', None)
+            if url and hasattr(context, 'connect_start'):
+                self.observe(url, CONNECT, time.monotonic() - context.connect_start)
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_start.append(on_connection_create_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        return trace_config
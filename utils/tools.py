@@ -1,4 +1,5 @@
 import logging
+import os
 
 def convert_to_m3u(results, path):
     try:
@@ -26,4 +27,15 @@ def convert_to_m3u(results, path):
         logging.debug(f"Successfully converted results to M3U and TXT at {path}")
     except Exception as e:
         logging.error(f"Error in convert_to_m3u: {e}", exc_info=True)
-    
+
+
+def get_result_file_content(path, file_type="m3u"):
+    """读取结果文件内容，返回给 Web 服务"""
+    from flask import Response
+
+    if not path or not os.path.exists(path):
+        return Response("结果文件尚未生成，请稍后再试", status=404, mimetype="text/plain")
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    mimetype = "audio/x-mpegurl" if file_type == "m3u" else "text/plain"
+    return Response(content, mimetype=f"{mimetype}; charset=utf-8")
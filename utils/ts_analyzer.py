@@ -0,0 +1,209 @@
+PACKET_SIZE = 188
+SYNC_BYTE = 0x47
+NULL_PID = 0x1FFF
+PCR_CLOCK = 27000000
+PCR_WRAP = (1 << 33) * 300
+# PAT/PMT 通常每 100 毫秒左右重复一次，收到的包少于这个数量时不因缺少 PAT/PMT 判定失败
+MIN_TABLE_PACKETS = 1000
+# 数据开头连续这么多个包都以同步字节开头才认为是 MPEG-TS，随机或压缩数据中偶然出现的同步字节不会被误认
+SYNC_CHECK_PACKETS = 3
+
+# PMT 中常见的流类型
+STREAM_TYPES = {
+    0x01: 'MPEG-1', 0x02: 'MPEG-2', 0x1B: 'H.264', 0x24: 'HEVC', 0x42: 'AVS', 0xD2: 'AVS2',
+    0x03: 'MP2', 0x04: 'MP2', 0x0F: 'AAC', 0x11: 'AAC-LATM', 0x81: 'AC-3', 0x87: 'E-AC-3',
+}
+
+
+class TsAnalyzer:
+    """不解码的 MPEG-TS 质量分析：检查同步字节、PAT/PMT，统计连续计数器错误，并根据 PCR 估算码率和实时倍速
+
+    feed() 接收测速时已经下载的数据，只分析前 max_bytes 字节，不需要另外启动 FFmpeg。
+    实时倍速 = 收到的数据覆盖的节目时长（PCR 差值）/ 接收这些数据用的时间，与 FFmpeg 输出的 speed= 含义相同。
+    """
+
+    def __init__(self, max_bytes=2 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.buffer = b''
+        self.offset = 0  # 已分析的字节数
+        self.synced = None  # None 表示数据还不够判断，False 表示不是 MPEG-TS
+        self.packets = 0
+        self.sync_losses = 0
+        self.skipped_bytes = 0
+        self.transport_errors = 0
+        self.cc_errors = 0
+        self.continuity = {}  # PID -> 上一个连续计数器
+        self.pmt_pids = set()
+        self.pcr_pid = None
+        self.stream_types = []
+        self.pcrs = {}  # PID -> [(首个 PCR, 字节位置, 接收时间), (最近 PCR, 字节位置, 接收时间)]
+
+    def feed(self, data, now):
+        if self.offset >= self.max_bytes or self.synced is False:
+            return
+        buffer = self.buffer + data
+        if self.synced is None:
+            if len(buffer) < SYNC_CHECK_PACKETS * PACKET_SIZE:
+                self.buffer = buffer
+                return
+            self.synced = all(buffer[i * PACKET_SIZE] == SYNC_BYTE for i in range(SYNC_CHECK_PACKETS))
+            if not self.synced:
+                self.buffer = b''
+                return
+        position = 0
+        while len(buffer) - position >= PACKET_SIZE and self.offset < self.max_bytes:
+            if buffer[position] != SYNC_BYTE:
+                next_sync = self._find_sync(buffer, position)
+                if next_sync is None:
+                    # 保留可能是下一个同步字节的尾部数据
+                    keep = max(position, len(buffer) - PACKET_SIZE)
+                    self.skipped_bytes += keep - position
+                    self.offset += keep - position
+                    position = keep
+                    break
+                if self.synced:
+                    self.sync_losses += 1
+                self.skipped_bytes += next_sync - position
+                self.offset += next_sync - position
+                position = next_sync
+                continue
+            self._packet(buffer[position:position + PACKET_SIZE], now)
+            position += PACKET_SIZE
+            self.offset += PACKET_SIZE
+        self.buffer = buffer[position:]
+
+    @staticmethod
+    def _find_sync(buffer, start):
+        """查找连续两个包都以同步字节开头的位置，没有足够数据时返回 None"""
+        position = buffer.find(bytes([SYNC_BYTE]), start + 1)
+        while position != -1 and position + PACKET_SIZE < len(buffer):
+            if buffer[position + PACKET_SIZE] == SYNC_BYTE:
+                return position
+            position = buffer.find(bytes([SYNC_BYTE]), position + 1)
+        return None
+
+    def _packet(self, packet, now):
+        self.packets += 1
+        if packet[1] & 0x80:
+            self.transport_errors += 1
+            return
+        pid = ((packet[1] & 0x1F) << 8) | packet[2]
+        if pid == NULL_PID:
+            return
+        payload_unit_start = packet[1] & 0x40
+        adaptation = (packet[3] >> 4) & 0x03
+        counter = packet[3] & 0x0F
+
+        payload_start = 4
+        discontinuity = False
+        if adaptation & 0x02:
+            length = packet[4]
+            payload_start = 5 + length
+            if length:
+                flags = packet[5]
+                discontinuity = bool(flags & 0x80)
+                if flags & 0x10 and length >= 7:
+                    base = (packet[6] << 25) | (packet[7] << 17) | (packet[8] << 9) | (packet[9] << 1) | (packet[10] >> 7)
+                    extension = ((packet[10] & 0x01) << 8) | packet[11]
+                    self._pcr(pid, base * 300 + extension, now)
+
+        # 只有带负载的包才递增连续计数器，允许一次重复包
+        if adaptation & 0x01:
+            previous = self.continuity.get(pid)
+            if previous is not None and not discontinuity and counter != (previous + 1) & 0x0F and counter != previous:
+                self.cc_errors += 1
+            self.continuity[pid] = counter
+            if payload_unit_start and payload_start < PACKET_SIZE:
+                if pid == 0:
+                    self._pat(packet[payload_start:])
+                elif pid in self.pmt_pids:
+                    self._pmt(packet[payload_start:])
+
+    @staticmethod
+    def _section(payload, table_id):
+        """跳过 pointer_field，返回表的内容（section_length 之后、CRC 之前），表不完整或类型不符时返回 None"""
+        pointer = payload[0]
+        section = payload[1 + pointer:]
+        if len(section) < 8 or section[0] != table_id:
+            return None
+        length = ((section[1] & 0x0F) << 8) | section[2]
+        return section[8:min(len(section), 3 + length) - 4]
+
+    def _pat(self, payload):
+        body = self._section(payload, 0x00)
+        if body is None:
+            return
+        for i in range(0, len(body) - 3, 4):
+            program = (body[i] << 8) | body[i + 1]
+            if program:
+                self.pmt_pids.add(((body[i + 2] & 0x1F) << 8) | body[i + 3])
+
+    def _pmt(self, payload):
+        body = self._section(payload, 0x02)
+        if body is None or len(body) < 4 or self.stream_types:
+            return
+        self.pcr_pid = ((body[0] & 0x1F) << 8) | body[1]
+        info_length = ((body[2] & 0x0F) << 8) | body[3]
+        i = 4 + info_length
+        while i + 5 <= len(body):
+            self.stream_types.append(body[i])
+            i += 5 + (((body[i + 3] & 0x0F) << 8) | body[i + 4])
+
+    def _pcr(self, pid, pcr, now):
+        entries = self.pcrs.setdefault(pid, [])
+        entry = (pcr, self.offset, now)
+        if len(entries) < 2:
+            entries.append(entry)
+        else:
+            entries[1] = entry
+
+    def _pcr_span(self):
+        """返回 (节目时长秒数, 字节数, 接收秒数)，PCR 不足两个时返回 None"""
+        entries = self.pcrs.get(self.pcr_pid) or next(iter(self.pcrs.values()), None)
+        if not entries or len(entries) < 2:
+            return None
+        (first_pcr, first_offset, first_time), (last_pcr, last_offset, last_time) = entries
+        delta = (last_pcr - first_pcr) % PCR_WRAP
+        if not delta:
+            return None
+        return delta / PCR_CLOCK, last_offset - first_offset, last_time - first_time
+
+    @property
+    def is_ts(self):
+        """数据看起来是 MPEG-TS（开头连续几个包都以同步字节开头）"""
+        return bool(self.synced)
+
+    def problems(self):
+        """返回判定流不可用的原因，没有问题时返回空列表"""
+        if not self.is_ts:
+            return []
+        problems = []
+        if self.packets >= MIN_TABLE_PACKETS:
+            if not self.pmt_pids:
+                problems.append('no PAT')
+            elif not self.stream_types:
+                problems.append('no PMT')
+        if self.packets and (self.sync_losses + self.transport_errors) / self.packets > 0.05:
+            problems.append(f'{self.sync_losses} sync losses, {self.transport_errors} transport errors')
+        return problems
+
+    def report(self):
+        """返回可合并进测速结果的字典；数据不是 MPEG-TS 时 ts_valid 为 None"""
+        if not self.is_ts:
+            return {'ts_valid': None}
+        span = self._pcr_span()
+        bitrate = rtf = None
+        if span:
+            media_seconds, span_bytes, receive_seconds = span
+            bitrate = span_bytes * 8 / media_seconds
+            if receive_seconds > 0:
+                rtf = media_seconds / receive_seconds
+        return {
+            'ts_valid': not self.problems(),
+            'ts_packets': self.packets,
+            'ts_cc_errors': self.cc_errors,
+            'ts_sync_losses': self.sync_losses,
+            'ts_codecs': [STREAM_TYPES.get(stream_type, hex(stream_type)) for stream_type in self.stream_types],
+            'ts_bitrate': bitrate,  # bit/s
+            'ts_rtf': rtf,
+        }